@@ -1,27 +1,35 @@
-from fastapi import Depends, HTTPException, status
+import sys
+import time
+
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
+from jose import JWTError
 from pydantic import ValidationError
 from typing import Generator, Optional
 
 from ..config import settings
 from ..models.user import users_db
-from ..schemas.token import TokenPayload
-from ..core.casbin_rbac import CasbinEnforcer
+from ..core.casbin_rbac import AsyncCasbinEnforcer
+from ..core.metrics import metrics
+from ..core.token_cache import token_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_PREFIX}/auth/login")
 
+_token_verify_seconds = metrics.histogram(
+    "auth_token_verify_seconds", "Token verification in get_current_user, cache hits included"
+).labels()
+
 def get_current_user(token: str = Depends(oauth2_scheme)):
+    started = time.perf_counter()
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        token_data = TokenPayload(**payload)
+        token_data = token_cache.verify(token)
     except (JWTError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
+    finally:
+        _token_verify_seconds.observe(time.perf_counter() - started)
 
     user = users_db.get(token_data.sub)
     if not user:
@@ -30,6 +38,13 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
             detail="User not found"
         )
     
+    # A token is scoped to the tenant the user was in when it was issued
+    if token_data.dom is not None and token_data.dom != user.domain:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+    
     if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, 
@@ -40,13 +55,22 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
 
 def check_permission(resource: str, action: str):
     """Dependency for checking if the current user has permission to access a resource"""
-    def dependency(user = Depends(get_current_user)):
-        enforcer = CasbinEnforcer.get_instance()
-        has_permission = enforcer.enforce(user.username, resource, action)
+    resource = sys.intern(resource)
+    action = sys.intern(action)
+    
+    # Async so the check runs on the event loop instead of a threadpool hop
+    async def dependency(request: Request, user = Depends(get_current_user)):
+        # AuthorizationMiddleware already checked every permission the route declares
+        if getattr(request.state, "authorized_user_id", None) == user.id:
+            return user
+        has_permission = await AsyncCasbinEnforcer.enforce(user.username, resource, action, user.domain)
         if not has_permission:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not enough permissions"
             )
         return user
+    # Let AuthorizationMiddleware find the permission a route requires
+    dependency.resource = resource
+    dependency.action = action
     return dependency
\ No newline at end of file
@@ -2,81 +2,99 @@ from datetime import timedelta
 from typing import Any
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 
-from ...core.security import create_access_token, get_password_hash, verify_password
+from ...core.login_throttle import login_throttle
+from ...core.security import create_access_token, password_service
 from ...config import settings
 from ...models.user import users_db, User
 from ...schemas.token import Token
 from ...schemas.user import UserCreate
-from ...core.casbin_rbac import CasbinEnforcer
+from ...core.casbin_rbac import AsyncCasbinEnforcer
 
 router = APIRouter()
 
 @router.post("/login", response_model=Token)
-def login_access_token(
+async def login_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
     """
-    Get an access token for future requests using OAuth2 password flow
+    Get an access token for future requests using OAuth2 password flow.
+    Attempts over the per-username or per-IP budget get 429 before any
+    password is checked.
     """
-    user = None
-    for u in users_db.values():
-        if u.username == form_data.username:
-            user = u
-            break
+    client_ip = request.client.host if request.client else ""
+    retry_after = await login_throttle.acquire(form_data.username, client_ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
+    
+    user = users_db.get_by_username(form_data.username)
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await password_service.verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect username or password",
         )
     
+    await login_throttle.succeeded(form_data.username)
+    
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     return {
         "access_token": create_access_token(
-            subject=user.id, role=user.role, expires_delta=access_token_expires
+            subject=user.id, role=user.role, expires_delta=access_token_expires, domain=user.domain
         ),
         "token_type": "bearer",
     }
 
 @router.post("/register", response_model=Token)
-def register_user(user_in: UserCreate) -> Any:
+async def register_user(user_in: UserCreate) -> Any:
     """
     Register a new user
     """
     # Check if the user already exists
-    for existing_user in users_db.values():
-        if existing_user.email == user_in.email or existing_user.username == user_in.username:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User with this email or username already exists",
-            )
+    if users_db.find_conflict(user_in.email, user_in.username):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User with this email or username already exists",
+        )
     
-    # Create a new user
+    # Create a new user; self-registered users always join the default
+    # tenant, only an admin may place a user in another
     user_id = str(uuid.uuid4())
     user = User(
         id=user_id,
         email=user_in.email,
         username=user_in.username,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=await password_service.hash(user_in.password),
         full_name=user_in.full_name,
         role=user_in.role,
+        domain=settings.DEFAULT_DOMAIN,
     )
     
-    # Save the user
-    users_db[user_id] = user
+    # Save the user (a concurrent signup may have taken the name while hashing)
+    try:
+        users_db[user_id] = user
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User with this email or username already exists",
+        )
     
-    # Add user to the role in Casbin
-    CasbinEnforcer.add_role_for_user(user.username, user.role)
-    CasbinEnforcer.save_policy()
+    # Add user to the role in Casbin (off the event loop, save_policy waits for fsync)
+    await AsyncCasbinEnforcer.add_role_for_user(user.username, user.role, user.domain)
+    await AsyncCasbinEnforcer.save_policy()
     
     # Generate an access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     return {
         "access_token": create_access_token(
-            subject=user.id, role=user.role, expires_delta=access_token_expires
+            subject=user.id, role=user.role, expires_delta=access_token_expires, domain=user.domain
         ),
         "token_type": "bearer",
     }
\ No newline at end of file
@@ -0,0 +1,39 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from ...models.user import User
+from ...schemas.authz import AuthzCheckRequest, AuthzCheckResponse
+from ..deps import get_current_user
+from ...core.casbin_rbac import CasbinEnforcer
+
+router = APIRouter()
+
+@router.post("/check", response_model=AuthzCheckResponse)
+def check_permissions(
+    checks_in: AuthzCheckRequest,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Check many (sub, obj, act) tuples in one call, in the caller's domain.
+    Checks for other subjects require permission to list users.
+    """
+    requests = [
+        (check.sub or current_user.username, check.obj, check.act)
+        for check in checks_in.checks
+    ]
+    
+    if any(sub != current_user.username for sub, _, _ in requests):
+        if not CasbinEnforcer.enforce(current_user.username, "/users", "GET", current_user.domain):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions",
+            )
+    
+    decisions = CasbinEnforcer.batch_enforce(requests, current_user.domain)
+    return {
+        "results": [
+            {"sub": sub, "obj": obj, "act": act, "allowed": allowed}
+            for (sub, obj, act), allowed in zip(requests, decisions)
+        ]
+    }
@@ -0,0 +1,62 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from ...config import settings
+from ...core.metrics import metrics
+from ...core.profiler import profiler
+from ...models.user import User
+from ..deps import check_permission
+
+router = APIRouter()
+
+@router.get("", response_class=PlainTextResponse)
+def get_metrics(
+    current_user: User = Depends(check_permission("/metrics", "GET"))
+) -> Any:
+    """
+    Get this worker's counters and latency histograms in the Prometheus
+    text exposition format (requires admin role)
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def _require_profiler():
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiler is disabled")
+
+@router.get("/profile")
+def get_profile_status(
+    current_user: User = Depends(check_permission("/metrics", "GET"))
+) -> Any:
+    """
+    Get the sampling profiler's state in this worker
+    """
+    _require_profiler()
+    return profiler.get_stats()
+
+@router.post("/profile/start")
+def start_profile(
+    interval_ms: float = Query(5, ge=1, le=1000),
+    seconds: float = Query(60, gt=0, le=3600),
+    current_user: User = Depends(check_permission("/metrics", "POST"))
+) -> Any:
+    """
+    Start sampling every thread's stack in this worker (requires admin role).
+    Sampling stops by itself after the given number of seconds.
+    """
+    _require_profiler()
+    if not profiler.start(interval_ms / 1000, seconds):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Profiler is already running")
+    return profiler.get_stats()
+
+@router.post("/profile/stop", response_class=PlainTextResponse)
+def stop_profile(
+    current_user: User = Depends(check_permission("/metrics", "POST"))
+) -> Any:
+    """
+    Stop the profiler and get the sampled stacks in folded format, ready
+    for flamegraph.pl or speedscope (requires admin role)
+    """
+    _require_profiler()
+    return PlainTextResponse(profiler.stop())
@@ -0,0 +1,135 @@
+from typing import Any, Dict, List, Optional
+import uuid
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, status
+
+from ...config import settings
+from ...models.resource import resources_db
+from ...models.user import User
+from ..deps import get_current_user, check_permission
+from ...core.casbin_rbac import CasbinEnforcer
+from ..pagination import decode_cursor, paginate, parse_fields, wants_ndjson
+
+router = APIRouter()
+
+# Policy objects for reading resources: the whole collection, a single
+# resource as /resources/<id>, or every resource the subject created
+RESOURCES = "/resources"
+RESOURCE_PREFIX = "/resources/"
+OWNED_RESOURCES = "/resources/owned"
+
+@router.get("/", response_model=List[Dict])
+def get_resources(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    fields: Optional[str] = None,
+    format: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+    created_by: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Get the resources in the current user's tenant that they may read:
+    all of them with /resources GET, otherwise those granted as
+    /resources/<id> plus their own with /resources/owned.
+    Supports the same cursor pages, projection and NDJSON streaming as
+    the user listing; projected fields a resource lacks are omitted.
+    Filter with ?created_by= or ?<attribute>= for any attribute listed in
+    RESOURCE_INDEXED_ATTRIBUTES.
+    """
+    filters = {
+        name: request.query_params[name]
+        for name in settings.RESOURCE_INDEXED_ATTRIBUTES
+        if name in request.query_params
+    }
+    if created_by is not None:
+        filters["created_by"] = created_by
+    
+    seq = decode_cursor(cursor)
+    username, domain = current_user.username, current_user.domain
+    scope = {**filters, "domain": domain}
+    if CasbinEnforcer.enforce(username, RESOURCES, "GET", domain):
+        rows = resources_db.iter_after(seq, **scope)
+    else:
+        # One policy evaluation, then an index scan of the permitted rows
+        objects = CasbinEnforcer.get_permitted_objects(username, "GET", RESOURCE_PREFIX, domain)
+        if objects is not None:
+            ids = {obj[len(RESOURCE_PREFIX):] for obj in objects if obj != OWNED_RESOURCES}
+            owner = username if OWNED_RESOURCES in objects else None
+            rows = resources_db.iter_permitted(seq, ids, owner, **scope)
+        else:
+            # Policies are not plain RBAC, so fall back to a check per row
+            rows = (
+                (seq, resource)
+                for seq, resource in resources_db.iter_after(seq, **scope)
+                if _can_read(username, domain, resource)
+            )
+    
+    ndjson = wants_ndjson(request, format)
+    if cursor is None and limit is None and fields is None and not filters and not ndjson:
+        return [resource for _, resource in rows]
+    
+    selected = parse_fields(fields)
+    
+    def serialize(resource):
+        if selected is None:
+            return resource
+        return {key: value for key, value in resource.items() if key in selected}
+    
+    return paginate(rows, serialize, limit, ndjson)
+
+@router.get("/{resource_id}", response_model=Dict)
+def get_resource(
+    resource_id: str,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Get a resource in the current user's tenant that they may read
+    """
+    resource = resources_db.get(resource_id)
+    if resource is None or not _can_read(current_user.username, current_user.domain, resource):
+        # Unreadable resources are reported as missing rather than forbidden
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Resource not found",
+        )
+    return resource
+
+def _can_read(username: str, domain: str, resource: Dict) -> bool:
+    return resource.get("domain") == domain and (
+        CasbinEnforcer.enforce(username, RESOURCES, "GET", domain)
+        or CasbinEnforcer.enforce(username, RESOURCE_PREFIX + resource["id"], "GET", domain)
+        or (resource.get("created_by") == username and CasbinEnforcer.enforce(username, OWNED_RESOURCES, "GET", domain))
+    )
+
+@router.post("/", response_model=Dict)
+def create_resource(
+    resource: Dict,
+    current_user: User = Depends(check_permission("/resources", "POST"))
+) -> Any:
+    """
+    Create a new resource in the current user's tenant (requires admin or
+    manager role)
+    """
+    resource_id = str(uuid.uuid4())
+    resource_with_id = {
+        **resource, "id": resource_id, "created_by": current_user.username, "domain": current_user.domain
+    }
+    resources_db[resource_id] = resource_with_id
+    return resource_with_id
+
+@router.post("/batch", response_model=List[Dict])
+def create_resources(
+    resources: List[Dict] = Body(..., max_length=1000),
+    current_user: User = Depends(check_permission("/resources", "POST"))
+) -> Any:
+    """
+    Create many resources in the current user's tenant in one transaction
+    (requires admin or manager role)
+    """
+    created = [
+        {**resource, "id": str(uuid.uuid4()), "created_by": current_user.username, "domain": current_user.domain}
+        for resource in resources
+    ]
+    resources_db.add_many(created)
+    return created
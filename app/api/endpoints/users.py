@@ -1,40 +1,72 @@
-from typing import Any, List
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import csv
+import json
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, Response
+from pydantic import ValidationError
 
-from ...core.security import get_password_hash
+from ...config import settings
+
+from ...core.security import PasswordServiceBusy, password_service
+from ...core.token_cache import token_cache
 from ...models.user import users_db, User
-from ...schemas.user import User as UserSchema, UserCreate, UserUpdate
+from ...schemas.user import User as UserSchema, UserCreate, UserImportResult, UserPermissions, UserUpdate
 from ..deps import get_current_user, check_permission
-from ...core.casbin_rbac import CasbinEnforcer
+from ..pagination import NDJSON_MEDIA_TYPE, decode_cursor, paginate, parse_fields, wants_ndjson
+from ...core.casbin_rbac import AsyncCasbinEnforcer, CasbinEnforcer
 
 router = APIRouter()
 
+# Handlers serialize users directly with User.public_dict instead of having
+# each one re-validated through response_model, which only documents the shape
+
 @router.get("/", response_model=List[UserSchema])
 def get_users(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    fields: Optional[str] = None,
+    format: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
     current_user: User = Depends(check_permission("/users", "GET"))
 ) -> Any:
     """
-    Get all users (requires admin or manager role)
+    Get all users of the caller's domain (requires admin or manager role).
+    With cursor, limit, fields or NDJSON output requested, users are listed
+    in stable insertion order as {"items", "next_cursor"} pages or as an
+    NDJSON stream, optionally projected to the given fields.
     """
-    return list(users_db.values())
+    domain = current_user.domain
+    ndjson = wants_ndjson(request, format)
+    if cursor is None and limit is None and fields is None and not ndjson:
+        return JSONResponse([user.public_dict() for user in users_db.values() if user.domain == domain])
+    
+    selected = parse_fields(fields, User.PUBLIC_FIELDS)
+    columns = [field for field in User.PUBLIC_FIELDS if selected is None or field in selected]
+    
+    def serialize(user):
+        return user.public_dict(columns)
+    
+    rows = ((seq, user) for seq, user in users_db.iter_after(decode_cursor(cursor)) if user.domain == domain)
+    return paginate(rows, serialize, limit, ndjson)
 
 @router.post("/", response_model=UserSchema)
-def create_user(
+async def create_user(
     user_in: UserCreate,
     current_user: User = Depends(check_permission("/users", "POST"))
 ) -> Any:
     """
-    Create a new user (requires admin role)
+    Create a new user in the caller's domain (requires admin role)
     """
+    _check_domain(user_in, current_user)
+    
     # Check if the user already exists
-    for existing_user in users_db.values():
-        if existing_user.email == user_in.email or existing_user.username == user_in.username:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User with this email or username already exists",
-            )
+    if users_db.find_conflict(user_in.email, user_in.username):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User with this email or username already exists",
+        )
     
     # Create a new user
     user_id = str(uuid.uuid4())
@@ -42,38 +74,293 @@ def create_user(
         id=user_id,
         email=user_in.email,
         username=user_in.username,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=await password_service.hash(user_in.password),
         full_name=user_in.full_name,
         role=user_in.role,
+        domain=current_user.domain,
     )
     
-    # Save the user
-    users_db[user_id] = user
+    # Save the user (a concurrent signup may have taken the name while hashing)
+    try:
+        users_db[user_id] = user
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User with this email or username already exists",
+        )
     
-    # Add user to the role in Casbin
-    CasbinEnforcer.add_role_for_user(user.username, user.role)
-    CasbinEnforcer.save_policy()
+    # Add user to the role in Casbin (off the event loop, save_policy waits for fsync)
+    await AsyncCasbinEnforcer.add_role_for_user(user.username, user.role, user.domain)
+    await AsyncCasbinEnforcer.save_policy()
     
-    return user
+    return JSONResponse(user.public_dict())
 
-@router.get("/{user_id}", response_model=UserSchema)
-def get_user(
-    user_id: str,
-    current_user: User = Depends(check_permission("/users", "GET"))
+@router.post("/batch", response_model=UserImportResult)
+async def import_users(
+    request: Request,
+    current_user: User = Depends(check_permission("/users", "POST"))
 ) -> Any:
     """
-    Get a user by ID (requires admin or manager role)
+    Create many users from a JSON array, NDJSON or CSV (email, username,
+    password, role and optional full_name and domain columns) body into
+    the caller's domain (requires admin role). Rows that are invalid,
+    whose email or username is taken, or whose password the busy password
+    pool refuses are reported by row number without stopping the rest;
+    passwords are hashed in parallel and the policy is saved once.
     """
+    errors: List[Dict[str, Any]] = []
+    accepted: List[Tuple[int, UserCreate]] = []
+    emails = set()
+    usernames = set()
+    
+    # Validate the whole batch before any hashing
+    async for row, data in _import_rows(request):
+        try:
+            if isinstance(data, Exception):
+                raise data
+            user_in = UserCreate.model_validate(data)
+            _check_domain(user_in, current_user)
+        except ValidationError as e:
+            error = e.errors()[0]
+            location = ".".join(str(part) for part in error["loc"])
+            errors.append({"row": row, "detail": f"{location}: {error['msg']}" if location else error["msg"]})
+            continue
+        except ValueError as e:
+            errors.append({"row": row, "detail": str(e)})
+            continue
+        except HTTPException as e:
+            errors.append({"row": row, "detail": e.detail})
+            continue
+        
+        if user_in.email in emails or user_in.username in usernames or users_db.find_conflict(user_in.email, user_in.username):
+            errors.append({"row": row, "detail": "User with this email or username already exists"})
+            continue
+        emails.add(user_in.email)
+        usernames.add(user_in.username)
+        accepted.append((row, user_in))
+    
+    # Rows the busy password pool refuses are reported, not the whole batch
+    hashes = await password_service.hash_many([user_in.password for _, user_in in accepted], return_busy=True)
+    hashed = []
+    for (row, user_in), hashed_password in zip(accepted, hashes):
+        if isinstance(hashed_password, PasswordServiceBusy):
+            errors.append({"row": row, "detail": "Password service is busy, try this row again"})
+        else:
+            hashed.append(((row, user_in), hashed_password))
+    accepted = [entry for entry, _ in hashed]
+    users = [
+        User(
+            id=str(uuid.uuid4()),
+            email=user_in.email,
+            username=user_in.username,
+            hashed_password=hashed_password,
+            full_name=user_in.full_name,
+            role=user_in.role,
+            domain=current_user.domain,
+        )
+        for (_, user_in), hashed_password in hashed
+    ]
+    
+    # Someone may have taken a name while the batch was hashing
+    skipped = {id(user) for user in users_db.add_many(users)}
+    created = []
+    for (row, _), user in zip(accepted, users):
+        if id(user) in skipped:
+            errors.append({"row": row, "detail": "User with this email or username already exists"})
+        else:
+            created.append(user)
+    
+    if created:
+        await AsyncCasbinEnforcer.add_roles_for_users([(user.username, user.role) for user in created], current_user.domain)
+        await AsyncCasbinEnforcer.save_policy()
+    
+    errors.sort(key=lambda error: error["row"])
+    return JSONResponse({"created": [user.public_dict() for user in created], "errors": errors})
+
+async def _import_rows(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Yield (row number, data) for each record of an import body, with a
+    ValueError as the data for a row that cannot be parsed
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip()
+    max_rows = settings.USER_IMPORT_MAX_ROWS
+    
+    if media_type == "application/json":
+        try:
+            rows = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid JSON body")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON array of users")
+        records = iter(rows)
+    elif media_type == NDJSON_MEDIA_TYPE:
+        records = None
+    elif media_type == "text/csv":
+        lines = [line async for line in _stream_lines(request)]
+        if lines:
+            lines[0] = lines[0].lstrip("\ufeff")
+        records = (
+            {name: value for name, value in record.items() if name and value not in (None, "")}
+            for record in csv.DictReader(lines)
+        )
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Send application/json, {NDJSON_MEDIA_TYPE} or text/csv",
+        )
+    
+    row = 0
+    if records is None:
+        # NDJSON is parsed line by line as it arrives
+        async for line in _stream_lines(request):
+            if not line.strip():
+                continue
+            row += 1
+            _check_row_limit(row, max_rows)
+            try:
+                yield row, json.loads(line)
+            except ValueError:
+                yield row, ValueError("Invalid JSON")
+        return
+    
+    for record in records:
+        row += 1
+        _check_row_limit(row, max_rows)
+        yield row, record
+
+async def _stream_lines(request: Request) -> AsyncIterator[str]:
+    """Decode a streamed UTF-8 body line by line"""
+    buffer = b""
+    try:
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                yield line.decode("utf-8")
+        if buffer:
+            yield buffer.decode("utf-8")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body is not valid UTF-8")
+
+def _check_domain(user_in: UserCreate, current_user: User) -> None:
+    if user_in.domain is not None and user_in.domain != current_user.domain:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Cannot create users in another domain",
+        )
+
+def _domain_user(user_id: str, current_user: User) -> User:
+    """Get a user of the caller's domain; other tenants' users are not found"""
     user = users_db.get(user_id)
-    if not user:
+    if not user or user.domain != current_user.domain:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found",
         )
     return user
 
+def _check_row_limit(row: int, max_rows: int) -> None:
+    if row > max_rows:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {max_rows} users per import",
+        )
+
+# /me routes come before /{user_id}, which would otherwise match "me"
+@router.get("/me", response_model=UserSchema)
+def get_current_user_info(
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Get current user information
+    """
+    return JSONResponse(current_user.public_dict())
+
+@router.get("/me/permissions", response_model=UserPermissions)
+async def get_current_user_permissions(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Get every (obj, act) pair the current user may perform through the
+    roles they hold. Responses carry an ETag; a request sending it back in
+    If-None-Match gets 304 Not Modified until the permissions change.
+    """
+    username, domain = current_user.username, current_user.domain
+    tag, permissions = await AsyncCasbinEnforcer.read(
+        username, CasbinEnforcer.get_effective_permissions, username, domain, dom=domain
+    )
+    etag = f'"{tag}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return JSONResponse(
+        {"permissions": [{"obj": obj, "act": act} for obj, act in permissions]},
+        headers=headers,
+    )
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # Weak comparison, as If-None-Match calls for
+    return any(
+        candidate.strip() in ("*", etag) or candidate.strip() == f"W/{etag}"
+        for candidate in if_none_match.split(",")
+    )
+
+@router.put("/me", response_model=UserSchema)
+async def update_current_user(
+    user_in: UserUpdate,
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Update current user information. Role, username and active state are
+    left to admins: the username is the subject of the user's role links.
+    """
+    # Update user fields
+    changes = {}
+    
+    for field, value in user_in.model_dump(exclude_unset=True, exclude={"role", "username", "is_active"}).items():
+        if field == "password":
+            if value:
+                changes["hashed_password"] = await password_service.hash(value)
+        else:
+            changes[field] = value
+    
+    # Check the new email is not taken by someone else
+    if users_db.find_conflict(changes.get("email", current_user.email), current_user.username, exclude_id=current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User with this email or username already exists",
+        )
+    
+    # Create updated user
+    updated_user = current_user.replace(**changes)
+    
+    # Update user in the database (re-indexes username and email)
+    try:
+        users_db[current_user.id] = updated_user
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User with this email or username already exists",
+        )
+    
+    return JSONResponse(updated_user.public_dict())
+
+@router.get("/{user_id}", response_model=UserSchema)
+def get_user(
+    user_id: str,
+    current_user: User = Depends(check_permission("/users", "GET"))
+) -> Any:
+    """
+    Get a user by ID (requires admin or manager role)
+    """
+    user = _domain_user(user_id, current_user)
+    return JSONResponse(user.public_dict())
+
 @router.put("/{user_id}", response_model=UserSchema)
-def update_user(
+async def update_user(
     user_id: str,
     user_in: UserUpdate,
     current_user: User = Depends(check_permission("/users", "PUT"))
@@ -81,94 +368,75 @@ def update_user(
     """
     Update a user (requires admin role)
     """
-    user = users_db.get(user_id)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found",
-        )
+    user = _domain_user(user_id, current_user)
     
     # Update user fields
-    user_data = user.dict()
+    changes = {}
     
-    for field, value in user_in.dict(exclude_unset=True).items():
-        if field == "password" and value:
-            user_data["hashed_password"] = get_password_hash(value)
+    for field, value in user_in.model_dump(exclude_unset=True).items():
+        if field == "password":
+            if value:
+                changes["hashed_password"] = await password_service.hash(value)
         else:
-            user_data[field] = value
+            changes[field] = value
+    
+    # Check the new email or username is not taken by someone else
+    if users_db.find_conflict(changes.get("email", user.email), changes.get("username", user.username), exclude_id=user_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User with this email or username already exists",
+        )
     
     # Create updated user
-    updated_user = User(**user_data)
+    updated_user = user.replace(**changes)
+    
+    # Update user in the database (re-indexes username and email)
+    try:
+        users_db[user_id] = updated_user
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User with this email or username already exists",
+        )
     
-    # Update user in the database
-    users_db[user_id] = updated_user
+    # A deactivated user's tokens must not be served from the cache
+    if not updated_user.is_active:
+        token_cache.revoke_subject(user_id)
     
-    # Update role in Casbin if it has changed
-    if user_in.role and user_in.role != user.role:
-        CasbinEnforcer.delete_role_for_user(user.username, user.role)
-        CasbinEnforcer.add_role_for_user(updated_user.username, updated_user.role)
-        CasbinEnforcer.save_policy()
+    # Move the user's role link in Casbin if the role or username changed
+    if updated_user.role and (updated_user.role != user.role or updated_user.username != user.username):
+        def change_role():
+            CasbinEnforcer.delete_role_for_user(user.username, user.role, user.domain)
+            CasbinEnforcer.add_role_for_user(updated_user.username, updated_user.role, updated_user.domain)
+        
+        # One write, so no check sees the user between the two links
+        await AsyncCasbinEnforcer.write(change_role)
+        await AsyncCasbinEnforcer.save_policy()
     
-    return updated_user
+    return JSONResponse(updated_user.public_dict())
 
 @router.delete("/{user_id}", response_model=UserSchema)
-def delete_user(
+async def delete_user(
     user_id: str,
     current_user: User = Depends(check_permission("/users", "DELETE"))
 ) -> Any:
     """
     Delete a user (requires admin role)
     """
-    if user_id not in users_db:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found",
-        )
+    user = _domain_user(user_id, current_user)
     
-    user = users_db[user_id]
+    def delete_roles():
+        for role in CasbinEnforcer.get_roles_for_user(user.username, user.domain):
+            CasbinEnforcer.delete_role_for_user(user.username, role, user.domain)
     
     # Delete user from Casbin
-    for role in CasbinEnforcer.get_roles_for_user(user.username):
-        CasbinEnforcer.delete_role_for_user(user.username, role)
+    await AsyncCasbinEnforcer.write(delete_roles)
     
-    # Delete user from the database
+    # Delete user from the database and drop their cached tokens
     deleted_user = users_db.pop(user_id)
+    token_cache.revoke_subject(user_id)
     
     # Save Casbin policy
-    CasbinEnforcer.save_policy()
-    
-    return deleted_user
-
-@router.get("/me", response_model=UserSchema)
-def get_current_user_info(
-    current_user: User = Depends(get_current_user)
-) -> Any:
-    """
-    Get current user information
-    """
-    return current_user
-
-@router.put("/me", response_model=UserSchema)
-def update_current_user(
-    user_in: UserUpdate,
-    current_user: User = Depends(get_current_user)
-) -> Any:
-    """
-    Update current user information
-    """
-    # Update user fields
-    user_data = current_user.dict()
-    
-    for field, value in user_in.dict(exclude_unset=True, exclude={"role"}).items():
-        if field == "password" and value:
-            user_data["hashed_password"] = get_password_hash(value)
-        else:
-            user_data[field] = value
-    
-    # Create updated user
-    updated_user = User(**user_data)
-    
-    # Update user in the database
-    users_db[current_user.id] = updated_user
+    await AsyncCasbinEnforcer.save_policy()
     
-    return updated_user
\ No newline at end of file
+    return JSONResponse(deleted_user.public_dict())
\ No newline at end of file
@@ -1,60 +1,102 @@
-from fastapi import Request, HTTPException, status
+from typing import Optional
+import time
+
+from fastapi import status
 from fastapi.responses import JSONResponse
-from jose import jwt, JWTError
-from typing import Callable, Optional
-from starlette.middleware.base import BaseHTTPMiddleware
+from jose import JWTError
+from pydantic import ValidationError
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ...core.casbin_rbac import AsyncCasbinEnforcer
+from ...models.user import User, users_db
+from ...core.metrics import metrics
+from ...core.token_cache import token_cache
+from ..route_permissions import RoutePermissionTable
 
-from ...config import settings
-from ...core.casbin_rbac import CasbinEnforcer
+_route_check_seconds = metrics.histogram(
+    "authz_route_check_seconds", "AuthorizationMiddleware route permission checks", ["decision"]
+)
+_route_allowed = _route_check_seconds.labels("allow")
+_route_denied = _route_check_seconds.labels("deny")
 
-class AuthorizationMiddleware(BaseHTTPMiddleware):
+class AuthorizationMiddleware:
     """
     Middleware for checking if the user has permission to access the resource.
     This is an alternative to using the check_permission dependency.
+
+    Written as a plain ASGI middleware: it only reads the scope, so the
+    request body and response stream pass through untouched. The permission
+    a request needs is the one its route declares through check_permission,
+    looked up in the app's RoutePermissionTable, and the subject is the
+    username of the user id in the token, checked in the user's domain,
+    exactly as the dependency resolves them. Requests it cannot attribute to an active user or a
+    permission-checked route are passed on for the route's own dependencies
+    to handle, so it is safe to enable globally. Checks the compiled
+    index can answer run on the event loop; others go to a thread through
+    AsyncCasbinEnforcer.
     """
-    
-    async def dispatch(self, request: Request, call_next: Callable):
-        # Skip authorization for auth endpoints
-        if request.url.path.startswith(f"{settings.API_PREFIX}/auth"):
-            return await call_next(request)
-        
-        # Get authorization header
-        authorization = request.headers.get("Authorization")
-        if not authorization:
-            return await call_next(request)
-        
-        # Extract token
-        try:
-            scheme, token = authorization.split()
-            if scheme.lower() != "bearer":
-                return await call_next(request)
-        except ValueError:
-            return await call_next(request)
-        
-        # Decode token
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-            username = payload.get("sub")
-            role = payload.get("role")
-            
-            if not username or not role:
-                return await call_next(request)
-                
-        except JWTError:
-            return await call_next(request)
-        
-        # Check if user has permission to access the resource
-        path = request.url.path
-        method = request.method
-        
-        enforcer = CasbinEnforcer.get_instance()
-        has_permission = enforcer.enforce(username, path, method)
-        
-        if not has_permission:
-            return JSONResponse(
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        table = _route_permissions(scope["app"])
+        route_id = table.match(scope["method"], scope["path"])
+        if route_id is None or not table.permissions_for(route_id):
+            return await self.app(scope, receive, send)
+
+        user = _user_for(scope)
+        if user is None:
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        allowed = await AsyncCasbinEnforcer.read(
+            user.username, table.is_allowed, route_id, user.username, user.domain, dom=user.domain
+        )
+        (_route_allowed if allowed else _route_denied).observe(time.perf_counter() - started)
+        if not allowed:
+            response = JSONResponse(
                 status_code=status.HTTP_403_FORBIDDEN,
-                content={"detail": "Not enough permissions"}
+                content={"detail": "Not enough permissions"},
             )
-        
-        # Continue processing the request
-        return await call_next(request)
\ No newline at end of file
+            return await response(scope, receive, send)
+
+        # Tell check_permission this user already passed the route's checks
+        scope.setdefault("state", {})["authorized_user_id"] = user.id
+        return await self.app(scope, receive, send)
+
+def _route_permissions(app) -> RoutePermissionTable:
+    # Compiled by the startup event; built here for apps without one
+    table = getattr(app.state, "route_permissions", None)
+    if table is None:
+        table = app.state.route_permissions = RoutePermissionTable.from_app(app)
+    return table
+
+def _user_for(scope: Scope) -> Optional[User]:
+    """Resolve the bearer token's user id to an active user"""
+    authorization = None
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            authorization = value
+            break
+    if authorization is None:
+        return None
+
+    scheme, _, token = authorization.decode("latin-1").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+
+    try:
+        token_data = token_cache.verify(token.strip())
+    except (JWTError, ValidationError):
+        return None
+
+    user = users_db.get(token_data.sub)
+    if user is None or not user.is_active:
+        return None
+    if token_data.dom is not None and token_data.dom != user.domain:
+        return None
+    return user
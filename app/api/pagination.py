@@ -0,0 +1,94 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Set, Tuple
+import base64
+import binascii
+import json
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Rows serialized per streamed chunk
+STREAM_CHUNK_ROWS = 256
+
+def encode_cursor(seq: int) -> str:
+    return base64.urlsafe_b64encode(str(seq).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    """Get the sequence number an opaque cursor points after (0 for the start)"""
+    if not cursor:
+        return 0
+    try:
+        seq = int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        seq = -1
+    if seq < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+    return seq
+
+def parse_fields(fields: Optional[str], allowed: Optional[Iterable[str]] = None) -> Optional[Set[str]]:
+    """Parse a comma-separated projection, rejecting fields outside allowed"""
+    if fields is None:
+        return None
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = selected - set(allowed) if allowed is not None else set()
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+        )
+    return selected
+
+def wants_ndjson(request: Request, format: Optional[str]) -> bool:
+    if format is not None:
+        return format == "ndjson"
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def paginate(
+    rows: Iterator[Tuple[int, Any]],
+    serialize: Callable[[Any], Dict],
+    limit: Optional[int],
+    ndjson: bool,
+):
+    """
+    Respond with rows in keyset order: a JSON page of at most limit items
+    with the cursor of the next page, or an NDJSON stream serialized chunk
+    by chunk. A stream cut short by limit ends with a {"next_cursor": ...}
+    line. serialize must return JSON-ready dicts.
+    """
+    if ndjson:
+        return StreamingResponse(_ndjson_chunks(rows, serialize, limit), media_type=NDJSON_MEDIA_TYPE)
+
+    items = []
+    last_seq = None
+    next_cursor = None
+    for seq, row in rows:
+        if limit is not None and len(items) == limit:
+            next_cursor = encode_cursor(last_seq)
+            break
+        items.append(serialize(row))
+        last_seq = seq
+    return JSONResponse({"items": items, "next_cursor": next_cursor})
+
+def _ndjson_chunks(rows, serialize, limit):
+    lines = []
+    sent = 0
+    last_seq = None
+    for seq, row in rows:
+        if limit is not None and sent == limit:
+            lines.append(_dumps({"next_cursor": encode_cursor(last_seq)}))
+            break
+        lines.append(_dumps(serialize(row)))
+        sent += 1
+        last_seq = seq
+        if len(lines) == STREAM_CHUNK_ROWS:
+            yield "".join(lines).encode()
+            lines = []
+    if lines:
+        yield "".join(lines).encode()
+
+def _dumps(value: Dict) -> str:
+    return json.dumps(value, separators=(",", ":")) + "\n"
@@ -0,0 +1,160 @@
+import sys
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from ..core.casbin_rbac import CasbinEnforcer
+
+class RoutePermissionTable:
+    """
+    Route-to-permission map compiled once from the app's routes.
+
+    Every (route, method) gets a route id and the interned (resource, action)
+    pairs its check_permission dependencies declare. Each role's direct
+    grants are a bitmask over those permissions; the masks of a subject's
+    role closure are OR-ed (cached per closure) and mapped to an
+    allow-bitmap over route ids (cached per permission mask). Authorizing a
+    request is then a route-id lookup plus one bit test. Under a domain
+    model, role and closure masks are kept per domain. The caches are
+    dropped lazily whenever the policy version changes.
+    """
+
+    # Entries kept in each mask cache before it is reset
+    MAX_CACHED_ENTRIES = 10000
+
+    def __init__(self, routes):
+        self._permissions: List[Tuple[Tuple[str, str], ...]] = []
+        self._templates: List[str] = []
+        self._static: Dict[Tuple[str, str], int] = {}
+        self._dynamic = []
+        # Distinct permissions, each with a bit in a role's permission mask
+        self._permission_ids: Dict[Tuple[str, str], int] = {}
+        # Per route, the permission bits it requires
+        self._required: List[int] = []
+
+        for route in routes:
+            dependant = getattr(route, "dependant", None)
+            methods = getattr(route, "methods", None)
+            if dependant is None or not methods:
+                continue
+            permissions = _declared_permissions(dependant)
+            required = 0
+            for permission in permissions:
+                bit = self._permission_ids.setdefault(permission, len(self._permission_ids))
+                required |= 1 << bit
+
+            for method in sorted(methods):
+                route_id = len(self._permissions)
+                self._permissions.append(permissions)
+                self._templates.append(f"{method} {route.path}")
+                self._required.append(required)
+                if route.param_convertors:
+                    self._dynamic.append((route_id, method, route.path_regex))
+                else:
+                    self._static.setdefault((method, route.path), route_id)
+
+        self._lock = threading.Lock()
+        self._version = None
+        # Permission bits granted directly, per (domain, role or user name)
+        self._role_masks: Dict[Tuple[Optional[str], str], int] = {}
+        # Permission bits held through a (domain, tuple of inherited roles)
+        self._closure_masks: Dict[tuple, int] = {}
+        # Route allow-bitmap per set of held permission bits
+        self._allow_masks: Dict[int, int] = {}
+
+    @classmethod
+    def from_app(cls, app):
+        return cls(app.routes)
+
+    def match(self, method: str, path: str) -> Optional[int]:
+        """Get the id of the route the router would dispatch to, if any"""
+        route_id = self._static.get((method, path))
+        # Routes are tried in declaration order, so a templated route only
+        # wins if it was declared before the static match
+        for candidate, candidate_method, regex in self._dynamic:
+            if route_id is not None and candidate > route_id:
+                break
+            if candidate_method == method and regex.match(path):
+                return candidate
+        return route_id
+
+    def permissions_for(self, route_id: int) -> Tuple[Tuple[str, str], ...]:
+        return self._permissions[route_id]
+
+    def template_for(self, route_id: int) -> str:
+        """Get "METHOD /path/{param}" for a route id"""
+        return self._templates[route_id]
+
+    def is_allowed(self, route_id: int, sub: str, dom: Optional[str] = None) -> bool:
+        """Check whether a subject holds every permission a route declares (in a domain)"""
+        if not self._required[route_id]:
+            return True
+        roles = CasbinEnforcer.roles_for(sub, dom)
+        if roles is None:
+            # Not plain RBAC: no closures to fold, ask the enforcer directly
+            return all(CasbinEnforcer.enforce(sub, resource, action, dom) for resource, action in self._permissions[route_id])
+        return bool(self._allow_mask(roles, dom) >> route_id & 1)
+
+    def _allow_mask(self, roles: tuple, dom: Optional[str] = None) -> int:
+        version = CasbinEnforcer.get_policy_version()
+        with self._lock:
+            if self._version != version:
+                self._version = version
+                self._role_masks.clear()
+                self._closure_masks.clear()
+                self._allow_masks.clear()
+
+        # The subject's own grants, then those of the roles it inherits,
+        # which many users share
+        held = self._role_mask(roles[0], dom, version)
+        inherited = (dom, roles[1:])
+        closure_mask = self._closure_masks.get(inherited)
+        if closure_mask is None:
+            closure_mask = 0
+            for role in roles[1:]:
+                closure_mask |= self._role_mask(role, dom, version)
+            self._store(self._closure_masks, inherited, closure_mask, version)
+        held |= closure_mask
+
+        allow_mask = self._allow_masks.get(held)
+        if allow_mask is None:
+            allow_mask = 0
+            for route_id, required in enumerate(self._required):
+                if required & held == required:
+                    allow_mask |= 1 << route_id
+            self._store(self._allow_masks, held, allow_mask, version)
+        return allow_mask
+
+    def _role_mask(self, role: str, dom: Optional[str], version: int) -> int:
+        """Get the bits of the permissions granted to a role (or user) directly"""
+        mask = self._role_masks.get((dom, role))
+        if mask is None:
+            mask = 0
+            permissions = list(self._permission_ids)
+            for permission, allowed in zip(permissions, CasbinEnforcer.enforce_direct(role, permissions, dom)):
+                if allowed:
+                    mask |= 1 << self._permission_ids[permission]
+            self._store(self._role_masks, (dom, role), mask, version)
+        return mask
+
+    def _store(self, cache: dict, key, value: int, version: int) -> None:
+        with self._lock:
+            if self._version != version:
+                return
+            if len(cache) >= self.MAX_CACHED_ENTRIES:
+                cache.clear()
+            cache[key] = value
+
+def _declared_permissions(dependant) -> Tuple[Tuple[str, str], ...]:
+    """Collect the (resource, action) pairs check_permission dependencies declare"""
+    permissions = []
+    pending = list(dependant.dependencies)
+    while pending:
+        dependency = pending.pop()
+        resource = getattr(dependency.call, "resource", None)
+        action = getattr(dependency.call, "action", None)
+        if resource is not None and action is not None:
+            permission = (sys.intern(resource), sys.intern(action))
+            if permission not in permissions:
+                permissions.append(permission)
+        pending.extend(dependency.dependencies)
+    return tuple(permissions)
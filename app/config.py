@@ -1,4 +1,5 @@
 import os
+from typing import List
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,10 +8,66 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-super-secret-key-placeholder")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Token verification: "jose", or "native" for stdlib HMAC checks of HS* tokens
+    JWT_BACKEND: str = "native"
+    # Verified tokens kept until they expire, so repeat requests skip decoding
+    TOKEN_CACHE_SIZE: int = 10000
+    
+    # Password hashing pool: bcrypt workers and the in-flight limit before 503s
+    PASSWORD_HASH_WORKERS: int = os.cpu_count() or 2
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    # Login attempts allowed per username and per client IP in a sliding
+    # window before 429s, 0 for no limit; a successful login clears the username's
+    LOGIN_THROTTLE_MAX_PER_USERNAME: int = 10
+    LOGIN_THROTTLE_MAX_PER_IP: int = 100
+    LOGIN_THROTTLE_WINDOW_SECONDS: int = 300
+    # Counters kept (24 bytes each); the least loaded are reused when full
+    LOGIN_THROTTLE_SLOTS: int = 65536
+    # File mapped to share counters between workers on the host, "" for per process
+    LOGIN_THROTTLE_SHARED_PATH: str = ""
+    # Most users accepted by one bulk import request
+    USER_IMPORT_MAX_ROWS: int = 10000
     
     # RBAC settings
     CASBIN_MODEL_PATH: str = "rbac_model.conf"
     CASBIN_POLICY_PATH: str = "policy.csv"
+    # Policy storage backend: "csv" or "sqlite"
+    CASBIN_POLICY_BACKEND: str = "csv"
+    CASBIN_SQLITE_PATH: str = "policy.db"
+    # Only load user-to-role rows from SQLite for subjects being checked (whole
+    # tenants under a domain model)
+    CASBIN_SQLITE_LAZY_SUBJECTS: bool = True
+    # Persist policy changes to an append-only log compacted into the policy file
+    CASBIN_POLICY_LOG_ENABLED: bool = True
+    CASBIN_POLICY_LOG_PATH: str = "policy.csv.log"
+    CASBIN_POLICY_FSYNC_INTERVAL_MS: int = 20
+    CASBIN_POLICY_COMPACT_THRESHOLD: int = 10000
+    CASBIN_POLICY_COMPACT_INTERVAL_SECONDS: int = 60
+    # Precompiled binary copy of the policy file for fast startup, "" to disable
+    CASBIN_SNAPSHOT_PATH: str = "policy.csv.snapshot"
+    # Broadcast policy deltas to sibling workers over Unix sockets in this directory
+    CASBIN_WATCHER_ENABLED: bool = False
+    CASBIN_WATCHER_DIR: str = ".casbin-watcher"
+    # Tenant for users, tokens and checks that name none, under a domain model
+    # (r = sub, dom, obj, act) such as rbac_with_domains_model.conf
+    DEFAULT_DOMAIN: str = "default"
+    # Tenants kept loaded from a lazily loaded SQLite store, 0 for no limit
+    CASBIN_MAX_LOADED_DOMAINS: int = 0
+    # Use the compiled RBACIndex when the model is plain or domain RBAC
+    CASBIN_FAST_ENGINE: bool = True
+    CASBIN_DECISION_CACHE_SIZE: int = 4096
+    CASBIN_DECISION_CACHE_TTL_SECONDS: int = 300
+    
+    # Resource storage: "memory", or "sqlite" to persist and share across workers
+    RESOURCE_BACKEND: str = "sqlite"
+    RESOURCE_SQLITE_PATH: str = "resources.db"
+    # Resource attributes indexed for ?<name>= filters, besides created_by
+    RESOURCE_INDEXED_ATTRIBUTES: List[str] = []
+    
+    # Timing histograms for hot paths, served to admins at {API_PREFIX}/metrics
+    METRICS_ENABLED: bool = True
+    # Allow admins to start and stop the sampling profiler over the API
+    PROFILER_ENABLED: bool = False
     
     class Config:
         env_file = ".env"
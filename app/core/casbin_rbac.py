@@ -1,71 +1,1396 @@
+import asyncio
 import casbin
+import functools
+import hashlib
 import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
 from ..config import settings
+from .metrics import metrics
+from .policy_log import ChangeLogFileAdapter
+from .policy_snapshot import PolicySnapshot, SnapshotFileAdapter, compile_snapshot
+from .policy_watcher import UnixSocketWatcher
+from .sqlite_adapter import Filter, SQLiteAdapter
+
+# Overlay markers: a key absent from the changes, and a key removed there
+_MISSING = object()
+_REMOVED = object()
+
+class _Overlay:
+    """
+    Mapping for index snapshots whose copy costs its recent changes, not
+    its size. A base dict, shared by copies and never changed, sits under
+    a small dict of changes. Once the changes outgrow about the square
+    root of the base, copy() folds them into a new base.
+    """
+    
+    __slots__ = ("_base", "_changes")
+    
+    def __init__(self, base=None):
+        self._base = {} if base is None else base
+        self._changes = {}
+    
+    def copy(self):
+        changes = self._changes
+        if len(changes) <= 32 + len(self._base) ** 0.5:
+            overlay = _Overlay(self._base)
+            overlay._changes = dict(changes)
+            return overlay
+        base = dict(self._base)
+        for key, value in changes.items():
+            if value is _REMOVED:
+                base.pop(key, None)
+            else:
+                base[key] = value
+        return _Overlay(base)
+    
+    def get(self, key, default=None):
+        value = self._changes.get(key, _MISSING)
+        if value is _MISSING:
+            return self._base.get(key, default)
+        return default if value is _REMOVED else value
+    
+    def __contains__(self, key):
+        value = self._changes.get(key, _MISSING)
+        if value is _MISSING:
+            return key in self._base
+        return value is not _REMOVED
+    
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+    
+    def __setitem__(self, key, value):
+        self._changes[key] = value
+    
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        if key in self._base:
+            self._changes[key] = _REMOVED
+        else:
+            del self._changes[key]
+    
+    def pop(self, key, default=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        del self[key]
+        return value
+    
+    def __iter__(self):
+        changes = self._changes
+        for key in self._base:
+            if key not in changes:
+                yield key
+        for key, value in list(changes.items()):
+            if value is not _REMOVED:
+                yield key
+
+class RBACIndex:
+    """
+    Compiled enforcement engine for the plain RBAC model we ship
+    (r = sub, obj, act; one g role relation; allow-only effect).
+    Policies live in a hash set of (role, obj, act) and every subject in the
+    role graph has its transitive role closure precomputed, so a decision is
+    one set lookup per role.
+    
+    Each subject's effective permissions (everything its closure grants)
+    are materialized on first request and recomputed only for the
+    materialized subjects a rule or link change reaches.
+    
+    CasbinEnforcer treats a published index as an immutable snapshot:
+    changes are applied to a copy() and the copy is swapped in. The
+    mutators replace inner sets instead of updating them, and the
+    top-level containers are overlays, so a copy only duplicates what
+    changed lately and a write costs the same however large the policy.
+    """
+    
+    REQUEST_TOKENS = ["r_sub", "r_obj", "r_act"]
+    POLICY_TOKENS = ["p_sub", "p_obj", "p_act"]
+    EFFECT = "some(where (p_eft == allow))"
+    MATCHER = "g(r_sub,p_sub)&&r_obj==p_obj&&r_act==p_act"
+    ROLE_FIELDS = 2
+    
+    def __init__(self, policies, groupings, max_hierarchy_level=10, closures=None):
+        self._max_hierarchy_level = max_hierarchy_level
+        # (role, obj, act) -> True
+        permissions = {}
+        # (role, act) -> objects, for deriving everything a subject may access
+        objects = {}
+        # role -> (obj, act) pairs granted to it directly
+        grants = {}
+        for role, obj, act in policies:
+            permissions[(role, obj, act)] = True
+            objects.setdefault((role, act), set()).add(obj)
+            grants.setdefault(role, set()).add((obj, act))
+        parents = {}
+        children = {}
+        for user, role in groupings:
+            parents.setdefault(user, set()).add(role)
+            children.setdefault(role, set()).add(user)
+        self._permissions = _Overlay(permissions)
+        self._objects = _Overlay(objects)
+        self._grants = _Overlay(grants)
+        self._parents = _Overlay(parents)
+        self._children = _Overlay(children)
+        # sub -> (tag, permissions, closure) for materialized subjects, and
+        # role -> the materialized subjects whose closure includes it
+        self._effective = _Overlay()
+        self._viewers = _Overlay()
+        # Readers materialize into a published index, so this guards them
+        # against each other and against copy()
+        self._view_lock = threading.Lock()
+        if closures is not None:
+            # Precompiled for exactly these groupings (see policy_snapshot)
+            self._closures = _Overlay(dict(closures))
+            return
+        self._closures = _Overlay({sub: self._walk(sub) for sub in parents})
+    
+    @classmethod
+    def supports(cls, model):
+        """Check whether a casbin model has exactly the shape this index implements"""
+        return _has_shape(model, cls)
+    
+    @classmethod
+    def from_enforcer(cls, enforcer, closures=None):
+        """Compile the enforcer's current policy, or return None if the model is not plain RBAC"""
+        if not cls.supports(enforcer.get_model()):
+            return None
+        return cls(
+            enforcer.get_policy(),
+            enforcer.get_grouping_policy(),
+            enforcer.get_role_manager().max_hierarchy_level,
+            closures,
+        )
+    
+    def copy(self):
+        """Get an index sharing this one's contents, safe to change and publish"""
+        index = RBACIndex.__new__(RBACIndex)
+        index._max_hierarchy_level = self._max_hierarchy_level
+        index._permissions = self._permissions.copy()
+        index._objects = self._objects.copy()
+        index._parents = self._parents.copy()
+        index._children = self._children.copy()
+        index._closures = self._closures.copy()
+        index._grants = self._grants.copy()
+        with self._view_lock:
+            index._effective = self._effective.copy()
+            index._viewers = self._viewers.copy()
+        index._view_lock = threading.Lock()
+        return index
+    
+    def _walk(self, sub):
+        # Mirrors casbin's RoleManager.has_link, which gives up after
+        # max_hierarchy_level - 1 hops
+        closure = [sub]
+        visited = {sub}
+        frontier = [sub]
+        for _ in range(self._max_hierarchy_level - 1):
+            next_frontier = []
+            for name in frontier:
+                for role in self._parents.get(name, ()):
+                    if role not in visited:
+                        visited.add(role)
+                        closure.append(role)
+                        next_frontier.append(role)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        return tuple(closure)
+    
+    def _refresh_closures(self, sub):
+        """Recompute closures for a subject and everything that inherits from it"""
+        affected = {sub}
+        pending = [sub]
+        while pending:
+            for child in self._children.get(pending.pop(), ()):
+                if child not in affected:
+                    affected.add(child)
+                    pending.append(child)
+        for name in affected:
+            if self._parents.get(name):
+                self._closures[name] = self._walk(name)
+            else:
+                self._closures.pop(name, None)
+        for name in affected:
+            if name in self._effective:
+                self._materialize(name)
+    
+    def _materialize(self, sub):
+        """Compute and store a subject's effective permissions, tracking the roles they came from"""
+        roles = self.roles_for(sub)
+        grants = set()
+        for role in roles:
+            grants.update(self._grants.get(role, ()))
+        permissions = tuple(sorted(grants))
+        previous = self._effective.get(sub)
+        view = self._effective[sub] = (permission_tag(permissions), permissions, roles)
+        if previous is None or previous[2] != roles:
+            old_roles = previous[2] if previous is not None else ()
+            for role in old_roles:
+                if role not in roles:
+                    _remove_member(self._viewers, role, sub)
+            for role in roles:
+                _add_member(self._viewers, role, sub)
+        return view
+    
+    def effective_permissions(self, sub):
+        """
+        Get (tag, permissions): every (obj, act) pair sub may perform,
+        sorted, and a digest of them that changes whenever they do
+        """
+        view = self._effective.get(sub)
+        if view is None:
+            with self._view_lock:
+                view = self._effective.get(sub) or self._materialize(sub)
+        return view[0], view[1]
+    
+    def roles_for(self, sub):
+        """Get the subject followed by every role it inherits"""
+        # The hot path: _Overlay.get inlined
+        closures = self._closures
+        closure = closures._changes.get(sub, _MISSING)
+        if closure is _MISSING:
+            closure = closures._base.get(sub)
+        elif closure is _REMOVED:
+            closure = None
+        return closure or (sub,)
+    
+    def enforce(self, sub, obj, act):
+        return self.enforce_roles(self.roles_for(sub), obj, act)
+    
+    def enforce_roles(self, roles, obj, act):
+        """Check a request against a closure already resolved with roles_for"""
+        # The hot path: _Overlay.__contains__ inlined
+        changes = self._permissions._changes
+        base = self._permissions._base
+        for role in roles:
+            key = (role, obj, act)
+            granted = changes.get(key, _MISSING)
+            if granted is _MISSING:
+                if key in base:
+                    return True
+            elif granted is not _REMOVED:
+                return True
+        return False
+    
+    def objects_for(self, sub, act, prefix=""):
+        """Get every object the subject may perform act on, optionally under a prefix"""
+        objects = set()
+        for role in self.roles_for(sub):
+            for obj in self._objects.get((role, act), ()):
+                if obj.startswith(prefix):
+                    objects.add(obj)
+        return objects
+    
+    def add_permission(self, role, obj, act):
+        self._permissions[(role, obj, act)] = True
+        _add_member(self._objects, (role, act), obj)
+        _add_member(self._grants, role, (obj, act))
+        for sub in self._viewers.get(role, ()):
+            self._materialize(sub)
+    
+    def remove_permission(self, role, obj, act):
+        self._permissions.pop((role, obj, act), None)
+        _remove_member(self._objects, (role, act), obj)
+        _remove_member(self._grants, role, (obj, act))
+        for sub in self._viewers.get(role, ()):
+            self._materialize(sub)
+    
+    def add_link(self, user, role):
+        _add_member(self._parents, user, role)
+        _add_member(self._children, role, user)
+        self._refresh_closures(user)
+    
+    def remove_link(self, user, role):
+        _remove_member(self._parents, user, role)
+        _remove_member(self._children, role, user)
+        self._refresh_closures(user)
+
+class DomainRBACIndex:
+    """
+    Compiled engine for the multi-tenant RBAC model
+    (r = sub, dom, obj, act; g = _, _, _; rules and role links scoped to
+    a domain). Each domain's rules and links form a plain RBACIndex
+    partition, so a check, a closure refresh or a copy for publishing only
+    touches the tenant it concerns, and a tenant can be added or dropped
+    as a unit.
+    
+    Methods take arguments in casbin's order (add_link(user, role, dom)).
+    Copies share partitions; the first change a copy makes to a domain
+    copies that domain's partition.
+    """
+    
+    REQUEST_TOKENS = ["r_sub", "r_dom", "r_obj", "r_act"]
+    POLICY_TOKENS = ["p_sub", "p_dom", "p_obj", "p_act"]
+    EFFECT = RBACIndex.EFFECT
+    MATCHER = "g(r_sub,p_sub,r_dom)&&r_dom==p_dom&&r_obj==p_obj&&r_act==p_act"
+    ROLE_FIELDS = 3
+    
+    def __init__(self, policies, groupings, max_hierarchy_level=10):
+        self._max_hierarchy_level = max_hierarchy_level
+        rules = {}
+        links = {}
+        for rule in policies:
+            rules.setdefault(rule[1], []).append((rule[0], rule[2], rule[3]))
+        for rule in groupings:
+            links.setdefault(rule[2], []).append((rule[0], rule[1]))
+        self._partitions = {
+            dom: RBACIndex(rules.get(dom, ()), links.get(dom, ()), max_hierarchy_level)
+            for dom in rules.keys() | links.keys()
+        }
+        # Partitions this copy made its own and may change in place
+        self._owned = set(self._partitions)
+        self._empty = RBACIndex((), (), max_hierarchy_level)
+    
+    @classmethod
+    def supports(cls, model):
+        """Check whether a casbin model has exactly the shape this index implements"""
+        return _has_shape(model, cls)
+    
+    @classmethod
+    def from_enforcer(cls, enforcer):
+        """Compile the enforcer's current policy, or return None if the model is not domain RBAC"""
+        if not cls.supports(enforcer.get_model()):
+            return None
+        return cls(
+            enforcer.get_policy(),
+            enforcer.get_grouping_policy(),
+            enforcer.get_role_manager().max_hierarchy_level,
+        )
+    
+    @classmethod
+    def compile_partition(cls, policies, groupings, max_hierarchy_level=10):
+        """Compile one domain's casbin rows into a partition for set_partition"""
+        return RBACIndex(
+            [(rule[0], rule[2], rule[3]) for rule in policies],
+            [(rule[0], rule[1]) for rule in groupings],
+            max_hierarchy_level,
+        )
+    
+    def copy(self):
+        """Get an index sharing this one's partitions, safe to change and publish"""
+        index = DomainRBACIndex.__new__(DomainRBACIndex)
+        index._max_hierarchy_level = self._max_hierarchy_level
+        index._partitions = dict(self._partitions)
+        index._owned = set()
+        index._empty = self._empty
+        return index
+    
+    def domains(self):
+        return self._partitions.keys()
+    
+    def partition(self, dom):
+        """Get the plain RBAC index of one domain, which must not be changed"""
+        return self._partitions.get(dom) or self._empty
+    
+    def _writable(self, dom):
+        partition = self._partitions.get(dom)
+        if dom not in self._owned:
+            partition = partition.copy() if partition is not None else RBACIndex((), (), self._max_hierarchy_level)
+            self._partitions[dom] = partition
+            self._owned.add(dom)
+        return partition
+    
+    def set_partition(self, dom, partition):
+        self._partitions[dom] = partition
+        self._owned.discard(dom)
+    
+    def drop_partition(self, dom):
+        self._partitions.pop(dom, None)
+        self._owned.discard(dom)
+    
+    def roles_for(self, sub, dom):
+        return self.partition(dom).roles_for(sub)
+    
+    def enforce(self, sub, dom, obj, act):
+        return self.partition(dom).enforce(sub, obj, act)
+    
+    def effective_permissions(self, sub, dom):
+        return self.partition(dom).effective_permissions(sub)
+    
+    def add_permission(self, role, dom, obj, act):
+        self._writable(dom).add_permission(role, obj, act)
+    
+    def remove_permission(self, role, dom, obj, act):
+        if dom in self._partitions:
+            self._writable(dom).remove_permission(role, obj, act)
+    
+    def add_link(self, user, role, dom):
+        self._writable(dom).add_link(user, role)
+    
+    def remove_link(self, user, role, dom):
+        if dom in self._partitions:
+            self._writable(dom).remove_link(user, role)
+
+def _has_shape(model, index_class):
+    sections = model.model
+    try:
+        return (
+            set(sections.keys()) == {"r", "p", "g", "e", "m"}
+            and list(sections["r"].keys()) == ["r"]
+            and list(sections["p"].keys()) == ["p"]
+            and list(sections["g"].keys()) == ["g"]
+            and sections["r"]["r"].tokens == index_class.REQUEST_TOKENS
+            and sections["p"]["p"].tokens == index_class.POLICY_TOKENS
+            and len(sections["g"]["g"].tokens) == index_class.ROLE_FIELDS
+            and sections["e"]["e"].value == index_class.EFFECT
+            and sections["m"]["m"].value.replace(" ", "") == index_class.MATCHER
+        )
+    except (KeyError, AttributeError):
+        return False
+
+def permission_tag(permissions):
+    """Digest sorted (obj, act) pairs, for use as an ETag"""
+    digest = hashlib.blake2b(digest_size=12)
+    for obj, act in permissions:
+        digest.update(f"{obj}\0{act}\n".encode())
+    return digest.hexdigest()
+
+def _has_domains(model):
+    """Check whether requests carry a domain (r = sub, dom, obj, act)"""
+    try:
+        return model.model["r"]["r"].tokens == DomainRBACIndex.REQUEST_TOKENS
+    except KeyError:
+        return False
+
+def _add_member(groups, key, member):
+    # A new set rather than an update: other snapshots may share the old one
+    members = groups.get(key)
+    if members is None:
+        groups[key] = {member}
+    elif member not in members:
+        groups[key] = members | {member}
+
+def _remove_member(groups, key, member):
+    members = groups.get(key)
+    if members is not None and member in members:
+        if len(members) == 1:
+            del groups[key]
+        else:
+            groups[key] = members - {member}
+
+_enforce_seconds = metrics.histogram(
+    "casbin_enforce_seconds", "CasbinEnforcer.enforce latency by decision cache outcome", ["cache"]
+)
+_enforce_hit = _enforce_seconds.labels("hit")
+_enforce_miss = _enforce_seconds.labels("miss")
+_policy_write_seconds = metrics.histogram(
+    "casbin_policy_write_seconds", "Time to persist policy changes", ["op"]
+)
+
+class RWLock:
+    """
+    Readers-writer lock for threads. Like AsyncRWLock, writers are
+    preferred. The write side is reentrant, and the thread holding it may
+    take the read side too.
+    """
+    
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._waiting_writers = 0
+    
+    @contextmanager
+    def read(self):
+        if self._writer == threading.get_ident():
+            yield
+            return
+        with self._condition:
+            self._condition.wait_for(lambda: self._writer is None and not self._waiting_writers)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+    
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        if self._writer == me:
+            yield
+            return
+        with self._condition:
+            self._waiting_writers += 1
+            try:
+                self._condition.wait_for(lambda: self._writer is None and not self._readers)
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = None
+                self._condition.notify_all()
 
 class CasbinEnforcer:
     _instance = None
+    # Guards the casbin model, which is updated in place. Writers take the
+    # write side, which also keeps model changes and persistence in order;
+    # casbin evaluations share the read side.
+    _policy_lock = RWLock()
+    # Fast-path engine: RBACIndex, DomainRBACIndex for the domain model, or
+    # None when the model is neither or it is disabled.
+    # An immutable snapshot: readers take the reference once and use it
+    # without locking; writers publish a changed copy (see _publish)
+    _index = None
+    # Whether requests, rules and role links carry a domain (tenant)
+    _domains = False
+    # Subjects whose g rows have been pulled from a lazily loaded store,
+    # None when the whole policy is in memory
+    _loaded_subjects = None
+    # Domains whose rules have been pulled from a lazily loaded store, least
+    # recently used first; None when the whole policy is in memory
+    _loaded_domains = None
+    
+    # Bounded LRU of casbin requests, (sub, obj, act) or (sub, dom, obj, act),
+    # to (decision, expires_at)
+    _decision_cache = OrderedDict()
+    _cache_lock = threading.Lock()
+    _cache_hits = 0
+    _cache_misses = 0
+    _policy_version = 0
     
     @classmethod
     def get_instance(cls):
-        if cls._instance is None:
-            cls._instance = cls._create_enforcer()
-        return cls._instance
+        enforcer = cls._instance
+        if enforcer is not None:
+            return enforcer
+        # Double-checked so concurrent first requests build a single enforcer
+        with cls._policy_lock.write():
+            if cls._instance is None:
+                enforcer = cls._create_enforcer()
+                cls._domains = _has_domains(enforcer.get_model())
+                cls._index = cls._build_index(enforcer) if settings.CASBIN_FAST_ENGINE else None
+                cls._instance = enforcer
+                if settings.CASBIN_WATCHER_ENABLED:
+                    watcher = UnixSocketWatcher(settings.CASBIN_WATCHER_DIR, cls._apply_policy_delta)
+                    watcher.set_update_callback(cls._reload_policy)
+                    enforcer.set_watcher(watcher)
+            return cls._instance
+    
+    @classmethod
+    def _build_index(cls, enforcer):
+        """Compile the index, reusing a snapshot's role closures when the model came from one unchanged"""
+        if _has_domains(enforcer.get_model()):
+            return DomainRBACIndex.from_enforcer(enforcer)
+        snapshot = getattr(enforcer.get_adapter(), "loaded_snapshot", None)
+        closures = None
+        if snapshot is not None and snapshot.max_hierarchy_level == enforcer.get_role_manager().max_hierarchy_level:
+            closures = snapshot.closures
+        return RBACIndex.from_enforcer(enforcer, closures)
+    
+    @classmethod
+    def _publish(cls, apply):
+        """
+        Apply changes to a copy of the compiled index and swap it in, so
+        readers see all of them or none; callers hold _policy_lock for writing
+        """
+        index = cls._index
+        if index is not None:
+            index = index.copy()
+            apply(index)
+            cls._index = index
     
     @classmethod
     def _create_enforcer(cls):
         model_path = settings.CASBIN_MODEL_PATH
         policy_path = settings.CASBIN_POLICY_PATH
+        cls._loaded_subjects = None
+        cls._loaded_domains = None
+        
+        if settings.CASBIN_POLICY_BACKEND == "sqlite":
+            return cls._create_sqlite_enforcer(model_path, policy_path)
         
         # Ensure the model and policy files exist
         if not os.path.exists(model_path) or not os.path.exists(policy_path):
             raise FileNotFoundError(f"Casbin model or policy file not found: {model_path}, {policy_path}")
         
-        return casbin.Enforcer(model_path, policy_path)
+        snapshot_loader = cls._snapshot_loader(model_path, policy_path)
+        if not settings.CASBIN_POLICY_LOG_ENABLED:
+            return casbin.Enforcer(model_path, SnapshotFileAdapter(policy_path, snapshot_loader))
+        
+        adapter = ChangeLogFileAdapter(
+            policy_path,
+            log_path=settings.CASBIN_POLICY_LOG_PATH or None,
+            fsync_interval=settings.CASBIN_POLICY_FSYNC_INTERVAL_MS / 1000,
+            compact_threshold=settings.CASBIN_POLICY_COMPACT_THRESHOLD,
+            compact_interval=settings.CASBIN_POLICY_COMPACT_INTERVAL_SECONDS,
+            snapshot_loader=snapshot_loader,
+        )
+        return casbin.Enforcer(model_path, adapter)
     
     @classmethod
-    def enforce(cls, sub, obj, act):
-        """Check if a user has permission to access a resource"""
+    def _snapshot_loader(cls, model_path, policy_path):
+        """
+        Get a loader for the policy file's precompiled snapshot. When there
+        is no usable one (missing, or the files changed since), a fresh one
+        is compiled in the background for the next start.
+        """
+        path = settings.CASBIN_SNAPSHOT_PATH
+        if not path:
+            return None
+        
+        def load():
+            snapshot = PolicySnapshot.load(path, model_path, policy_path)
+            if snapshot is None:
+                threading.Thread(
+                    target=compile_snapshot,
+                    args=(model_path, policy_path, path),
+                    name="policy-snapshot",
+                    daemon=True,
+                ).start()
+            return snapshot
+        return load
+    
+    @classmethod
+    def _create_sqlite_enforcer(cls, model_path, policy_path):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Casbin model file not found: {model_path}")
+        
+        lazy = settings.CASBIN_SQLITE_LAZY_SUBJECTS
+        adapter = SQLiteAdapter(settings.CASBIN_SQLITE_PATH, filtered=lazy)
+        # Seed an empty store from the CSV policy
+        if adapter.is_empty() and os.path.exists(policy_path):
+            adapter.import_csv(policy_path)
+        
+        enforcer = casbin.Enforcer(model_path, adapter)
+        if lazy and _has_domains(enforcer.get_model()):
+            # Each tenant's rules and links are pulled together on first use
+            enforcer.load_filtered_policy(Filter(P=[[]], G=[[]]))
+            cls._loaded_domains = OrderedDict()
+        elif lazy:
+            # Load every p rule up front; g rows are pulled per subject
+            enforcer.load_filtered_policy(Filter(G=[[]]))
+            cls._loaded_subjects = set()
+        return enforcer
+    
+    @classmethod
+    def _load_subjects(cls, *subjects):
+        """Pull g rows for subjects, and every role they reach, from a lazily loaded store"""
+        loaded = cls._loaded_subjects
+        if loaded is None or all(sub in loaded for sub in subjects):
+            return
+        
+        enforcer = cls._instance
+        adapter = enforcer.get_adapter()
+        role_manager = enforcer.get_role_manager()
+        with cls._policy_lock.write():
+            pending = {sub for sub in subjects if sub not in loaded}
+            queried = set()
+            links = []
+            while pending:
+                reached = set()
+                for ptype, rule in adapter.query(["g"], [sorted(pending)]):
+                    user, role = rule[0], rule[1]
+                    if enforcer.get_model().add_policy("g", ptype, rule):
+                        role_manager.add_link(user, role)
+                        links.append((user, role))
+                    reached.add(role)
+                queried.update(pending)
+                pending = reached - loaded - queried
+            
+            def add_links(index):
+                for user, role in links:
+                    index.add_link(user, role)
+            
+            if links:
+                cls._publish(add_links)
+            # Marked loaded only once the published index has their roles
+            loaded.update(queried)
+    
+    @classmethod
+    def _load_domain(cls, dom):
+        """
+        Pull a tenant's rules and role links from a lazily loaded store,
+        dropping the least recently used tenants beyond
+        CASBIN_MAX_LOADED_DOMAINS; returns the tenant's index partition
+        """
+        loaded = cls._loaded_domains
+        if loaded is None:
+            return None
+        enforcer = cls._instance
+        with cls._policy_lock.write():
+            if dom in loaded:
+                loaded.move_to_end(dom)
+                return cls._index.partition(dom) if cls._index is not None else None
+            
+            adapter = enforcer.get_adapter()
+            policies = [rule for _, rule in adapter.query(["p"], ["", dom])]
+            links = [rule for _, rule in adapter.query(["g"], ["", "", dom])]
+            model = enforcer.get_model()
+            role_manager = enforcer.get_role_manager()
+            # None of the tenant's rows are in the model, so append them as a load would
+            model.model["p"]["p"].policy.extend(policies)
+            model.model["g"]["g"].policy.extend(links)
+            for rule in links:
+                role_manager.add_link(rule[0], rule[1], dom)
+            
+            evicted = []
+            limit = settings.CASBIN_MAX_LOADED_DOMAINS
+            while limit > 0 and len(loaded) >= limit:
+                evicted.append(loaded.popitem(last=False)[0])
+            for old in evicted:
+                model.remove_filtered_policy("p", "p", 1, old)
+                model.remove_filtered_policy("g", "g", 2, old)
+                # casbin's DomainManager keeps the links and a role manager per domain
+                role_manager.all_links.pop(old, None)
+                role_manager.rm_map.pop(old, None)
+            
+            partition = DomainRBACIndex.compile_partition(policies, links, role_manager.max_hierarchy_level)
+            
+            def apply(index):
+                for old in evicted:
+                    index.drop_partition(old)
+                index.set_partition(dom, partition)
+            
+            cls._publish(apply)
+            loaded[dom] = None
+            return partition if cls._index is not None else None
+    
+    @classmethod
+    def _index_for(cls, dom):
+        """Get the compiled index to check a domain's requests with: its partition under the domain model"""
+        index = cls._index
+        if index is None or not cls._domains:
+            return index
+        loaded = cls._loaded_domains
+        if loaded is None:
+            return index.partition(dom)
+        if dom in index.domains():
+            try:
+                loaded.move_to_end(dom)
+            except KeyError:
+                pass
+            return index.partition(dom)
+        return cls._load_domain(dom)
+    
+    @classmethod
+    def _request(cls, sub, obj, act, dom):
+        """Get the casbin request for a check"""
+        return (sub, dom, obj, act) if cls._domains else (sub, obj, act)
+    
+    @classmethod
+    def _permission_rule(cls, role, obj, act, dom):
+        return [role, dom, obj, act] if cls._domains else [role, obj, act]
+    
+    @classmethod
+    def _link_rule(cls, user, role, dom):
+        return [user, role, dom] if cls._domains else [user, role]
+    
+    @classmethod
+    def _apply_policy_delta(cls, delta):
+        """Apply a change broadcast by a sibling worker without persisting or re-broadcasting it"""
+        enforcer = cls._instance
+        if enforcer is None:
+            return
+        if delta.get("op") == "reload":
+            cls._reload_policy()
+            return
+        
+        op, sec, ptype = delta["op"], delta["sec"], delta["ptype"]
+        model = enforcer.get_model()
+        if sec not in model.model.keys() or ptype not in model.model[sec].keys():
+            return
+        with cls._policy_lock.write():
+            if op == "remove_filtered":
+                op = "remove"
+                rules = model.remove_filtered_policy_returns_effects(
+                    sec, ptype, delta["field_index"], *delta["field_values"]
+                )
+            else:
+                rules = delta["rules"]
+                if sec == "g" and cls._loaded_subjects is not None:
+                    # Subjects not loaded yet will read the change from the store
+                    rules = [rule for rule in rules if rule[0] in cls._loaded_subjects]
+                if cls._loaded_domains is not None:
+                    # Likewise for tenants
+                    field = 2 if sec == "g" else 1
+                    rules = [rule for rule in rules if rule[field] in cls._loaded_domains]
+                if op == "add":
+                    rules = [rule for rule in rules if model.add_policy(sec, ptype, rule)]
+                else:
+                    rules = [rule for rule in rules if model.remove_policy(sec, ptype, rule)]
+            if not rules:
+                return
+            
+            role_manager = enforcer.get_role_manager()
+            fields = 3 if cls._domains else 2
+            if sec == "g" and ptype == "g":
+                for rule in rules:
+                    if op == "add":
+                        role_manager.add_link(*rule[:fields])
+                    else:
+                        role_manager.delete_link(*rule[:fields])
+            
+            def apply(index):
+                for rule in rules:
+                    if sec == "g" and ptype == "g":
+                        if op == "add":
+                            index.add_link(*rule[:fields])
+                        else:
+                            index.remove_link(*rule[:fields])
+                    elif sec == "p" and ptype == "p":
+                        if op == "add":
+                            index.add_permission(*rule)
+                        else:
+                            index.remove_permission(*rule)
+            
+            cls._publish(apply)
+            cls._invalidate_decisions()
+    
+    @classmethod
+    def _reload_policy(cls):
+        """Reload the whole policy from storage"""
+        enforcer = cls._instance
+        if enforcer is None:
+            return
+        with cls._policy_lock.write():
+            if cls._loaded_domains is not None:
+                enforcer.load_filtered_policy(Filter(P=[[]], G=[[]]))
+                cls._loaded_domains.clear()
+            elif cls._loaded_subjects is not None:
+                enforcer.load_filtered_policy(Filter(G=[[]]))
+                cls._loaded_subjects.clear()
+            else:
+                enforcer.load_policy()
+            if cls._index is not None:
+                cls._index = cls._build_index(enforcer)
+            cls._invalidate_decisions()
+    
+    @classmethod
+    def enforce(cls, sub, obj, act, dom=None):
+        """Check if a user has permission to access a resource (in a domain, under the domain model)"""
+        started = time.perf_counter()
+        dom = dom or settings.DEFAULT_DOMAIN
+        if cls._instance is None:
+            cls.get_instance()
+        key = cls._request(sub, obj, act, dom)
+        now = time.monotonic()
+        decision, version = cls._cached(key, now)
+        if decision is not None:
+            _enforce_hit.observe(time.perf_counter() - started)
+            return decision
+        
+        enforcer = cls._instance
+        cls._load_subjects(sub)
+        index = cls._index_for(dom)
+        if index is not None:
+            decision = index.enforce(sub, obj, act)
+        else:
+            decision = cls._enforce_shared(enforcer, key)
+        cls._cache_decision(key, decision, version, now)
+        _enforce_miss.observe(time.perf_counter() - started)
+        return decision
+    
+    @classmethod
+    def cached_decision(cls, sub, obj, act, dom=None):
+        """Get a cached decision, or None on a miss"""
+        key = cls._request(sub, obj, act, dom or settings.DEFAULT_DOMAIN)
+        return cls._cached(key, time.monotonic(), count_miss=False)[0]
+    
+    @classmethod
+    def can_decide_inline(cls, sub, dom=None):
+        """
+        Check whether a decision for sub is a few set lookups in the compiled
+        index, with no casbin matcher to evaluate and no rows to load
+        """
+        loaded = cls._loaded_subjects
+        domains = cls._loaded_domains
+        return (
+            cls._instance is not None
+            and cls._index is not None
+            and (loaded is None or sub in loaded)
+            and (domains is None or (dom or settings.DEFAULT_DOMAIN) in domains)
+        )
+    
+    @classmethod
+    def enforce_uncached(cls, sub, obj, act, engine="casbin", dom=None):
+        """
+        Check a request bypassing the decision cache, with casbin itself or
+        the compiled index; None when the index is requested but off
+        """
+        dom = dom or settings.DEFAULT_DOMAIN
+        enforcer = cls.get_instance()
+        cls._load_subjects(sub)
+        if engine == "index":
+            index = cls._index_for(dom)
+            return index.enforce(sub, obj, act) if index is not None else None
+        return cls._enforce_shared(enforcer, cls._request(sub, obj, act, dom))
+    
+    @classmethod
+    @contextmanager
+    def _reading(cls, dom):
+        """
+        Hold the read side of _policy_lock with dom's rules in the casbin
+        model. A lazily loaded tenant is pulled in first, under the write
+        side, and again should it be evicted before the read side is held.
+        """
+        while True:
+            cls._load_domain(dom)
+            with cls._policy_lock.read():
+                loaded = cls._loaded_domains
+                if loaded is None or dom in loaded:
+                    yield
+                    return
+    
+    @classmethod
+    def _enforce_shared(cls, enforcer, request):
+        """Evaluate with casbin, alongside other readers but not writers"""
+        with cls._reading(request[1] if cls._domains else None):
+            return enforcer.enforce(*request)
+    
+    @classmethod
+    def batch_enforce(cls, requests, dom=None):
+        """Check a list of (sub, obj, act) tuples in one domain, resolving each subject's roles once"""
+        dom = dom or settings.DEFAULT_DOMAIN
         enforcer = cls.get_instance()
-        return enforcer.enforce(sub, obj, act)
+        requests = [tuple(request) for request in requests]
+        cls._load_subjects(*{request[0] for request in requests})
+        index = cls._index_for(dom)
+        decisions = {}
+        roles = {}
+        for request in requests:
+            if request in decisions:
+                continue
+            sub, obj, act = request
+            if index is None:
+                decisions[request] = cls._enforce_shared(enforcer, cls._request(sub, obj, act, dom))
+                continue
+            if sub not in roles:
+                roles[sub] = index.roles_for(sub)
+            decisions[request] = index.enforce_roles(roles[sub], obj, act)
+        return [decisions[request] for request in requests]
+    
+    @classmethod
+    def _cached(cls, key, now, count_miss=True):
+        """Get (decision, None) on a cache hit, or (None, policy version) on a miss"""
+        with cls._cache_lock:
+            entry = cls._decision_cache.get(key)
+            if entry is not None and entry[1] > now:
+                cls._decision_cache.move_to_end(key)
+                cls._cache_hits += 1
+                return entry[0], None
+            if count_miss:
+                cls._cache_misses += 1
+            return None, cls._policy_version
+    
+    @classmethod
+    def _cache_decision(cls, key, decision, version, now):
+        """Store a decision unless the policy changed while it was being evaluated"""
+        max_size = settings.CASBIN_DECISION_CACHE_SIZE
+        if max_size <= 0:
+            return
+        with cls._cache_lock:
+            if version != cls._policy_version:
+                return
+            cls._decision_cache[key] = (decision, now + settings.CASBIN_DECISION_CACHE_TTL_SECONDS)
+            cls._decision_cache.move_to_end(key)
+            while len(cls._decision_cache) > max_size:
+                cls._decision_cache.popitem(last=False)
+    
+    @classmethod
+    def _invalidate_decisions(cls):
+        """Drop every cached decision after a policy change"""
+        with cls._cache_lock:
+            cls._policy_version += 1
+            cls._decision_cache.clear()
+    
+    @classmethod
+    def get_cache_stats(cls):
+        """Get decision cache counters"""
+        with cls._cache_lock:
+            return {
+                "hits": cls._cache_hits,
+                "misses": cls._cache_misses,
+                "size": len(cls._decision_cache),
+                "policy_version": cls._policy_version,
+            }
+    
+    @classmethod
+    def get_policy_version(cls):
+        """Get a counter bumped on every policy change, for callers caching derived data"""
+        return cls._policy_version
     
     @classmethod
-    def add_role_for_user(cls, user, role):
+    def roles_for(cls, sub, dom=None):
+        """Get the subject followed by every role it inherits, or None without the compiled index"""
+        cls.get_instance()
+        cls._load_subjects(sub)
+        index = cls._index_for(dom or settings.DEFAULT_DOMAIN)
+        return index.roles_for(sub) if index is not None else None
+    
+    @classmethod
+    def get_permitted_objects(cls, sub, act, prefix="", dom=None):
+        """
+        Get every policy object under prefix the subject may perform act on,
+        from one pass over its roles' rules. Returns None when the compiled
+        index is off, since other models may match objects by pattern.
+        """
+        cls.get_instance()
+        cls._load_subjects(sub)
+        index = cls._index_for(dom or settings.DEFAULT_DOMAIN)
+        if index is None:
+            return None
+        return index.objects_for(sub, act, prefix)
+    
+    @classmethod
+    def get_effective_permissions(cls, sub, dom=None):
+        """
+        Get (tag, permissions) for sub: every (obj, act) pair it may perform
+        through the roles it inherits, sorted, and a digest of them. Served
+        from the compiled index's materialized view, or computed with casbin
+        when the index is off.
+        """
+        enforcer = cls.get_instance()
+        dom = dom or settings.DEFAULT_DOMAIN
+        cls._load_subjects(sub)
+        index = cls._index_for(dom)
+        if index is not None:
+            return index.effective_permissions(sub)
+        with cls._reading(dom):
+            rules = enforcer.get_implicit_permissions_for_user(sub, dom if cls._domains else "")
+        permissions = tuple(sorted({(rule[-2], rule[-1]) for rule in rules}))
+        return permission_tag(permissions), permissions
+    
+    @classmethod
+    def enforce_direct(cls, sub, permissions, dom=None):
+        """
+        Check (obj, act) pairs against rules granted to sub itself, ignoring
+        inherited roles; requires the compiled index
+        """
+        index = cls._index_for(dom or settings.DEFAULT_DOMAIN)
+        return [index.enforce_roles((sub,), obj, act) for obj, act in permissions]
+    
+    @classmethod
+    def add_role_for_user(cls, user, role, dom=None):
         """Add a role for a user"""
         enforcer = cls.get_instance()
-        return enforcer.add_grouping_policy(user, role)
+        dom = dom or settings.DEFAULT_DOMAIN
+        rule = cls._link_rule(user, role, dom)
+        cls._load_subjects(user)
+        with cls._policy_lock.write():
+            cls._load_domain(dom)
+            added = enforcer.add_grouping_policy(*rule)
+            if added:
+                cls._publish(lambda index: index.add_link(*rule))
+                cls._invalidate_decisions()
+        return added
     
     @classmethod
-    def delete_role_for_user(cls, user, role):
+    def add_roles_for_users(cls, pairs, dom=None):
+        """
+        Add many (user, role) rules in one policy write, one index publish
+        and one cache invalidation; returns the rules that were new
+        """
+        enforcer = cls.get_instance()
+        dom = dom or settings.DEFAULT_DOMAIN
+        rules = [cls._link_rule(user, role, dom) for user, role in dict.fromkeys(tuple(pair) for pair in pairs)]
+        cls._load_subjects(*{rule[0] for rule in rules})
+        with cls._policy_lock.write():
+            cls._load_domain(dom)
+            # casbin adds none of a batch if any rule already exists
+            role_manager = enforcer.get_role_manager()
+            rules = [rule for rule in rules if rule[1] not in role_manager.get_roles(rule[0], *rule[2:])]
+            if not rules or not enforcer.add_grouping_policies(rules):
+                return []
+            
+            def add_links(index):
+                for rule in rules:
+                    index.add_link(*rule)
+            
+            cls._publish(add_links)
+            cls._invalidate_decisions()
+        return rules
+    
+    @classmethod
+    def delete_role_for_user(cls, user, role, dom=None):
         """Remove a role from a user"""
         enforcer = cls.get_instance()
-        return enforcer.remove_grouping_policy(user, role)
+        dom = dom or settings.DEFAULT_DOMAIN
+        rule = cls._link_rule(user, role, dom)
+        cls._load_subjects(user)
+        with cls._policy_lock.write():
+            cls._load_domain(dom)
+            removed = enforcer.remove_grouping_policy(*rule)
+            if removed:
+                cls._publish(lambda index: index.remove_link(*rule))
+                cls._invalidate_decisions()
+        return removed
     
     @classmethod
-    def get_roles_for_user(cls, user):
+    def get_roles_for_user(cls, user, dom=None):
         """Get all roles for a user"""
         enforcer = cls.get_instance()
-        return enforcer.get_roles_for_user(user)
+        dom = dom or settings.DEFAULT_DOMAIN
+        cls._load_subjects(user)
+        with cls._reading(dom):
+            if cls._domains:
+                return enforcer.get_roles_for_user_in_domain(user, dom)
+            return enforcer.get_roles_for_user(user)
     
     @classmethod
-    def add_policy(cls, role, resource, action):
+    def add_policy(cls, role, resource, action, dom=None):
         """Add a policy for a role"""
         enforcer = cls.get_instance()
-        return enforcer.add_policy(role, resource, action)
+        dom = dom or settings.DEFAULT_DOMAIN
+        rule = cls._permission_rule(role, resource, action, dom)
+        with cls._policy_lock.write():
+            cls._load_domain(dom)
+            added = enforcer.add_policy(*rule)
+            if added:
+                cls._publish(lambda index: index.add_permission(*rule))
+                cls._invalidate_decisions()
+        return added
     
     @classmethod
-    def remove_policy(cls, role, resource, action):
+    def remove_policy(cls, role, resource, action, dom=None):
         """Remove a policy"""
         enforcer = cls.get_instance()
-        return enforcer.remove_policy(role, resource, action)
+        dom = dom or settings.DEFAULT_DOMAIN
+        rule = cls._permission_rule(role, resource, action, dom)
+        with cls._policy_lock.write():
+            cls._load_domain(dom)
+            removed = enforcer.remove_policy(*rule)
+            if removed:
+                cls._publish(lambda index: index.remove_permission(*rule))
+                cls._invalidate_decisions()
+        return removed
     
     @classmethod
-    def get_permissions_for_user(cls, user):
+    def get_permissions_for_user(cls, user, dom=None):
         """Get all permissions for a user"""
         enforcer = cls.get_instance()
-        return enforcer.get_permissions_for_user(user)
+        dom = dom or settings.DEFAULT_DOMAIN
+        with cls._reading(dom):
+            if cls._domains:
+                return enforcer.get_permissions_for_user_in_domain(user, dom)
+            return enforcer.get_permissions_for_user(user)
     
     @classmethod
     def save_policy(cls):
-        """Save policy changes back to the policy file"""
+        """Make policy changes durable (a batched fsync or a no-op for incremental adapters)"""
+        enforcer = cls.get_instance()
+        started = time.perf_counter()
+        try:
+            commit = getattr(enforcer.get_adapter(), "commit", None)
+            if commit is not None:
+                return commit()
+            return enforcer.save_policy()
+        finally:
+            _policy_write_seconds.labels("save").observe(time.perf_counter() - started)
+    
+    @classmethod
+    def compact_policy(cls):
+        """Rewrite the full policy file from the current model"""
         enforcer = cls.get_instance()
-        return enforcer.save_policy()
\ No newline at end of file
+        started = time.perf_counter()
+        with cls._policy_lock.write():
+            try:
+                return enforcer.save_policy()
+            finally:
+                _policy_write_seconds.labels("compact").observe(time.perf_counter() - started)
+    
+    @classmethod
+    def close(cls):
+        """Flush pending policy changes and stop background workers"""
+        if cls._instance is None:
+            return
+        watcher = cls._instance.watcher
+        if isinstance(watcher, UnixSocketWatcher):
+            watcher.close()
+        adapter = cls._instance.get_adapter()
+        if isinstance(adapter, (ChangeLogFileAdapter, SQLiteAdapter)):
+            adapter.close()
+
+class AsyncRWLock:
+    """
+    Readers-writer lock for coroutines on one event loop. Writers are
+    preferred: once one is waiting, new readers queue behind it, so a
+    steady stream of checks cannot starve a policy update. Taking the read
+    side while no writer is active or waiting never suspends.
+    """
+    
+    def __init__(self):
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+        self._condition = asyncio.Condition()
+    
+    async def acquire_read(self):
+        if not self._writer and not self._waiting_writers:
+            self._readers += 1
+            return
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._writer and not self._waiting_writers)
+            self._readers += 1
+    
+    async def release_read(self):
+        self._readers -= 1
+        if not self._readers and self._waiting_writers:
+            async with self._condition:
+                self._condition.notify_all()
+    
+    async def acquire_write(self):
+        async with self._condition:
+            self._waiting_writers += 1
+            try:
+                await self._condition.wait_for(lambda: not self._writer and not self._readers)
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+    
+    async def release_write(self):
+        async with self._condition:
+            self._writer = False
+            self._condition.notify_all()
+
+class _LoopState:
+    """Per event loop lock and in-flight checks; asyncio primitives cannot cross loops"""
+    
+    def __init__(self):
+        self.lock = AsyncRWLock()
+        self.inflight = {}
+
+class AsyncCasbinEnforcer:
+    """
+    Event-loop front end for CasbinEnforcer.
+    
+    Decisions that are cached, or a few set lookups in the compiled index,
+    are made inline on the loop. Anything slower (casbin's matcher, loading
+    a subject's roles from SQLite) runs in the default executor, and
+    concurrent identical (sub, obj, act, dom) checks share one evaluation
+    (single-flight). Policy writes made through write() hold the write side
+    of an async RW lock for the whole change, and reads hold the read side,
+    so a read never observes a change half applied.
+    """
+    
+    _states = weakref.WeakKeyDictionary()
+    _inline = 0
+    _offloaded = 0
+    _coalesced = 0
+    
+    @classmethod
+    def _state(cls):
+        loop = asyncio.get_running_loop()
+        state = cls._states.get(loop)
+        if state is None:
+            state = cls._states[loop] = _LoopState()
+        return state
+    
+    @classmethod
+    async def enforce(cls, sub, obj, act, dom=None):
+        """Check if a user has permission to access a resource"""
+        dom = dom or settings.DEFAULT_DOMAIN
+        decision = CasbinEnforcer.cached_decision(sub, obj, act, dom)
+        if decision is not None:
+            cls._inline += 1
+            return decision
+        
+        state = cls._state()
+        key = (sub, obj, act, dom)
+        future = state.inflight.get(key)
+        if future is not None:
+            cls._coalesced += 1
+            return await asyncio.shield(future)
+        
+        future = asyncio.get_running_loop().create_future()
+        state.inflight[key] = future
+        try:
+            decision = await cls.read(sub, CasbinEnforcer.enforce, sub, obj, act, dom, dom=dom)
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieved here so a check nobody else joined does not log it
+            future.exception()
+            raise
+        else:
+            future.set_result(decision)
+            return decision
+        finally:
+            del state.inflight[key]
+    
+    @classmethod
+    async def read(cls, sub, fn, *args, dom=None):
+        """
+        Run a read of sub's permissions (in dom) under the read lock, inline
+        when CasbinEnforcer can decide for sub without blocking
+        """
+        lock = cls._state().lock
+        await lock.acquire_read()
+        try:
+            if CasbinEnforcer.can_decide_inline(sub, dom):
+                cls._inline += 1
+                return fn(*args)
+            cls._offloaded += 1
+            return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args))
+        finally:
+            await lock.release_read()
+    
+    @classmethod
+    async def write(cls, fn, *args):
+        """Run a policy change in the executor, holding readers off until it is complete"""
+        lock = cls._state().lock
+        await lock.acquire_write()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args))
+        finally:
+            await lock.release_write()
+    
+    @classmethod
+    async def add_role_for_user(cls, user, role, dom=None):
+        return await cls.write(CasbinEnforcer.add_role_for_user, user, role, dom)
+    
+    @classmethod
+    async def add_roles_for_users(cls, pairs, dom=None):
+        return await cls.write(CasbinEnforcer.add_roles_for_users, pairs, dom)
+    
+    @classmethod
+    async def delete_role_for_user(cls, user, role, dom=None):
+        return await cls.write(CasbinEnforcer.delete_role_for_user, user, role, dom)
+    
+    @classmethod
+    async def add_policy(cls, role, resource, action, dom=None):
+        return await cls.write(CasbinEnforcer.add_policy, role, resource, action, dom)
+    
+    @classmethod
+    async def remove_policy(cls, role, resource, action, dom=None):
+        return await cls.write(CasbinEnforcer.remove_policy, role, resource, action, dom)
+    
+    @classmethod
+    async def save_policy(cls):
+        """
+        Make policy changes durable; changes are already visible, so this
+        waits for the fsync without holding readers off
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, CasbinEnforcer.save_policy)
+    
+    @classmethod
+    def get_stats(cls):
+        """Get how many reads were decided inline, offloaded to a thread, or coalesced"""
+        return {"inline": cls._inline, "offloaded": cls._offloaded, "coalesced": cls._coalesced}
+
+def _collect_decision_cache():
+    stats = CasbinEnforcer.get_cache_stats()
+    return [
+        ("casbin_decision_cache_hits_total", "counter", "Decisions served from the cache", [({}, stats["hits"])]),
+        ("casbin_decision_cache_misses_total", "counter", "Decisions evaluated by the engine", [({}, stats["misses"])]),
+        ("casbin_decision_cache_size", "gauge", "Cached decisions", [({}, stats["size"])]),
+        ("casbin_policy_version", "gauge", "Policy changes applied by this worker", [({}, stats["policy_version"])]),
+        (
+            "casbin_async_reads_total", "counter", "AsyncCasbinEnforcer reads by how they were served",
+            [({"mode": mode}, count) for mode, count in AsyncCasbinEnforcer.get_stats().items()],
+        ),
+    ]
+
+metrics.add_collector(_collect_decision_cache)
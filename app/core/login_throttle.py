@@ -0,0 +1,214 @@
+"""
+Login throttling.
+
+Every password check costs a bcrypt verify, so credential stuffing can
+saturate the password pool. Attempts are counted per username and per
+client IP in sliding windows, and an attempt over either budget is
+refused before any hashing.
+
+Counters live in a fixed-size hash table, so memory stays bounded however
+many usernames or addresses an attacker cycles through. The table sits in
+a bytearray for one process. It can instead map a file, so every worker
+on the host shares the same counters.
+"""
+from contextlib import contextmanager
+from typing import Iterable, Optional, Tuple
+import asyncio
+import fcntl
+import functools
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+from ..config import settings
+from .metrics import metrics
+
+# key digest (0 for an empty slot), window number, attempts in that window,
+# attempts in the window before it
+_SLOT = struct.Struct("<QQII")
+
+_attempts = metrics.counter("login_attempts_total", "Login attempts seen by the throttle", ["outcome"])
+_attempts_allowed = _attempts.labels("allowed")
+_attempts_throttled = _attempts.labels("throttled")
+
+class SlidingWindowTable:
+    """
+    Open-addressed table of sliding-window counters. A key's estimate is
+    its count in the current fixed window plus the previous window's count
+    weighted by how much of it still overlaps the sliding window.
+
+    A key may sit in any of PROBES slots from its hash, keyed with
+    hash_key so clients cannot aim keys at someone else's slots. When they
+    are all taken, the slot whose counter has expired or is lowest is
+    reused, so a flood of new keys pushes out idle ones before busy ones.
+    """
+
+    PROBES = 8
+
+    def __init__(self, slots: int, window_seconds: float, path: Optional[str] = None, hash_key: bytes = b""):
+        self._window = window_seconds
+        self._hash_key = hash_key
+        self._lock = threading.Lock()
+        self._fd = None
+        if not path:
+            self._slots = max(slots, self.PROBES)
+            self._buffer = bytearray(self._slots * _SLOT.size)
+            return
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked():
+            size = os.fstat(self._fd).st_size
+            if size < _SLOT.size * self.PROBES:
+                size = max(slots, self.PROBES) * _SLOT.size
+                os.ftruncate(self._fd, size)
+        # Workers sharing the file use whatever size the first one created
+        self._slots = size // _SLOT.size
+        self._buffer = mmap.mmap(self._fd, self._slots * _SLOT.size)
+
+    @contextmanager
+    def _locked(self, blocking: bool = True):
+        """Hold the table; yields False instead of waiting when not blocking and it is held"""
+        if not self._lock.acquire(blocking):
+            yield False
+            return
+        try:
+            if self._fd is None:
+                yield True
+                return
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            self._lock.release()
+
+    def acquire(self, limits: Iterable[Tuple[str, int]], now: Optional[float] = None, blocking: bool = True) -> Optional[int]:
+        """
+        Count an attempt against every (key, limit) unless one of them is
+        already at its limit. Returns 0 when counted, or else the seconds
+        until the key over budget has room again, with nothing counted;
+        None when not blocking and the table is held.
+        """
+        now = time.time() if now is None else now
+        window = int(now // self._window)
+        position = now / self._window - window
+        with self._locked(blocking) as locked:
+            if not locked:
+                return None
+            found = []
+            for key, limit in limits:
+                slot, digest, current, previous = self._find(key, window, [entry[0] for entry in found])
+                if previous * (1 - position) + current >= limit:
+                    return self._retry_after(position, current, previous, limit)
+                found.append((slot, digest, current, previous))
+            for slot, digest, current, previous in found:
+                _SLOT.pack_into(self._buffer, slot * _SLOT.size, digest, window, current + 1, previous)
+        return 0
+
+    def reset(self, key: str, now: Optional[float] = None, blocking: bool = True) -> bool:
+        """Forget a key's attempts; False when not blocking and the table is held"""
+        now = time.time() if now is None else now
+        window = int(now // self._window)
+        with self._locked(blocking) as locked:
+            if not locked:
+                return False
+            slot, digest, current, previous = self._find(key, window)
+            if current or previous:
+                _SLOT.pack_into(self._buffer, slot * _SLOT.size, 0, 0, 0, 0)
+        return True
+
+    def _find(self, key: str, window: int, claimed=()) -> Tuple[int, int, int, int]:
+        """
+        Get (slot, digest, current, previous) for a key, rolled forward to
+        window; a new key gets a free slot other than the claimed ones
+        """
+        digest = hashlib.blake2b(key.encode(), digest_size=8, key=self._hash_key).digest()
+        digest = int.from_bytes(digest, "little") or 1
+        start = digest % self._slots
+        spare, spare_load = None, None
+        for probe in range(self.PROBES):
+            slot = (start + probe) % self._slots
+            used, used_window, current, previous = _SLOT.unpack_from(self._buffer, slot * _SLOT.size)
+            if used_window != window:
+                # Roll the counts forward: one window on, or expired
+                current, previous = 0, current if used_window == window - 1 else 0
+            if used == digest:
+                return slot, digest, current, previous
+            if slot in claimed:
+                continue
+            load = current + previous if used else -1
+            if spare is None or load < spare_load:
+                spare, spare_load = slot, load
+        return spare, digest, 0, 0
+
+    def _retry_after(self, position: float, current: int, previous: int, limit: int) -> int:
+        if current < limit:
+            # The previous window's share decays below the budget in this window
+            wait = 1 - (limit - current) / previous - position
+        else:
+            # This window's count must become the decaying previous one
+            wait = 1 - position + 1 - limit / current
+        return max(1, math.ceil(wait * self._window))
+
+    def close(self) -> None:
+        if self._fd is not None:
+            self._buffer.close()
+            os.close(self._fd)
+            self._fd = None
+
+class LoginThrottle:
+    """
+    Budgets login attempts per username and per client IP (0 for no
+    limit). Updates run inline on the event loop unless the table is held,
+    by another worker or an executor thread, and then in the executor.
+    """
+
+    def __init__(self, table: SlidingWindowTable, per_username: int, per_ip: int):
+        self._table = table
+        self._per_username = per_username
+        self._per_ip = per_ip
+
+    async def acquire(self, username: str, client_ip: str) -> int:
+        """Count a login attempt; returns 0, or the seconds to wait when over budget"""
+        limits = []
+        if self._per_username > 0:
+            limits.append((f"user:{username}", self._per_username))
+        if self._per_ip > 0:
+            limits.append((f"ip:{client_ip}", self._per_ip))
+        retry_after = 0
+        if limits:
+            retry_after = self._table.acquire(limits, blocking=False)
+            if retry_after is None:
+                retry_after = await asyncio.get_running_loop().run_in_executor(
+                    None, functools.partial(self._table.acquire, limits)
+                )
+        (_attempts_throttled if retry_after else _attempts_allowed).inc()
+        return retry_after
+
+    async def succeeded(self, username: str) -> None:
+        """Clear a username's attempts after a successful login; the IP's still count"""
+        if self._per_username > 0 and not self._table.reset(f"user:{username}", blocking=False):
+            await asyncio.get_running_loop().run_in_executor(None, self._table.reset, f"user:{username}")
+
+    def close(self) -> None:
+        self._table.close()
+
+# Global throttle instance
+login_throttle = LoginThrottle(
+    SlidingWindowTable(
+        settings.LOGIN_THROTTLE_SLOTS,
+        settings.LOGIN_THROTTLE_WINDOW_SECONDS,
+        settings.LOGIN_THROTTLE_SHARED_PATH or None,
+        hashlib.sha256(settings.SECRET_KEY.encode()).digest(),
+    ),
+    settings.LOGIN_THROTTLE_MAX_PER_USERNAME,
+    settings.LOGIN_THROTTLE_MAX_PER_IP,
+)
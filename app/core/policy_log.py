@@ -0,0 +1,306 @@
+import fcntl
+import os
+import threading
+import time
+
+from casbin.persist.adapters import FileAdapter
+
+ADD = "+"
+REMOVE = "-"
+REMOVE_FILTERED = "~"
+
+class ChangeLogFileAdapter(FileAdapter):
+    """
+    CSV file adapter that persists incremental changes to an append-only log
+    instead of rewriting the policy file on every mutation.
+    
+    Each add/remove is appended to the log and made durable by a background
+    thread that fsyncs once per interval for every writer waiting in
+    commit(). The same thread periodically compacts the log into the policy
+    file (write to a temp file, fsync, atomic rename).
+    
+    Several worker processes may share one policy file and log: appends take
+    a shared flock and log rotation an exclusive one, and compaction replays
+    the rotated log onto the policy file rather than dumping one worker's
+    model, so it never drops another worker's changes. Replaying the log is
+    idempotent, so a crash at any point during compaction leaves a
+    recoverable state.
+    
+    With a snapshot_loader, the first load takes the policy file's rows
+    from a precompiled snapshot (see policy_snapshot) when the loader finds
+    one matching the file; it is called under the append lock, so the file
+    cannot be compacted between the check and the log replay.
+    """
+    
+    def __init__(
+        self,
+        file_path,
+        log_path=None,
+        fsync_interval=0.02,
+        compact_threshold=10000,
+        compact_interval=60,
+        snapshot_loader=None,
+    ):
+        super().__init__(file_path)
+        self._log_path = log_path or f"{file_path}.log"
+        self._compacting_path = f"{self._log_path}.compacting"
+        self._fsync_interval = fsync_interval
+        self._compact_threshold = compact_threshold
+        self._compact_interval = compact_interval
+        self._last_compaction = time.monotonic()
+        
+        # Cross-process locks: appends vs. rotation, and one compactor at a time
+        self._append_lock_fd = os.open(f"{self._log_path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        self._compact_lock_fd = os.open(f"{self._log_path}.compact.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        self._compact_lock = threading.Lock()
+        
+        self._lock = threading.Lock()
+        self._synced = threading.Condition(self._lock)
+        self._log = None
+        self._written_seq = 0
+        self._synced_seq = 0
+        self._log_entries = 0
+        self._closed = False
+        self._thread = None
+        self._snapshot_loader = snapshot_loader
+        # The snapshot the last load came from, while nothing was replayed
+        # on top of it, so the model holds exactly its rules
+        self.loaded_snapshot = None
+    
+    def load_policy(self, model):
+        """Load the policy file, then replay any change log on top of it"""
+        with self._lock:
+            if self._log is not None:
+                self._sync_locked()
+                self._log.close()
+                self._log = None
+            self._log_entries = 0
+            self.loaded_snapshot = None
+            loader, self._snapshot_loader = self._snapshot_loader, None
+            fcntl.flock(self._append_lock_fd, fcntl.LOCK_EX)
+            try:
+                snapshot = loader() if loader is not None else None
+                if snapshot is not None:
+                    snapshot.fill(model)
+                elif os.path.isfile(self._file_path):
+                    self._load_policy_file(model)
+                for path in (self._compacting_path, self._log_path):
+                    for op, ptype, rule in _read_log(path):
+                        _apply_to_model(model, op, ptype, rule)
+                        self._log_entries += 1
+                if self._log_entries == 0:
+                    self.loaded_snapshot = snapshot
+                self._log = open(self._log_path, "a", encoding="utf-8")
+            finally:
+                fcntl.flock(self._append_lock_fd, fcntl.LOCK_UN)
+        
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="policy-log", daemon=True)
+            self._thread.start()
+    
+    def _append(self, op, ptype, rules):
+        lines = "".join(", ".join([op, ptype, *rule]) + "\n" for rule in rules)
+        with self._lock:
+            fcntl.flock(self._append_lock_fd, fcntl.LOCK_SH)
+            try:
+                # Follow a rotation done by another worker
+                if os.fstat(self._log.fileno()).st_ino != _inode(self._log_path):
+                    self._sync_locked()
+                    self._log.close()
+                    self._log = open(self._log_path, "a", encoding="utf-8")
+                self._log.write(lines)
+                self._log.flush()
+            finally:
+                fcntl.flock(self._append_lock_fd, fcntl.LOCK_UN)
+            self._written_seq += len(rules)
+            self._log_entries += len(rules)
+    
+    def add_policy(self, sec, ptype, rule):
+        self._append(ADD, ptype, [rule])
+    
+    def add_policies(self, sec, ptype, rules):
+        self._append(ADD, ptype, rules)
+    
+    def remove_policy(self, sec, ptype, rule):
+        self._append(REMOVE, ptype, [rule])
+    
+    def remove_policies(self, sec, ptype, rules):
+        self._append(REMOVE, ptype, rules)
+    
+    def remove_filtered_policy(self, sec, ptype, field_index, *field_values):
+        self._append(REMOVE_FILTERED, ptype, [[str(field_index), *field_values]])
+    
+    def commit(self, timeout=None):
+        """Block until every change appended so far has been fsynced"""
+        with self._lock:
+            target = self._written_seq
+            if self._fsync_interval <= 0:
+                self._sync_locked()
+                return True
+            self._synced.notify_all()
+            return self._synced.wait_for(lambda: self._synced_seq >= target or self._closed, timeout)
+    
+    def _sync_locked(self):
+        if self._synced_seq == self._written_seq:
+            return
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._synced_seq = self._written_seq
+        self._synced.notify_all()
+    
+    def _run(self):
+        while True:
+            with self._lock:
+                self._synced.wait(self._fsync_interval or None)
+                if self._closed:
+                    return
+                self._sync_locked()
+                needs_compaction = self._log_entries >= self._compact_threshold or (
+                    self._log_entries > 0
+                    and time.monotonic() - self._last_compaction >= self._compact_interval
+                )
+            # Compact off this thread so group commits keep flowing meanwhile
+            if needs_compaction and not self._compact_lock.locked():
+                threading.Thread(target=self.compact, name="policy-compaction", daemon=True).start()
+    
+    def save_policy(self, model):
+        """
+        Compact the log into the policy file. Every model change already went
+        through the log, so the file is rebuilt from the log rather than from
+        this worker's model.
+        """
+        self.compact(blocking=True)
+        return True
+    
+    def compact(self, blocking=False):
+        """Fold the log into the policy file with an atomic rename"""
+        with self._compact_lock:
+            if self._closed:
+                return False
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(self._compact_lock_fd, flags)
+            except BlockingIOError:
+                # Another worker is compacting the same log
+                return False
+            try:
+                if not self._rotate():
+                    return False
+                rules = {}
+                if os.path.isfile(self._file_path):
+                    with open(self._file_path, "rb") as file:
+                        for raw in file:
+                            line = raw.decode().strip()
+                            if line and not line.startswith("#"):
+                                rules[tuple(token.strip() for token in line.split(","))] = None
+                for op, ptype, rule in _read_log(self._compacting_path):
+                    _apply_to_rules(rules, op, ptype, rule)
+                
+                tmp_path = f"{self._file_path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as file:
+                    file.writelines(", ".join(key) + "\n" for key in rules)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(tmp_path, self._file_path)
+                _fsync_dir(self._file_path)
+                os.remove(self._compacting_path)
+            finally:
+                fcntl.flock(self._compact_lock_fd, fcntl.LOCK_UN)
+        return True
+    
+    def _rotate(self):
+        # Move the live log aside so later changes go to a fresh one. A
+        # rotated log left by an interrupted compaction is extended rather
+        # than replaced, since its changes may not be in the policy file yet.
+        with self._lock:
+            if self._closed:
+                return False
+            fcntl.flock(self._append_lock_fd, fcntl.LOCK_EX)
+            try:
+                self._sync_locked()
+                self._log.close()
+                if os.path.isfile(self._compacting_path):
+                    with open(self._compacting_path, "ab") as rotated, open(self._log_path, "rb") as log:
+                        rotated.write(log.read())
+                        rotated.flush()
+                        os.fsync(rotated.fileno())
+                    os.remove(self._log_path)
+                else:
+                    os.replace(self._log_path, self._compacting_path)
+                _fsync_dir(self._log_path)
+                self._log = open(self._log_path, "a", encoding="utf-8")
+                self._log_entries = 0
+                self._last_compaction = time.monotonic()
+            finally:
+                fcntl.flock(self._append_lock_fd, fcntl.LOCK_UN)
+        return True
+    
+    def close(self):
+        """Flush outstanding changes and stop the background thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._log is not None:
+                self._sync_locked()
+                self._log.close()
+            self._synced.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        with self._compact_lock:
+            os.close(self._append_lock_fd)
+            os.close(self._compact_lock_fd)
+
+def _read_log(path):
+    """Yield (op, ptype, rule) entries, dropping a torn final line left by a crash"""
+    if not os.path.isfile(path):
+        return
+    good_offset = 0
+    with open(path, "r+b") as file:
+        for raw in file:
+            if not raw.endswith(b"\n"):
+                file.truncate(good_offset)
+                break
+            good_offset += len(raw)
+            line = raw.decode().strip()
+            if line:
+                op, ptype, *rule = [token.strip() for token in line.split(",")]
+                yield op, ptype, rule
+
+def _apply_to_model(model, op, ptype, rule):
+    sec = ptype[0]
+    if sec not in model.model.keys() or ptype not in model.model[sec].keys():
+        return
+    if op == ADD:
+        model.add_policy(sec, ptype, rule)
+    elif op == REMOVE:
+        model.remove_policy(sec, ptype, rule)
+    elif op == REMOVE_FILTERED:
+        model.remove_filtered_policy(sec, ptype, int(rule[0]), *rule[1:])
+
+def _apply_to_rules(rules, op, ptype, rule):
+    if op == ADD:
+        rules[(ptype, *rule)] = None
+    elif op == REMOVE:
+        rules.pop((ptype, *rule), None)
+    elif op == REMOVE_FILTERED:
+        field_index, field_values = int(rule[0]), rule[1:]
+        for key in [key for key in rules if key[0] == ptype]:
+            fields = key[1 + field_index:]
+            if len(fields) >= len(field_values) and all(
+                value == "" or value == field for value, field in zip(field_values, fields)
+            ):
+                del rules[key]
+
+def _inode(path):
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+def _fsync_dir(path):
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,200 @@
+"""
+Precompiled binary policy snapshots.
+
+Parsing a large policy.csv dominates cold start, so the policy file can be
+compiled once into a snapshot holding every rule with its strings interned
+into a shared table, plus the role closures the compiled RBAC index would
+otherwise walk. Workers mmap the snapshot and fill the casbin model from it
+directly. A snapshot records a checksum of the model and policy files it
+was compiled from, and is ignored once either changes (for instance after
+a change-log compaction) until it is recompiled.
+
+    python -m app.core.policy_snapshot [model.conf policy.csv snapshot]
+"""
+from array import array
+from typing import Callable, Dict, List, Optional, Tuple, Union
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+import casbin
+from casbin.persist.adapter import load_policy_line
+from casbin.persist.adapters import FileAdapter
+
+MAGIC = b"RBACSNP\0"
+FORMAT_VERSION = 1
+
+# magic, format version, marshal version, payload CRC-32, payload length,
+# SHA-256 of the source files
+_HEADER = struct.Struct("<8sIIIQ32s")
+
+def source_checksum(model_path: str, policy_path: str) -> bytes:
+    """Get the SHA-256 of the model and policy files a snapshot is compiled from"""
+    digest = hashlib.sha256()
+    for path in (model_path, policy_path):
+        with open(path, "rb") as file:
+            data = file.read()
+        digest.update(struct.pack("<Q", len(data)))
+        digest.update(data)
+    return digest.digest()
+
+class PolicySnapshot:
+    """
+    Rules per (sec, ptype) as a flat array of string-table ids with the
+    row width (or every row's width, for the rare ptype whose rows differ),
+    and optionally the role closure of every subject in the g relation
+    """
+
+    def __init__(
+        self,
+        strings: Tuple[str, ...],
+        rules: Dict[Tuple[str, str], Tuple[Union[int, bytes], bytes]],
+        closures: Optional[Dict[str, Tuple[str, ...]]],
+        max_hierarchy_level: int,
+        checksum: bytes,
+    ):
+        self.strings = strings
+        self.rules = rules
+        self.closures = closures
+        self.max_hierarchy_level = max_hierarchy_level
+        self.checksum = checksum
+
+    @classmethod
+    def compile(cls, model_path: str, policy_path: str, index_factory=None) -> "PolicySnapshot":
+        """
+        Parse the policy file the way casbin's file adapter does. With
+        index_factory (RBACIndex.from_enforcer), role closures are included
+        when the model is one the index supports.
+        """
+        checksum = source_checksum(model_path, policy_path)
+        enforcer = casbin.Enforcer(model_path)
+        model = enforcer.get_model()
+        with open(policy_path, "r", encoding="utf-8") as file:
+            for line in file:
+                load_policy_line(line.strip(), model)
+
+        ids: Dict[str, int] = {}
+        rules = {}
+        for sec in ("p", "g"):
+            for ptype, assertion in model.model.get(sec, {}).items():
+                if not assertion.policy:
+                    continue
+                widths = [len(rule) for rule in assertion.policy]
+                width = widths[0] if widths.count(widths[0]) == len(widths) else array("I", widths).tobytes()
+                flat = array("I", (ids.setdefault(token, len(ids)) for rule in assertion.policy for token in rule))
+                rules[(sec, ptype)] = (width, flat.tobytes())
+
+        closures = None
+        max_hierarchy_level = enforcer.get_role_manager().max_hierarchy_level
+        if index_factory is not None:
+            enforcer.build_role_links()
+            index = index_factory(enforcer)
+            if index is not None:
+                closures = {sub: index.roles_for(sub) for sub in index._closures}
+        return cls(tuple(ids), rules, closures, max_hierarchy_level, checksum)
+
+    def dump(self, path: str) -> None:
+        """Write atomically, so workers never map a partial snapshot"""
+        # marshal stores each interned string once and interns it on load
+        strings = tuple(sys.intern(string) for string in self.strings)
+        closures = None
+        if self.closures is not None:
+            closures = {sys.intern(sub): tuple(sys.intern(role) for role in roles) for sub, roles in self.closures.items()}
+        rules = tuple((sec, ptype, width, flat) for (sec, ptype), (width, flat) in self.rules.items())
+        payload = marshal.dumps((strings, rules, closures, self.max_hierarchy_level), marshal.version)
+        header = _HEADER.pack(MAGIC, FORMAT_VERSION, marshal.version, zlib.crc32(payload), len(payload), self.checksum)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(header)
+            file.write(payload)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, model_path: str, policy_path: str) -> Optional["PolicySnapshot"]:
+        """Map a snapshot, or get None when it is missing, damaged, of another format or stale"""
+        try:
+            with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                if len(view) < _HEADER.size:
+                    return None
+                magic, version, marshal_version, crc, length, checksum = _HEADER.unpack_from(view, 0)
+                if magic != MAGIC or version != FORMAT_VERSION or marshal_version != marshal.version:
+                    return None
+                if checksum != source_checksum(model_path, policy_path):
+                    return None
+                payload = view[_HEADER.size:_HEADER.size + length]
+        except (OSError, ValueError):
+            return None
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            return None
+
+        strings, rules, closures, max_hierarchy_level = marshal.loads(payload)
+        return cls(strings, {(sec, ptype): (width, flat) for sec, ptype, width, flat in rules}, closures, max_hierarchy_level, checksum)
+
+    def fill(self, model) -> None:
+        """Append every rule to a casbin model, as an adapter's load_policy does"""
+        strings = self.strings
+        for (sec, ptype), (width, flat) in self.rules.items():
+            if sec not in model.model.keys() or ptype not in model.model[sec].keys():
+                continue
+            ids = array("I")
+            ids.frombytes(flat)
+            tokens = [strings[i] for i in ids]
+            policy = model.model[sec][ptype].policy
+            if isinstance(width, int):
+                policy.extend(tokens[i:i + width] for i in range(0, len(tokens), width))
+                continue
+            widths = array("I")
+            widths.frombytes(width)
+            offset = 0
+            for width in widths:
+                policy.append(tokens[offset:offset + width])
+                offset += width
+
+class SnapshotFileAdapter(FileAdapter):
+    """
+    CSV file adapter whose first load comes from a snapshot of the file
+    when snapshot_loader finds one; later loads parse the file as usual
+    """
+
+    def __init__(self, file_path: str, snapshot_loader: Optional[Callable[[], Optional[PolicySnapshot]]] = None):
+        super().__init__(file_path)
+        self._snapshot_loader = snapshot_loader
+        # The snapshot the last load came from
+        self.loaded_snapshot = None
+
+    def load_policy(self, model):
+        loader, self._snapshot_loader = self._snapshot_loader, None
+        self.loaded_snapshot = loader() if loader is not None else None
+        if self.loaded_snapshot is not None:
+            self.loaded_snapshot.fill(model)
+            return
+        super().load_policy(model)
+
+def compile_snapshot(model_path: str, policy_path: str, path: str) -> PolicySnapshot:
+    """Compile a policy file, with role closures, and write the snapshot"""
+    from .casbin_rbac import RBACIndex
+
+    snapshot = PolicySnapshot.compile(model_path, policy_path, RBACIndex.from_enforcer)
+    snapshot.dump(path)
+    return snapshot
+
+def main(argv: List[str]) -> None:
+    from ..config import settings
+
+    model_path, policy_path = settings.CASBIN_MODEL_PATH, settings.CASBIN_POLICY_PATH
+    if argv:
+        model_path, policy_path = argv[0], argv[1]
+    path = argv[2] if len(argv) > 2 else f"{policy_path}.snapshot"
+    snapshot = compile_snapshot(model_path, policy_path, path)
+    rows = sum(len(width) // 4 if isinstance(width, bytes) else len(flat) // 4 // width for width, flat in snapshot.rules.values())
+    print(f"Wrote {path}: {rows} rules, {len(snapshot.strings)} strings, {len(snapshot.closures or ())} closures")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,191 @@
+import glob
+import json
+import os
+import queue
+import socket
+import threading
+
+from casbin.persist.watcher_ex import WatcherEx
+
+# Rules per datagram; larger batches are split so each message stays well
+# under the Unix datagram size limit
+MAX_RULES_PER_MESSAGE = 500
+
+_RELOAD = json.dumps({"op": "reload"}).encode()
+
+class UnixSocketWatcher(WatcherEx):
+    """
+    Casbin watcher that broadcasts policy deltas to sibling worker processes
+    on the same host over Unix datagram sockets.
+    
+    Every worker binds <directory>/<pid>.sock. A local change is sent to every
+    other socket in the directory, and a background thread hands deltas from
+    siblings to on_delta so they can be applied in place instead of
+    reloading the whole policy. Sockets left behind by dead workers are
+    removed on the first failed send.
+    
+    Sends happen on a background thread, so a backed-up sibling never
+    stalls the policy write that broadcast the delta. A sibling that misses
+    a delta is marked dirty and sent a full reload instead, retried every
+    RETRY_SECONDS until it gets through.
+    """
+    
+    # Longest wait on a sibling whose receive queue is full
+    SEND_TIMEOUT = 1.0
+    RETRY_SECONDS = 1.0
+    
+    def __init__(self, directory, on_delta, name=None):
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._path = os.path.join(directory, f"{name or os.getpid()}.sock")
+        self._on_delta = on_delta
+        self._update_callback = None
+        
+        if os.path.exists(self._path):
+            os.remove(self._path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self._path)
+        self._send_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._send_sock.settimeout(self.SEND_TIMEOUT)
+        self._closed = False
+        # Encoded messages for the sender thread; an Event is set once the
+        # messages before it are sent, None stops the thread
+        self._outbox = queue.Queue()
+        # Sibling sockets that missed a delta and owe a full reload
+        self._dirty = set()
+        
+        self._thread = threading.Thread(target=self._run, name="policy-watcher", daemon=True)
+        self._thread.start()
+        self._sender = threading.Thread(target=self._send_loop, name="policy-watcher-send", daemon=True)
+        self._sender.start()
+    
+    def set_update_callback(self, func):
+        """Full-reload fallback used when no on_delta handler is set"""
+        self._update_callback = func
+    
+    def _run(self):
+        while not self._closed:
+            try:
+                data = self._sock.recv(1 << 20)
+            except OSError:
+                return
+            try:
+                delta = json.loads(data)
+            except ValueError:
+                continue
+            if self._on_delta is not None:
+                self._on_delta(delta)
+            elif self._update_callback is not None:
+                self._update_callback()
+    
+    def _broadcast(self, delta):
+        self._outbox.put(json.dumps(delta).encode())
+    
+    def _send_loop(self):
+        while True:
+            try:
+                data = self._outbox.get(timeout=self.RETRY_SECONDS if self._dirty else None)
+            except queue.Empty:
+                # No new changes, but dirty siblings still owe a reload
+                data = _RELOAD
+            if data is None:
+                return
+            if isinstance(data, threading.Event):
+                data.set()
+                continue
+            self._send(data)
+    
+    def _send(self, data):
+        for path in glob.glob(os.path.join(self._directory, "*.sock")):
+            if path == self._path:
+                continue
+            if path in self._dirty:
+                # The reload covers this delta too: casbin writes the store
+                # before it notifies the watcher
+                if self._send_to(path, _RELOAD):
+                    self._dirty.discard(path)
+            elif not self._send_to(path, data):
+                self._dirty.add(path)
+    
+    def _send_to(self, path, data):
+        """Send one datagram; False when the sibling is alive but could not take it"""
+        try:
+            self._send_sock.sendto(data, path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            # The worker behind this socket is gone
+            self._dirty.discard(path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        except OSError:
+            # Timed out or out of buffer space
+            return False
+        return True
+    
+    def flush(self, timeout=None):
+        """Wait until every queued message has been sent (or given up on)"""
+        done = threading.Event()
+        self._outbox.put(done)
+        return done.wait(timeout)
+    
+    def _broadcast_rules(self, op, sec, ptype, rules):
+        for start in range(0, len(rules), MAX_RULES_PER_MESSAGE):
+            self._broadcast({
+                "op": op,
+                "sec": sec,
+                "ptype": ptype,
+                "rules": [list(rule) for rule in rules[start:start + MAX_RULES_PER_MESSAGE]],
+            })
+    
+    def update(self):
+        self._broadcast({"op": "reload"})
+    
+    def update_for_add_policy(self, sec, ptype, *params):
+        self._broadcast_rules("add", sec, ptype, [_rule(params)])
+    
+    def update_for_remove_policy(self, sec, ptype, *params):
+        self._broadcast_rules("remove", sec, ptype, [_rule(params)])
+    
+    def update_for_add_policies(self, sec, ptype, *rules):
+        self._broadcast_rules("add", sec, ptype, _rules(rules))
+    
+    def update_for_remove_policies(self, sec, ptype, *rules):
+        self._broadcast_rules("remove", sec, ptype, _rules(rules))
+    
+    def update_for_remove_filtered_policy(self, sec, ptype, field_index, *field_values):
+        self._broadcast({
+            "op": "remove_filtered",
+            "sec": sec,
+            "ptype": ptype,
+            "field_index": field_index,
+            "field_values": list(field_values),
+        })
+    
+    def update_for_save_policy(self, model):
+        # Every change was already broadcast as a delta; saving only
+        # persists it, so siblings have nothing to reload
+        pass
+    
+    def close(self):
+        self._closed = True
+        # Let queued deltas go out first, within reason
+        self._outbox.put(None)
+        self._sender.join(timeout=5)
+        self._sock.close()
+        self._send_sock.close()
+        try:
+            os.remove(self._path)
+        except FileNotFoundError:
+            pass
+
+def _rule(params):
+    # casbin passes a single rule list positionally
+    if len(params) == 1 and isinstance(params[0], (list, tuple)):
+        return list(params[0])
+    return list(params)
+
+def _rules(rules):
+    if len(rules) == 1 and rules[0] and isinstance(rules[0][0], (list, tuple)):
+        return [list(rule) for rule in rules[0]]
+    return [list(rule) for rule in rules]
@@ -0,0 +1,98 @@
+from collections import Counter
+from typing import Any, Dict, Optional
+import os
+import sys
+import threading
+import time
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler for a live worker: a daemon thread grabs
+    every other thread's stack with sys._current_frames() at a fixed
+    interval and counts identical stacks. stop() returns them in the
+    folded "frame;frame;frame count" format read by flamegraph.pl and
+    speedscope. Costs nothing while stopped.
+    """
+
+    def __init__(self, max_depth: int = 128):
+        self._max_depth = max_depth
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._started_at = 0.0
+        self._interval = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.005, duration: Optional[float] = None) -> bool:
+        """
+        Start sampling every interval seconds, for at most duration seconds;
+        False if already running
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self._stacks = Counter()
+            self._samples = 0
+            self._interval = interval
+            self._started_at = time.monotonic()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(interval, duration), name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self) -> str:
+        """Stop sampling and get the folded stacks collected so far"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+        return self.folded()
+
+    def folded(self) -> str:
+        stacks = dict(self._stacks)
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "pid": os.getpid(),
+            "samples": self._samples,
+            "stacks": len(self._stacks),
+            "interval": self._interval,
+            "seconds": time.monotonic() - self._started_at if self.running else 0.0,
+        }
+
+    def _run(self, interval: float, duration: Optional[float]) -> None:
+        own = threading.get_ident()
+        deadline = time.monotonic() + duration if duration else None
+        names = {}
+        while not self._stop.wait(interval):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                name = names.get(ident)
+                if name is None:
+                    name = names[ident] = next(
+                        (thread.name for thread in threading.enumerate() if thread.ident == ident), str(ident)
+                    )
+                self._stacks[self._fold(name, frame)] += 1
+            self._samples += 1
+
+    def _fold(self, thread_name: str, frame) -> str:
+        frames = []
+        while frame is not None and len(frames) < self._max_depth:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        frames.append(thread_name)
+        return ";".join(reversed(frames))
+
+profiler = SamplingProfiler()
@@ -1,15 +1,33 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Optional, Union
+from typing import Any, Dict, List, Optional, Union
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
 
-from jose import jwt
+from jose import jwt, JWTError
+from jose.exceptions import ExpiredSignatureError, JWTClaimsError
 from passlib.context import CryptContext
 
 from ..config import settings
+from .metrics import metrics
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+_jwt_decode_seconds = metrics.histogram("jwt_decode_seconds", "Access token signature and claim checks", ["backend"])
+_password_seconds = metrics.histogram("password_hash_seconds", "bcrypt time per operation", ["op"])
+_password_hash = _password_seconds.labels("hash")
+_password_verify = _password_seconds.labels("verify")
+_password_queue_seconds = metrics.histogram(
+    "password_queue_seconds", "Time password operations wait for a bcrypt worker", ["op"]
+)
+
 def create_access_token(
-    subject: Union[str, Any], role: str, expires_delta: Optional[timedelta] = None
+    subject: Union[str, Any], role: str, expires_delta: Optional[timedelta] = None, domain: Optional[str] = None
 ) -> str:
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -18,11 +36,192 @@ def create_access_token(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
     to_encode = {"exp": expire, "sub": str(subject), "role": role}
+    if domain is not None:
+        # The tenant the token is scoped to
+        to_encode["dom"] = domain
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+_HMAC_ALGORITHMS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+
+def decode_access_token(token: str) -> Dict[str, Any]:
+    """
+    Verify a token and return its claims, raising JWTError if it is invalid.
+    With JWT_BACKEND = "native", HMAC tokens are checked with the stdlib
+    instead of python-jose; other algorithms always go through jose.
+    """
+    started = time.perf_counter()
+    if settings.JWT_BACKEND == "native" and settings.ALGORITHM in _HMAC_ALGORITHMS:
+        try:
+            return _decode_hmac(token, settings.SECRET_KEY, settings.ALGORITHM)
+        finally:
+            _jwt_decode_seconds.labels("native").observe(time.perf_counter() - started)
+    try:
+        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    finally:
+        _jwt_decode_seconds.labels("jose").observe(time.perf_counter() - started)
+
+def _decode_hmac(token: str, key: str, algorithm: str) -> Dict[str, Any]:
+    try:
+        signing_input, _, signature = token.rpartition(".")
+        header_segment, payload_segment = signing_input.split(".")
+        header = json.loads(_b64decode(header_segment))
+        expected = hmac.new(key.encode(), signing_input.encode(), _HMAC_ALGORITHMS[algorithm]).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            raise JWTError("Signature verification failed.")
+        claims = json.loads(_b64decode(payload_segment))
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise JWTError("Error decoding token.") from e
+    
+    if not isinstance(header, dict) or header.get("alg") != algorithm:
+        raise JWTError("The specified alg value is not allowed")
+    if not isinstance(claims, dict):
+        raise JWTError("Invalid payload string: must be a json object")
+    
+    # Same registered-claim checks python-jose applies with default options
+    now = time.time()
+    for claim in ("exp", "nbf", "iat"):
+        if claim in claims and (isinstance(claims[claim], bool) or not isinstance(claims[claim], (int, float))):
+            raise JWTClaimsError(f"{claim} claim must be a number.")
+    if "exp" in claims and claims["exp"] < now:
+        raise ExpiredSignatureError("Signature has expired.")
+    if "nbf" in claims and claims["nbf"] > now:
+        raise JWTClaimsError("The token is not yet valid (nbf)")
+    if "aud" in claims:
+        raise JWTClaimsError("Invalid audience")
+    return claims
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    started = time.perf_counter()
+    try:
+        return pwd_context.verify(plain_password, hashed_password)
+    finally:
+        _password_verify.observe(time.perf_counter() - started)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
\ No newline at end of file
+    started = time.perf_counter()
+    try:
+        return pwd_context.hash(password)
+    finally:
+        _password_hash.observe(time.perf_counter() - started)
+
+class PasswordServiceBusy(Exception):
+    """Raised when too many password operations are already queued"""
+
+class PasswordService:
+    """
+    Runs bcrypt in a dedicated, size-limited thread pool so a login burst
+    cannot tie up the request threadpool (bcrypt releases the GIL, so the
+    workers hash in parallel). Calls beyond max_pending in flight are
+    rejected with PasswordServiceBusy instead of queueing without bound.
+    A slot is held until bcrypt is done with it, even when the caller
+    has gone away.
+    """
+    
+    def __init__(self, max_workers: int, max_pending: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._max_workers = max_workers
+        self._max_pending = max_pending
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            op: {"calls": 0, "rejected": 0, "seconds_total": 0.0, "seconds_max": 0.0, "queue_seconds_total": 0.0}
+            for op in ("hash", "verify")
+        }
+    
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", get_password_hash, password)
+    
+    async def hash_many(self, passwords: List[str], return_busy: bool = False) -> List[Union[str, PasswordServiceBusy]]:
+        """
+        Hash a batch across the pool, in order. At most one hash per worker
+        is queued at a time, so interactive calls interleave with the batch
+        instead of waiting behind it. Each hash is admitted like a single
+        call, so an overloaded pool fails the batch with
+        PasswordServiceBusy, or with return_busy puts it in place of each
+        refused hash and carries on with the rest.
+        """
+        slots = asyncio.Semaphore(max(1, min(self._max_workers, self._max_pending)))
+        
+        async def hash_one(password):
+            async with slots:
+                try:
+                    return await self._submit("hash", get_password_hash, password)
+                except PasswordServiceBusy as e:
+                    if return_busy:
+                        return e
+                    raise
+        
+        tasks = [asyncio.ensure_future(hash_one(password)) for password in passwords]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+    
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit("verify", verify_password, plain_password, hashed_password)
+    
+    async def _submit(self, op: str, fn, *args):
+        with self._lock:
+            if self._pending >= self._max_pending:
+                self._stats[op]["rejected"] += 1
+                raise PasswordServiceBusy(f"Too many pending password operations ({self._pending})")
+            self._pending += 1
+        
+        submitted = time.perf_counter()
+        
+        def timed():
+            started = time.perf_counter()
+            result = fn(*args)
+            return result, started - submitted, time.perf_counter() - started
+        
+        def release(_):
+            with self._lock:
+                self._pending -= 1
+        
+        try:
+            future = self._executor.submit(timed)
+        except BaseException:
+            release(None)
+            raise
+        # Released when the job ends (or is cancelled before it starts), not
+        # when the caller stops waiting for it
+        future.add_done_callback(release)
+        result, queued, elapsed = await asyncio.wrap_future(future)
+        
+        with self._lock:
+            stats = self._stats[op]
+            stats["calls"] += 1
+            stats["seconds_total"] += elapsed
+            stats["seconds_max"] = max(stats["seconds_max"], elapsed)
+            stats["queue_seconds_total"] += queued
+        _password_queue_seconds.labels(op).observe(queued)
+        return result
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-operation timing counters and the current queue depth"""
+        with self._lock:
+            return {"pending": self._pending, **{op: dict(stats) for op, stats in self._stats.items()}}
+
+password_service = PasswordService(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
+
+def _collect_password_service():
+    stats = password_service.get_stats()
+    return [
+        ("password_pending", "gauge", "Password operations queued or running", [({}, stats["pending"])]),
+        (
+            "password_rejected_total", "counter", "Password operations shed with 503",
+            [({"op": op}, stats[op]["rejected"]) for op in ("hash", "verify")],
+        ),
+    ]
+
+metrics.add_collector(_collect_password_service)
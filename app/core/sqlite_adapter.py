@@ -0,0 +1,190 @@
+import sqlite3
+import threading
+
+from casbin import persist
+
+COLUMNS = ["v0", "v1", "v2", "v3", "v4", "v5"]
+
+class Filter:
+    """
+    Policy filter for SQLiteAdapter.load_filtered_policy, following casbin's
+    file Filter: P and G hold per-field values, where "" matches anything.
+    A field value may also be a list to match any of several values (an
+    empty list matches nothing).
+    """
+    
+    def __init__(self, P=None, G=None):
+        self.P = P or []
+        self.G = G or []
+
+class SQLiteAdapter(persist.FilteredAdapter, persist.BatchAdapter):
+    """
+    Casbin adapter backed by a local SQLite database in WAL mode.
+    Rules are stored one per row with ptype/v0/v1 indexed, so single-rule
+    changes are one indexed INSERT/DELETE and filtered loads only read the
+    rows they need.
+    """
+    
+    def __init__(self, db_path, filtered=False):
+        self._db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS casbin_rule (
+                id INTEGER PRIMARY KEY,
+                ptype TEXT NOT NULL,
+                v0 TEXT NOT NULL DEFAULT '',
+                v1 TEXT NOT NULL DEFAULT '',
+                v2 TEXT NOT NULL DEFAULT '',
+                v3 TEXT NOT NULL DEFAULT '',
+                v4 TEXT NOT NULL DEFAULT '',
+                v5 TEXT NOT NULL DEFAULT '',
+                UNIQUE (ptype, v0, v1, v2, v3, v4, v5)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_casbin_rule_ptype_v0_v1 ON casbin_rule (ptype, v0, v1)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_casbin_rule_ptype_v1 ON casbin_rule (ptype, v1)")
+        # Domain role links (g = user, role, domain) are loaded per domain
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_casbin_rule_ptype_v2 ON casbin_rule (ptype, v2)")
+        # Like casbin's file FilteredAdapter, start filtered so the enforcer
+        # does not load everything on construction
+        self._filtered = filtered
+    
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM casbin_rule LIMIT 1").fetchone() is None
+    
+    def import_csv(self, policy_path):
+        """Seed the store from a casbin policy CSV file"""
+        rows = []
+        with open(policy_path, "r", encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                ptype, *rule = [token.strip() for token in line.split(",")]
+                rows.append(_row(ptype, rule))
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO casbin_rule (ptype, v0, v1, v2, v3, v4, v5) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+    
+    def _load_rows(self, model, rows):
+        for ptype, rule in rows:
+            sec = ptype[0]
+            if sec not in model.model.keys() or ptype not in model.model[sec].keys():
+                continue
+            model.model[sec][ptype].policy.append(rule)
+    
+    def load_policy(self, model):
+        with self._lock:
+            rows = self._conn.execute("SELECT ptype, v0, v1, v2, v3, v4, v5 FROM casbin_rule ORDER BY id").fetchall()
+        self._load_rows(model, [(ptype, _trim(values)) for ptype, *values in rows])
+        self._filtered = False
+    
+    def load_filtered_policy(self, model, filter):
+        if filter is None:
+            return self.load_policy(model)
+        
+        rows = []
+        for sec, field_values in (("p", getattr(filter, "P", [])), ("g", getattr(filter, "G", []))):
+            if sec not in model.model.keys():
+                continue
+            rows.extend(self.query(list(model.model[sec].keys()), field_values))
+        self._load_rows(model, rows)
+        self._filtered = True
+    
+    def query(self, ptypes, field_values):
+        """Get (ptype, rule) pairs of the given types matching per-field values"""
+        clauses = [f"ptype IN ({', '.join('?' * len(ptypes))})"]
+        params = list(ptypes)
+        for column, value in zip(COLUMNS, field_values):
+            if isinstance(value, (list, tuple, set, frozenset)):
+                if not value:
+                    return []
+                clauses.append(f"{column} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            elif value != "":
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        sql = f"SELECT ptype, v0, v1, v2, v3, v4, v5 FROM casbin_rule WHERE {' AND '.join(clauses)} ORDER BY id"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [(ptype, _trim(values)) for ptype, *values in rows]
+    
+    def is_filtered(self):
+        return self._filtered
+    
+    def save_policy(self, model):
+        """Replace the whole store with the model's rules"""
+        rows = []
+        for sec in ("p", "g"):
+            if sec not in model.model.keys():
+                continue
+            for ptype, ast in model.model[sec].items():
+                rows.extend(_row(ptype, rule) for rule in ast.policy)
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM casbin_rule")
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO casbin_rule (ptype, v0, v1, v2, v3, v4, v5) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        return True
+    
+    def add_policy(self, sec, ptype, rule):
+        self.add_policies(sec, ptype, [rule])
+    
+    def add_policies(self, sec, ptype, rules):
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO casbin_rule (ptype, v0, v1, v2, v3, v4, v5) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [_row(ptype, rule) for rule in rules],
+                )
+    
+    def remove_policy(self, sec, ptype, rule):
+        self.remove_policies(sec, ptype, [rule])
+    
+    def remove_policies(self, sec, ptype, rules):
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "DELETE FROM casbin_rule WHERE ptype = ? AND v0 = ? AND v1 = ? AND v2 = ? AND v3 = ? AND v4 = ? AND v5 = ?",
+                    [_row(ptype, rule) for rule in rules],
+                )
+    
+    def remove_filtered_policy(self, sec, ptype, field_index, *field_values):
+        clauses = ["ptype = ?"]
+        params = [ptype]
+        for column, value in zip(COLUMNS[field_index:], field_values):
+            if value != "":
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        with self._lock:
+            with self._conn:
+                self._conn.execute(f"DELETE FROM casbin_rule WHERE {' AND '.join(clauses)}", params)
+    
+    def commit(self):
+        """Every change is committed as it happens"""
+        return True
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def _row(ptype, rule):
+    values = list(rule) + [""] * (len(COLUMNS) - len(rule))
+    return (ptype, *values[: len(COLUMNS)])
+
+def _trim(values):
+    values = list(values)
+    while values and values[-1] == "":
+        values.pop()
+    return values
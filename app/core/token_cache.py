@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+import hashlib
+import threading
+import time
+
+from ..config import settings
+from ..schemas.token import TokenPayload
+from .metrics import metrics
+from .security import decode_access_token
+
+class TokenCache:
+    """
+    Bounded LRU of verified access tokens keyed by their SHA-256 digest, so
+    a token reused across requests is decoded and validated once. Entries
+    are dropped when the token expires, and revoke_subject drops every token
+    of a user (on deletion or deactivation) so none is served from the
+    cache afterwards.
+    """
+    
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        self._by_subject: Dict[str, Set[bytes]] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+    
+    def verify(self, token: str) -> TokenPayload:
+        """
+        Get the validated payload of a token, raising JWTError or
+        ValidationError if it does not verify
+        """
+        key = hashlib.sha256(token.encode()).digest()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                token_data, expires_at = entry
+                if time.time() <= expires_at:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return token_data
+                self._discard(key)
+            self._misses += 1
+        
+        payload = decode_access_token(token)
+        token_data = TokenPayload(**payload)
+        
+        expires_at = payload.get("exp")
+        if self._max_size > 0 and isinstance(expires_at, (int, float)):
+            with self._lock:
+                self._discard(key)
+                self._entries[key] = (token_data, expires_at)
+                self._by_subject.setdefault(token_data.sub, set()).add(key)
+                while len(self._entries) > self._max_size:
+                    self._discard(next(iter(self._entries)))
+        return token_data
+    
+    def _discard(self, key: bytes) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_subject.get(entry[0].sub)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_subject[entry[0].sub]
+    
+    def revoke_subject(self, sub: str) -> int:
+        """Drop every cached token issued to a subject; returns how many"""
+        with self._lock:
+            keys = list(self._by_subject.get(sub, ()))
+            for key in keys:
+                self._discard(key)
+            return len(keys)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_subject.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache size and hit counters; hits are decodes avoided"""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "decodes_avoided": self._hits,
+                "decodes": self._misses,
+            }
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE)
+
+def _collect_token_cache():
+    stats = token_cache.get_stats()
+    return [
+        ("token_cache_hits_total", "counter", "Token verifications served from the cache", [({}, stats["decodes_avoided"])]),
+        ("token_cache_misses_total", "counter", "Token verifications that decoded the token", [({}, stats["decodes"])]),
+        ("token_cache_size", "gauge", "Cached verified tokens", [({}, stats["size"])]),
+    ]
+
+metrics.add_collector(_collect_token_cache)
@@ -1,9 +1,20 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import time
+
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from .config import settings
-from .api.endpoints import auth, users, resources
+from .core.metrics import metrics as metrics_registry
+from .core.security import PasswordServiceBusy
+from .api.endpoints import auth, users, resources, authz, metrics
 from .api.middleware.authorization import AuthorizationMiddleware
+from .api.route_permissions import RoutePermissionTable
+
+# Reported alongside uvicorn's own startup messages
+logger = logging.getLogger("uvicorn.error")
 
 app = FastAPI(
     title=settings.APP_NAME,
@@ -12,7 +23,11 @@ app = FastAPI(
     redoc_url=f"{settings.API_PREFIX}/redoc",
 )
 
-# Set up CORS
+# Add authorization middleware
+# Rejects requests to permission-checked routes before they are dispatched
+app.add_middleware(AuthorizationMiddleware)
+
+# Set up CORS (added last so it is outermost and also covers 403s)
 origins = [
     "http://localhost",
     "http://localhost:8000",
@@ -27,14 +42,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Add authorization middleware
-# You can uncomment this to enable global authorization checks
-# app.add_middleware(AuthorizationMiddleware)
-
 # Include routers
 app.include_router(auth.router, prefix=f"{settings.API_PREFIX}/auth", tags=["auth"])
 app.include_router(users.router, prefix=f"{settings.API_PREFIX}/users", tags=["users"])
 app.include_router(resources.router, prefix=f"{settings.API_PREFIX}/resources", tags=["resources"])
+app.include_router(authz.router, prefix=f"{settings.API_PREFIX}/authz", tags=["authz"])
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router, prefix=f"{settings.API_PREFIX}/metrics", tags=["metrics"])
+
+@app.exception_handler(PasswordServiceBusy)
+async def password_service_busy_handler(request: Request, exc: PasswordServiceBusy):
+    # Shed load rather than queueing bcrypt work without bound
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server busy, try again later"},
+        headers={"Retry-After": "1"},
+    )
 
 @app.get("/")
 def root():
@@ -42,46 +65,64 @@ def root():
 
 # Add a startup event to load some sample users if the users_db is empty
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
     from .models.user import users_db, User
-    from .core.security import get_password_hash
+    from .core.security import password_service
     from .core.casbin_rbac import CasbinEnforcer
     import uuid
     
+    started = time.perf_counter()
+    
+    # Map every route and method to the permissions it checks, so the
+    # authorization middleware does a route-id lookup and a bit test
+    app.state.route_permissions = RoutePermissionTable.from_app(app)
+    
+    # Load the policy now instead of on the first request, while the sample
+    # users' passwords hash concurrently on the password pool
+    warm_up = asyncio.get_running_loop().run_in_executor(None, CasbinEnforcer.get_instance)
+    
     # Add sample users if the users_db is empty
     if not users_db:
-        # Admin user
-        admin_id = str(uuid.uuid4())
-        admin = User(
-            id=admin_id,
-            email="admin@example.com",
-            username="admin_user",
-            hashed_password=get_password_hash("adminpassword"),
-            full_name="Admin User",
-            role="admin",
-        )
-        users_db[admin_id] = admin
-        
-        # Manager user
-        manager_id = str(uuid.uuid4())
-        manager = User(
-            id=manager_id,
-            email="manager@example.com",
-            username="manager_user",
-            hashed_password=get_password_hash("managerpassword"),
-            full_name="Manager User",
-            role="manager",
-        )
-        users_db[manager_id] = manager
-        
-        # Regular user
-        user_id = str(uuid.uuid4())
-        regular_user = User(
-            id=user_id,
-            email="user@example.com",
-            username="regular_user",
-            hashed_password=get_password_hash("userpassword"),
-            full_name="Regular User",
-            role="user",
-        )
-        users_db[user_id] = regular_user
\ No newline at end of file
+        samples = [
+            ("admin@example.com", "admin_user", "adminpassword", "Admin User", "admin"),
+            ("manager@example.com", "manager_user", "managerpassword", "Manager User", "manager"),
+            ("user@example.com", "regular_user", "userpassword", "Regular User", "user"),
+        ]
+        hashed_passwords = await password_service.hash_many([password for _, _, password, _, _ in samples])
+        for (email, username, _, full_name, role), hashed_password in zip(samples, hashed_passwords):
+            user_id = str(uuid.uuid4())
+            users_db[user_id] = User(
+                id=user_id,
+                email=email,
+                username=username,
+                hashed_password=hashed_password,
+                full_name=full_name,
+                role=role,
+            )
+    
+    await warm_up
+    app.state.startup_seconds = time.perf_counter() - started
+    logger.info("Startup took %.3fs", app.state.startup_seconds)
+
+def _collect_startup():
+    startup_seconds = getattr(app.state, "startup_seconds", None)
+    if startup_seconds is None:
+        return []
+    return [("app_startup_seconds", "gauge", "Time the startup event took", [({}, startup_seconds)])]
+
+metrics_registry.add_collector(_collect_startup)
+
+@app.on_event("shutdown")
+def shutdown_event():
+    from .core.casbin_rbac import CasbinEnforcer
+    
+    # Make sure buffered policy changes reach disk
+    CasbinEnforcer.close()
+    
+    from .core.login_throttle import login_throttle
+    login_throttle.close()
+    
+    from .models.resource import resources_db
+    close = getattr(resources_db, "close", None)
+    if close is not None:
+        close()
\ No newline at end of file
@@ -0,0 +1,53 @@
+from bisect import bisect_right
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+
+class KeysetIndex:
+    """
+    Insertion-ordered sequence numbers for the keys of an in-memory store,
+    so listings can page by "rows after sequence N" instead of by offset.
+    A key keeps its sequence number when its value is replaced, which keeps
+    the order stable across updates; deleted keys leave holes that are
+    skipped and compacted away once they make up half the index.
+    Callers serialize writes; reads tolerate concurrent writes.
+    """
+
+    def __init__(self):
+        self._next_seq = 1
+        self._seqs: List[int] = []
+        self._keys: Dict[int, Hashable] = {}
+        self._seq_by_key: Dict[Hashable, int] = {}
+
+    def add(self, key: Hashable) -> int:
+        """Give a new key the next sequence number; existing keys keep theirs"""
+        seq = self._seq_by_key.get(key)
+        if seq is None:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._keys[seq] = key
+            self._seq_by_key[key] = seq
+            self._seqs.append(seq)
+        return seq
+
+    def remove(self, key: Hashable) -> None:
+        seq = self._seq_by_key.pop(key, None)
+        if seq is None:
+            return
+        del self._keys[seq]
+        if len(self._seqs) > 2 * len(self._keys) + 64:
+            self._seqs = [seq for seq in self._seqs if seq in self._keys]
+
+    def seq_of(self, key: Hashable) -> Optional[int]:
+        return self._seq_by_key.get(key)
+
+    def after(self, seq: int = 0) -> Iterator[Tuple[int, Hashable]]:
+        """Yield (seq, key) pairs in order, starting after seq"""
+        while True:
+            seqs = self._seqs
+            position = bisect_right(seqs, seq)
+            if position >= len(seqs):
+                return
+            # Walk a slice so a concurrent compaction does not shift us
+            for seq in seqs[position:position + 256]:
+                key = self._keys.get(seq)
+                if key is not None:
+                    yield seq, key
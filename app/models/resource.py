@@ -0,0 +1,222 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from collections.abc import MutableMapping
+import json
+import re
+import sqlite3
+import threading
+
+from ..config import settings
+from .keyset import KeysetIndex
+
+# Attribute names usable as index expressions and filters
+ATTRIBUTE_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+class ResourceRepository(MutableMapping):
+    """
+    In-memory resource store keyed by id, kept in insertion order for
+    keyset pagination. Resources are free-form dicts.
+    """
+
+    def __init__(self):
+        self._resources: Dict[str, Dict] = {}
+        self._order = KeysetIndex()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, resource_id: str) -> Dict:
+        return self._resources[resource_id]
+
+    def __setitem__(self, resource_id: str, resource: Dict) -> None:
+        with self._lock:
+            self._resources[resource_id] = resource
+            self._order.add(resource_id)
+
+    def __delitem__(self, resource_id: str) -> None:
+        with self._lock:
+            del self._resources[resource_id]
+            self._order.remove(resource_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._resources)
+
+    def __len__(self) -> int:
+        return len(self._resources)
+
+    def __contains__(self, resource_id: object) -> bool:
+        return resource_id in self._resources
+
+    def values(self):
+        return self._resources.values()
+
+    def add_many(self, resources: Iterable[Dict]) -> None:
+        with self._lock:
+            for resource in resources:
+                self._resources[resource["id"]] = resource
+                self._order.add(resource["id"])
+
+    def iter_after(self, seq: int = 0, **filters) -> Iterator[Tuple[int, Dict]]:
+        """
+        Yield (seq, resource) pairs in insertion order, starting after seq,
+        that match every filter (attribute name to value); filtering scans
+        """
+        for seq, resource_id in self._order.after(seq):
+            resource = self._resources.get(resource_id)
+            if resource is not None and all(resource.get(name) == value for name, value in filters.items()):
+                yield seq, resource
+
+    def iter_permitted(self, seq: int, ids: Iterable[str], owner: Optional[str] = None, **filters) -> Iterator[Tuple[int, Dict]]:
+        """Like iter_after, limited to the given ids plus resources created by owner"""
+        ids = set(ids)
+        for seq, resource in self.iter_after(seq, **filters):
+            if resource["id"] in ids or (owner is not None and resource.get("created_by") == owner):
+                yield seq, resource
+
+class SQLiteResourceStore(MutableMapping):
+    """
+    Resource store backed by a local SQLite database in WAL mode, so
+    resources survive restarts and are shared by every worker on the host.
+    Resources are stored as JSON with created_by and domain in their own
+    indexed columns, and each declared attribute gets an expression index,
+    so filtered listings read only matching rows. Rows keep the sequence number they
+    were inserted with, which is the listing order and cursor.
+    """
+
+    # Rows fetched per query while iterating
+    BATCH_SIZE = 256
+
+    def __init__(self, db_path: str, indexed_attributes: Iterable[str] = ()):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS resources (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                created_by TEXT,
+                domain TEXT,
+                data TEXT NOT NULL
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(resources)")}
+        if "domain" not in columns:
+            # Resources stored before tenants belong to the default one
+            self._conn.execute("ALTER TABLE resources ADD COLUMN domain TEXT")
+            self._conn.execute(
+                "UPDATE resources SET domain = ?1, data = json_set(data, '$.domain', ?1)",
+                (settings.DEFAULT_DOMAIN,),
+            )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_resources_created_by ON resources (created_by, seq)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_resources_domain ON resources (domain, seq)")
+        self._attributes = set()
+        for name in indexed_attributes:
+            if not ATTRIBUTE_NAME.match(name):
+                raise ValueError(f"Invalid indexed attribute name: {name!r}")
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_resources_attr_{name} ON resources (json_extract(data, '$.{name}'), seq)"
+            )
+            self._attributes.add(name)
+        self._conn.commit()
+
+    def _fetch(self, sql: str, params=()) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def __getitem__(self, resource_id: str) -> Dict:
+        rows = self._fetch("SELECT data FROM resources WHERE id = ?", (resource_id,))
+        if not rows:
+            raise KeyError(resource_id)
+        return json.loads(rows[0][0])
+
+    def __setitem__(self, resource_id: str, resource: Dict) -> None:
+        self.add_many([{**resource, "id": resource_id}])
+
+    def __delitem__(self, resource_id: str) -> None:
+        with self._lock:
+            with self._conn:
+                deleted = self._conn.execute("DELETE FROM resources WHERE id = ?", (resource_id,)).rowcount
+        if not deleted:
+            raise KeyError(resource_id)
+
+    def __iter__(self) -> Iterator[str]:
+        for _, resource in self.iter_after():
+            yield resource["id"]
+
+    def __len__(self) -> int:
+        return self._fetch("SELECT COUNT(*) FROM resources")[0][0]
+
+    def __contains__(self, resource_id: object) -> bool:
+        return bool(self._fetch("SELECT 1 FROM resources WHERE id = ?", (resource_id,)))
+
+    def values(self):
+        return [resource for _, resource in self.iter_after()]
+
+    def add_many(self, resources: Iterable[Dict]) -> None:
+        """Insert or replace resources in one transaction; replaced rows keep their place"""
+        rows = [
+            (resource["id"], resource.get("created_by"), resource.get("domain"), json.dumps(resource))
+            for resource in resources
+        ]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    """
+                    INSERT INTO resources (id, created_by, domain, data) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET
+                        created_by = excluded.created_by, domain = excluded.domain, data = excluded.data
+                    """,
+                    rows,
+                )
+
+    def iter_after(self, seq: int = 0, **filters) -> Iterator[Tuple[int, Dict]]:
+        """
+        Yield (seq, resource) pairs in insertion order, starting after seq,
+        that match every filter; only created_by, domain and declared
+        attributes can be filtered on
+        """
+        return self._iter(seq, [], [], filters)
+
+    def iter_permitted(self, seq: int, ids: Iterable[str], owner: Optional[str] = None, **filters) -> Iterator[Tuple[int, Dict]]:
+        """
+        Like iter_after, limited to the given ids plus resources created by
+        owner; both are index lookups
+        """
+        clause = "id IN (SELECT value FROM json_each(?))"
+        params = [json.dumps(sorted(ids))]
+        if owner is not None:
+            clause = f"({clause} OR created_by = ?)"
+            params.append(owner)
+        return self._iter(seq, [clause], params, filters)
+
+    def _iter(self, seq, clauses, params, filters):
+        clauses = ["seq > ?", *clauses]
+        params = list(params)
+        for name, value in filters.items():
+            if name in ("created_by", "domain"):
+                clauses.append(f"{name} = ?")
+            elif name in self._attributes:
+                clauses.append(f"json_extract(data, '$.{name}') = ?")
+            else:
+                raise ValueError(f"Resources cannot be filtered on {name!r}")
+            params.append(value)
+        sql = f"SELECT seq, data FROM resources WHERE {' AND '.join(clauses)} ORDER BY seq LIMIT {self.BATCH_SIZE}"
+
+        while True:
+            rows = self._fetch(sql, [seq, *params])
+            for seq, data in rows:
+                yield seq, json.loads(data)
+            if len(rows) < self.BATCH_SIZE:
+                return
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+def create_resource_store():
+    if settings.RESOURCE_BACKEND == "sqlite":
+        return SQLiteResourceStore(settings.RESOURCE_SQLITE_PATH, settings.RESOURCE_INDEXED_ATTRIBUTES)
+    return ResourceRepository()
+
+resources_db = create_resource_store()
@@ -1,19 +1,198 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from collections.abc import MutableMapping
 from datetime import datetime
+import sys
+import threading
+import time
+
+from .keyset import KeysetIndex
+from ..config import settings
+from ..core.metrics import metrics
 
 # In a real application, you would use SQLAlchemy or another ORM
 # This is a simplified in-memory model for demonstration
-class User(BaseModel):
-    id: str
-    email: str
-    username: str
-    hashed_password: str
-    full_name: Optional[str] = None
-    role: str
-    is_active: bool = True
-    created_at: datetime = datetime.now()
-    updated_at: datetime = datetime.now()
+class User:
+    """
+    Stored user record. Slotted, with the role string interned, so a
+    million users cost a fraction of the memory of one model instance
+    each; public_dict serializes straight to the response JSON shape.
+    """
+    
+    __slots__ = (
+        "id",
+        "email",
+        "username",
+        "hashed_password",
+        "full_name",
+        "role",
+        "domain",
+        "is_active",
+        "created_at",
+        "updated_at",
+    )
+    
+    # Fields exposed by the public user schema, in response order
+    PUBLIC_FIELDS = ("email", "username", "full_name", "id", "role", "domain", "is_active", "created_at", "updated_at")
+    
+    def __init__(
+        self,
+        id: str,
+        email: str,
+        username: str,
+        hashed_password: str,
+        role: str,
+        full_name: Optional[str] = None,
+        is_active: bool = True,
+        created_at: Optional[datetime] = None,
+        updated_at: Optional[datetime] = None,
+        domain: Optional[str] = None,
+    ):
+        now = datetime.now() if created_at is None or updated_at is None else None
+        self.id = id
+        self.email = email
+        self.username = username
+        self.hashed_password = hashed_password
+        self.full_name = full_name
+        self.role = sys.intern(role)
+        # The tenant whose rules authorize this user, under a domain model
+        self.domain = sys.intern(domain or settings.DEFAULT_DOMAIN)
+        self.is_active = is_active
+        self.created_at = created_at or now
+        self.updated_at = updated_at or now
+    
+    def replace(self, **changes) -> "User":
+        """Get a copy with some fields changed"""
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return User(**values)
+    
+    def public_dict(self, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Get the public fields as JSON-ready values"""
+        row = {}
+        for name in fields or self.PUBLIC_FIELDS:
+            value = getattr(self, name)
+            row[name] = value.isoformat() if isinstance(value, datetime) else value
+        return row
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, User):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+    
+    def __repr__(self) -> str:
+        return f"User(id={self.id!r}, username={self.username!r}, role={self.role!r})"
+
+_lookup_seconds = metrics.histogram("user_store_lookup_seconds", "User store lookups", ["by"])
+_lookup_by_id = _lookup_seconds.labels("id")
+_lookup_by_username = _lookup_seconds.labels("username")
+_lookup_by_email = _lookup_seconds.labels("email")
+
+class UserRepository(MutableMapping):
+    """
+    In-memory user store keyed by id with unique secondary indexes on
+    username and email. Assigning a new User object to an existing id
+    (as the update paths do) re-indexes it, so lookups stay consistent.
+    Users are also kept in insertion order for keyset pagination.
+    """
+
+    def __init__(self):
+        self._users: Dict[str, User] = {}
+        self._by_username: Dict[str, str] = {}
+        self._by_email: Dict[str, str] = {}
+        self._order = KeysetIndex()
+        self._lock = threading.RLock()
+
+    def __getitem__(self, user_id: str) -> User:
+        return self._users[user_id]
+
+    def __setitem__(self, user_id: str, user: User) -> None:
+        with self._lock:
+            conflict = self.find_conflict(user.email, user.username, exclude_id=user_id)
+            if conflict is not None:
+                raise ValueError(f"User with this email or username already exists: {conflict.id}")
+
+            old = self._users.get(user_id)
+            if old is not None:
+                self._by_username.pop(old.username, None)
+                self._by_email.pop(old.email, None)
+            self._users[user_id] = user
+            self._by_username[user.username] = user_id
+            self._by_email[user.email] = user_id
+            self._order.add(user_id)
+
+    def add_many(self, users: Iterable[User]) -> List[User]:
+        """
+        Insert new users under one lock acquisition, skipping any whose id,
+        email or username is taken, including by an earlier user in the
+        batch; returns the skipped users
+        """
+        skipped = []
+        with self._lock:
+            for user in users:
+                if user.id in self._users or self.find_conflict(user.email, user.username) is not None:
+                    skipped.append(user)
+                    continue
+                self._users[user.id] = user
+                self._by_username[user.username] = user.id
+                self._by_email[user.email] = user.id
+                self._order.add(user.id)
+        return skipped
+
+    def __delitem__(self, user_id: str) -> None:
+        with self._lock:
+            user = self._users.pop(user_id)
+            self._by_username.pop(user.username, None)
+            self._by_email.pop(user.email, None)
+            self._order.remove(user_id)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._users)
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self._users
+
+    def get(self, user_id: str, default=None) -> Optional[User]:
+        started = time.perf_counter()
+        user = self._users.get(user_id, default)
+        _lookup_by_id.observe(time.perf_counter() - started)
+        return user
+
+    def values(self):
+        return self._users.values()
+
+    def items(self):
+        return self._users.items()
+
+    def iter_after(self, seq: int = 0) -> Iterator[Tuple[int, User]]:
+        """Yield (seq, user) pairs in insertion order, starting after seq"""
+        for seq, user_id in self._order.after(seq):
+            user = self._users.get(user_id)
+            if user is not None:
+                yield seq, user
+    
+    def get_by_username(self, username: str) -> Optional[User]:
+        started = time.perf_counter()
+        user_id = self._by_username.get(username)
+        user = self._users.get(user_id) if user_id is not None else None
+        _lookup_by_username.observe(time.perf_counter() - started)
+        return user
+
+    def get_by_email(self, email: str) -> Optional[User]:
+        started = time.perf_counter()
+        user_id = self._by_email.get(email)
+        user = self._users.get(user_id) if user_id is not None else None
+        _lookup_by_email.observe(time.perf_counter() - started)
+        return user
+
+    def find_conflict(self, email: Optional[str], username: Optional[str], exclude_id: Optional[str] = None) -> Optional[User]:
+        """Get another user already holding this email or username"""
+        for user in (self.get_by_email(email), self.get_by_username(username)):
+            if user is not None and user.id != exclude_id:
+                return user
+        return None
 
 # In-memory user database (for demonstration purposes)
-users_db = {}
\ No newline at end of file
+users_db = UserRepository()
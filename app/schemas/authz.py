@@ -0,0 +1,23 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+# A single (sub, obj, act) check; sub defaults to the caller
+class AuthzCheck(BaseModel):
+    sub: Optional[str] = None
+    obj: str
+    act: str
+
+# Schema for a batch of checks
+class AuthzCheckRequest(BaseModel):
+    checks: List[AuthzCheck] = Field(..., max_length=1000)
+
+# Schema for a single check result
+class AuthzDecision(BaseModel):
+    sub: str
+    obj: str
+    act: str
+    allowed: bool
+
+# Schema for returning batch decisions, in request order
+class AuthzCheckResponse(BaseModel):
+    results: List[AuthzDecision]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 # User base schema
@@ -12,6 +12,8 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     password: str = Field(..., min_length=8)
     role: str
+    # Tenant; defaults to the creating admin's, and ignored on signup (always DEFAULT_DOMAIN)
+    domain: Optional[str] = None
 
 # Schema for updating a user
 class UserUpdate(BaseModel):
@@ -26,6 +28,7 @@ class UserUpdate(BaseModel):
 class UserInDB(UserBase):
     id: str
     role: str
+    domain: str
     is_active: bool
     created_at: datetime
     updated_at: datetime
@@ -35,4 +38,22 @@ class User(UserInDB):
     pass
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+# Schema for one (obj, act) pair a user may perform
+class UserPermission(BaseModel):
+    obj: str
+    act: str
+
+# Schema for everything a user may do through the roles they hold
+class UserPermissions(BaseModel):
+    permissions: List[UserPermission]
+
+# Schema for a bulk import row that was not created
+class UserImportError(BaseModel):
+    row: int
+    detail: str
+
+# Schema for the result of a bulk import
+class UserImportResult(BaseModel):
+    created: List[User]
+    errors: List[UserImportError]
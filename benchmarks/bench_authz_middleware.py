@@ -0,0 +1,99 @@
+"""
+Authorization overhead benchmark: the check_permission dependency alone vs.
+with the pure ASGI AuthorizationMiddleware in front of it, for allowed and
+denied requests, driven in-process through the ASGI interface.
+
+    python -m benchmarks.bench_authz_middleware --requests 20000
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import Depends, FastAPI
+
+from app.api.deps import check_permission
+from app.api.middleware.authorization import AuthorizationMiddleware
+from app.core.security import create_access_token
+from app.models.user import User, users_db
+
+def build_app(middleware):
+    app = FastAPI()
+    if middleware:
+        app.add_middleware(AuthorizationMiddleware)
+
+    @app.post("/users")
+    def create_user(user: User = Depends(check_permission("/users", "POST"))):
+        return {"ok": True}
+
+    return app
+
+def add_user(user_id, username):
+    users_db[user_id] = User(
+        id=user_id,
+        email=f"{username}@example.com",
+        username=username,
+        hashed_password="x",
+        role="user",
+    )
+    return create_access_token(user_id, "user").encode()
+
+async def call(app, token, body):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/users",
+        "raw_path": b"/users",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"host", b"bench"),
+            (b"authorization", b"Bearer " + token),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+    status = None
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+async def time_per_request(app, token, body, requests):
+    await call(app, token, body)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await call(app, token, body)
+    return (time.perf_counter() - start) / requests
+
+async def run(args):
+    allowed = add_user("bench-admin", "admin_user")
+    denied = add_user("bench-user", "regular_user")
+    body = b'{"payload": "' + b"x" * args.body_bytes + b'"}'
+    apps = {"dependency": build_app(False), "middleware": build_app(True)}
+
+    print(f"{'request':>10} {'dependency (us)':>16} {'middleware (us)':>16}")
+    for label, token in (("allowed", allowed), ("denied", denied)):
+        timings = [await time_per_request(apps[name], token, body, args.requests) for name in apps]
+        print(f"{label:>10} {timings[0] * 1e6:16.1f} {timings[1] * 1e6:16.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--body-bytes", type=int, default=1024)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
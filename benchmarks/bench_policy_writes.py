@@ -0,0 +1,75 @@
+"""
+Policy write benchmark: the cost of publishing one change to the compiled
+RBAC index (copy, apply, swap), as the policy grows. Each write should cost
+about the same whatever the number of users.
+
+    python -m benchmarks.bench_policy_writes --max-users 300000
+    python -m benchmarks.bench_policy_writes --max-growth 4
+
+With --max-growth, exits non-zero when the p50 write at the largest size
+is more than that many times the p50 at the smallest.
+"""
+import argparse
+import random
+import sys
+import time
+
+from app.core.casbin_rbac import RBACIndex
+from benchmarks.generators import generate_policy
+
+def build_index(users, views):
+    p_rules, g_rules = generate_policy(users)
+    index = RBACIndex(p_rules, g_rules)
+    # Materialized views are copied along with everything else
+    for i in range(min(views, users)):
+        index.effective_permissions(f"user{i}")
+    return index
+
+def time_writes(index, users, writes, seed):
+    """Publish writes alternating link adds and removes; get sorted latencies"""
+    rng = random.Random(seed)
+    latencies = []
+    for i in range(writes):
+        user = f"user{rng.randrange(users)}"
+        began = time.perf_counter()
+        index = index.copy()
+        if i % 2:
+            index.remove_link(user, "benchmark-role")
+        else:
+            index.add_link(user, "benchmark-role")
+        latencies.append(time.perf_counter() - began)
+    latencies.sort()
+    return latencies
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--min-users", type=int, default=1_000)
+    parser.add_argument("--max-users", type=int, default=100_000)
+    parser.add_argument("--writes", type=int, default=2_000)
+    parser.add_argument("--views", type=int, default=1_000, help="subjects with materialized permissions")
+    parser.add_argument("--max-growth", type=float, default=None,
+                        help="allowed ratio of the largest size's p50 write to the smallest's")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'users':>10} {'p50 (us)':>10} {'p99 (us)':>10} {'max (us)':>10} {'mean (us)':>10}")
+    p50s = []
+    size = args.min_users
+    while size <= args.max_users:
+        latencies = time_writes(build_index(size, args.views), size, args.writes, args.seed)
+        p50s.append(percentile(latencies, 0.5))
+        print(
+            f"{size:>10} {p50s[-1] * 1e6:>10.1f} {percentile(latencies, 0.99) * 1e6:>10.1f} "
+            f"{latencies[-1] * 1e6:>10.1f} {sum(latencies) / len(latencies) * 1e6:>10.1f}"
+        )
+        size *= 10
+
+    if args.max_growth is not None and p50s[-1] > p50s[0] * args.max_growth:
+        print(f"REGRESSION p50 write grew {p50s[-1] / p50s[0]:.1f}x from {args.min_users} users")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
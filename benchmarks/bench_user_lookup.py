@@ -0,0 +1,62 @@
+"""
+User lookup benchmark: indexed UserRepository lookups vs. the linear scan
+the auth endpoints used to do.
+
+    python -m benchmarks.bench_user_lookup --max-users 1000000
+"""
+import argparse
+import random
+import time
+
+from app.models.user import User, UserRepository
+
+def build_repository(size):
+    repository = UserRepository()
+    for i in range(size):
+        user_id = f"id-{i}"
+        repository[user_id] = User(
+            id=user_id,
+            email=f"user{i}@example.com",
+            username=f"user{i}",
+            hashed_password="x",
+            role="user",
+        )
+    return repository
+
+def time_per_call(fn, names):
+    start = time.perf_counter()
+    for name in names:
+        fn(name)
+    return (time.perf_counter() - start) / len(names)
+
+def linear_scan(repository, username):
+    for user in repository.values():
+        if user.username == username:
+            return user
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--max-users", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--max-scan-users", type=int, default=100_000,
+                        help="largest size to run the linear scan baseline at")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'users':>10} {'indexed (ns)':>14} {'linear scan (ns)':>18}")
+    size = 1_000
+    while size <= args.max_users:
+        repository = build_repository(size)
+        names = [f"user{rng.randrange(size)}" for _ in range(args.lookups)]
+        indexed = time_per_call(repository.get_by_username, names)
+        if size <= args.max_scan_users:
+            scan_names = names[: max(10, args.lookups * 1_000 // size // 10)]
+            scan = f"{time_per_call(lambda name: linear_scan(repository, name), scan_names) * 1e9:18.0f}"
+        else:
+            scan = f"{'-':>18}"
+        print(f"{size:>10} {indexed * 1e9:14.0f} {scan}")
+        size *= 10
+
+if __name__ == "__main__":
+    main()
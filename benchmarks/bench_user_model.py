@@ -0,0 +1,88 @@
+"""
+User model benchmark: memory per stored user and list serialization
+throughput for the slotted User with public_dict vs. the Pydantic model it
+replaced, serialized through the response schema.
+
+    python -m benchmarks.bench_user_model --users 1000000
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.models.user import User
+from app.schemas.user import User as UserSchema
+
+ROLES = ["admin", "manager", "user"]
+
+class PydanticUser(BaseModel):
+    id: str
+    email: str
+    username: str
+    hashed_password: str
+    full_name: Optional[str] = None
+    role: str
+    is_active: bool = True
+    created_at: datetime = datetime.now()
+    updated_at: datetime = datetime.now()
+
+def make_users(cls, count):
+    now = datetime.now()
+    return [
+        cls(
+            id=f"00000000-0000-4000-8000-{i:012d}",
+            email=f"user{i}@example.com",
+            username=f"user{i}",
+            hashed_password="$2b$12$" + "x" * 53,
+            full_name=f"User {i}",
+            # Built per row, as when parsed from a request body
+            role="".join(ROLES[i % 3]),
+            created_at=now,
+            updated_at=now,
+        )
+        for i in range(count)
+    ]
+
+def bytes_per_user(cls, count):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    users = make_users(cls, count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del users
+    return (after - before) / count
+
+def serialize_schema(users):
+    return json.dumps([UserSchema.model_validate(user, from_attributes=True).model_dump(mode="json") for user in users])
+
+def serialize_direct(users):
+    return json.dumps([user.public_dict() for user in users])
+
+def rows_per_second(fn, users):
+    start = time.perf_counter()
+    fn(users)
+    return len(users) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--serialize-users", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"{'model':>10} {'bytes/user':>12} {'rows/s':>12}")
+    for label, cls, serialize in (
+        ("pydantic", PydanticUser, serialize_schema),
+        ("slotted", User, serialize_direct),
+    ):
+        memory = bytes_per_user(cls, args.users)
+        throughput = rows_per_second(serialize, make_users(cls, args.serialize_users))
+        print(f"{label:>10} {memory:12.0f} {throughput:12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Replay a recorded JSONL request log through the ASGI app, or through just
+the authorization layer, and report per-endpoint latency and decisions.
+
+    python -m benchmarks.replay traffic.jsonl --concurrency 8 --speed 10
+    python -m benchmarks.replay traffic.jsonl --mode authz --compare
+
+Each line is one request, either an HTTP request:
+
+    {"ts": 1700000000.25, "user": "alice", "method": "GET",
+     "path": "/api/users/?limit=10", "body": {...}, "status": 200}
+
+or a bare authorization check:
+
+    {"ts": 1700000000.5, "sub": "alice", "obj": "/users", "act": "GET"}
+
+ts (seconds) paces the replay, compressed by --speed (0 replays as fast
+as possible); user is the username the request was made as, and is sent
+with a freshly minted token; status, if recorded, is compared with the
+replayed one. Either kind may carry the tenant as dom, or else the
+user's own domain is used (DEFAULT_DOMAIN for unknown users). The app
+runs with the usual settings, so point the policy and store settings at
+a copy of production data.
+
+--mode authz skips routing and handlers: HTTP requests are checked with
+the permissions their route declares, the way the middleware does.
+--compare re-evaluates every check with casbin and with the compiled
+index, both without the decision cache, and reports any disagreement.
+"""
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import Counter, defaultdict
+
+def read_records(path):
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+class Report:
+    """Latencies and decision counts per endpoint, plus mismatches"""
+
+    def __init__(self, max_examples=20):
+        self.latencies = defaultdict(list)
+        self.decisions = defaultdict(Counter)
+        self.mismatches = Counter()
+        self.examples = []
+        self.max_examples = max_examples
+
+    def record(self, endpoint, seconds, decision):
+        self.latencies[endpoint].append(seconds)
+        self.decisions[endpoint][decision] += 1
+
+    def mismatch(self, kind, detail):
+        self.mismatches[kind] += 1
+        if len(self.examples) < self.max_examples:
+            self.examples.append(f"{kind}: {detail}")
+
+    def print(self, histogram=False):
+        print(f"{'endpoint':<40} {'count':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}  decisions")
+        for endpoint in sorted(self.latencies):
+            latencies = sorted(self.latencies[endpoint])
+            decisions = ", ".join(f"{decision}={count}" for decision, count in sorted(self.decisions[endpoint].items()))
+            print(
+                f"{endpoint:<40} {len(latencies):>7} {_percentile(latencies, 0.5) * 1e3:>8.2f} "
+                f"{_percentile(latencies, 0.9) * 1e3:>8.2f} {_percentile(latencies, 0.99) * 1e3:>8.2f} "
+                f"{latencies[-1] * 1e3:>8.2f}  {decisions}"
+            )
+            if histogram:
+                print("    " + _histogram(latencies))
+        if self.mismatches:
+            print("\nMismatches: " + ", ".join(f"{kind}={count}" for kind, count in sorted(self.mismatches.items())))
+            for example in self.examples:
+                print(f"  {example}")
+        else:
+            print("\nNo mismatching decisions")
+
+def _percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+def _histogram(latencies):
+    """Counts per power-of-two bucket of microseconds"""
+    buckets = Counter(max(0, math.ceil(math.log2(max(seconds * 1e6, 1)))) for seconds in latencies)
+    return " ".join(f"<={2 ** bucket}us:{buckets[bucket]}" for bucket in sorted(buckets))
+
+class Replayer:
+    def __init__(self, args, report):
+        from app.core.casbin_rbac import CasbinEnforcer
+        from app.main import app
+
+        self.args = args
+        self.report = report
+        self.app = app
+        self.enforcer = CasbinEnforcer
+        self.tokens = {}
+        self.table = None
+
+    async def start(self):
+        await self.app.router.startup()
+        self.table = self.app.state.route_permissions
+        if self.args.mode == "app":
+            import httpx
+
+            self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=self.app), base_url="http://replay")
+
+    async def stop(self):
+        if self.args.mode == "app":
+            await self.client.aclose()
+        await self.app.router.shutdown()
+
+    def token_for(self, username, dom=None):
+        """Mint a token for a recorded username (in a domain), creating a stand-in user if needed"""
+        from app.core.security import create_access_token
+        from app.models.user import User, users_db
+
+        token = self.tokens.get((username, dom))
+        if token is None:
+            user = users_db.get_by_username(username)
+            if user is None:
+                roles = self.enforcer.get_roles_for_user(username, dom)
+                user = User(
+                    id=f"replay-{username}",
+                    email=f"{username}@replay.invalid",
+                    username=username,
+                    hashed_password="",
+                    role=roles[0] if roles else "replay",
+                    domain=dom,
+                )
+                users_db[user.id] = user
+            token = create_access_token(user.id, user.role, domain=dom or user.domain)
+            self.tokens[(username, dom)] = token
+        return token
+
+    def domain_for(self, record, username):
+        """Get the record's domain, or else the user's own"""
+        from app.models.user import users_db
+
+        if record.get("dom"):
+            return record["dom"]
+        user = users_db.get_by_username(username)
+        return user.domain if user is not None else None
+
+    def endpoint_for(self, method, path):
+        route_id = self.table.match(method, path.split("?", 1)[0])
+        return route_id, (self.table.template_for(route_id) if route_id is not None else f"{method} <unmatched>")
+
+    async def replay(self, record):
+        if "obj" in record:
+            dom = self.domain_for(record, record["sub"])
+            return self.check(record["sub"], [(record["obj"], record["act"])], f"enforce {record['act']}", dom=dom)
+
+        method = record.get("method", "GET").upper()
+        route_id, endpoint = self.endpoint_for(method, record["path"])
+        if self.args.mode == "authz":
+            if route_id is None or "user" not in record:
+                return
+            dom = self.domain_for(record, record["user"])
+            return self.check(record["user"], self.table.permissions_for(route_id), endpoint, route_id, dom)
+
+        headers = dict(record.get("headers") or {})
+        if "user" in record:
+            headers["Authorization"] = f"Bearer {self.token_for(record['user'], record.get('dom'))}"
+        started = time.perf_counter()
+        response = await self.client.request(method, record["path"], headers=headers, json=record.get("body"))
+        self.report.record(endpoint, time.perf_counter() - started, response.status_code)
+        if "status" in record and record["status"] != response.status_code:
+            self.report.mismatch("status", f"{method} {record['path']} as {record.get('user')}: recorded {record['status']}, replayed {response.status_code}")
+
+    def check(self, sub, permissions, endpoint, route_id=None, dom=None):
+        started = time.perf_counter()
+        if route_id is not None:
+            allowed = self.table.is_allowed(route_id, sub, dom)
+        else:
+            allowed = all(self.enforcer.enforce(sub, obj, act, dom) for obj, act in permissions)
+        self.report.record(endpoint, time.perf_counter() - started, "allow" if allowed else "deny")
+
+        if self.args.compare:
+            for engine in ("casbin", "index"):
+                decisions = [self.enforcer.enforce_uncached(sub, obj, act, engine, dom) for obj, act in permissions]
+                if None in decisions:
+                    continue
+                if all(decisions) != allowed:
+                    self.report.mismatch(engine, f"{sub} {permissions} on {endpoint}: served {allowed}, {engine} {all(decisions)}")
+
+async def run(args):
+    report = Report()
+    replayer = Replayer(args, report)
+    await replayer.start()
+    queue = asyncio.Queue(maxsize=args.concurrency * 4)
+
+    async def worker():
+        while True:
+            record = await queue.get()
+            if record is None:
+                return
+            await replayer.replay(record)
+
+    workers = [asyncio.create_task(worker()) for _ in range(args.concurrency)]
+    started = time.perf_counter()
+    first_ts = None
+    count = 0
+    for record in read_records(args.log):
+        if args.limit is not None and count >= args.limit:
+            break
+        ts = record.get("ts")
+        if args.speed > 0 and ts is not None:
+            if first_ts is None:
+                first_ts = ts
+            delay = (ts - first_ts) / args.speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await queue.put(record)
+        count += 1
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+    elapsed = time.perf_counter() - started
+    await replayer.stop()
+
+    print(f"Replayed {count} requests in {elapsed:.2f}s ({count / elapsed if elapsed else 0:.0f} req/s)\n")
+    report.print(histogram=args.histogram)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("log", help="JSONL request log")
+    parser.add_argument("--mode", choices=["app", "authz"], default="app",
+                        help="replay through the whole app or only the authorization layer")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--speed", type=float, default=0,
+                        help="time compression factor for recorded ts gaps (0: no pacing)")
+    parser.add_argument("--limit", type=int, default=None, help="replay at most this many requests")
+    parser.add_argument("--compare", action="store_true",
+                        help="flag decisions that differ between engines or from the cached result")
+    parser.add_argument("--histogram", action="store_true", help="print latency histograms")
+    args = parser.parse_args()
+    report = asyncio.run(run(args))
+    if report.mismatches:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
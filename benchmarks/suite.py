@@ -0,0 +1,222 @@
+"""
+In-process benchmark suite for the auth and authorization paths: login,
+token resolution, check_permission, the authorization middleware, list
+endpoints, raw enforce and policy mutations. Requests go through the ASGI
+app with httpx's ASGI transport, so no server or network is involved.
+Data is synthetic and seeded, scaled by --users.
+
+    python -m benchmarks.suite --users 100000
+    python -m benchmarks.suite --output baseline.json
+    python -m benchmarks.suite --baseline baseline.json --max-regression 0.25
+
+With --baseline, exits non-zero when any scenario's p99 latency or
+throughput is worse than the baseline by more than --max-regression.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.generators import generate_policy, generate_requests, write_policy_csv
+
+PASSWORD = "benchmark-password"
+
+def configure(workdir, args):
+    """Point every store at workdir; must run before the app is imported"""
+    model_path = os.path.join(workdir, "rbac_model.conf")
+    policy_path = os.path.join(workdir, "policy.csv")
+    shutil.copy("rbac_model.conf", model_path)
+    p_rules, g_rules = generate_policy(args.users, seed=args.seed)
+    write_policy_csv(policy_path, p_rules, g_rules)
+    os.environ.update({
+        "CASBIN_MODEL_PATH": model_path,
+        "CASBIN_POLICY_PATH": policy_path,
+        "CASBIN_POLICY_LOG_PATH": os.path.join(workdir, "policy.csv.log"),
+        "CASBIN_SNAPSHOT_PATH": os.path.join(workdir, "policy.csv.snapshot"),
+        "CASBIN_SQLITE_PATH": os.path.join(workdir, "policy.db"),
+        "CASBIN_WATCHER_ENABLED": "false",
+        "RESOURCE_SQLITE_PATH": os.path.join(workdir, "resources.db"),
+        # Every timed login comes from the one test client address
+        "LOGIN_THROTTLE_MAX_PER_IP": "0",
+    })
+    return g_rules
+
+def populate(g_rules, args):
+    from app.config import settings
+    from app.core.security import get_password_hash
+    from app.models.resource import resources_db
+    from app.models.user import User, users_db
+
+    roles = {user: role for user, role in g_rules if user.startswith("user")}
+    hashed_password = get_password_hash(PASSWORD)
+    for i in range(args.users):
+        username = f"user{i}"
+        users_db[f"id-{i}"] = User(
+            id=f"id-{i}",
+            email=f"{username}@example.com",
+            username=username,
+            hashed_password=hashed_password,
+            role=roles[username],
+        )
+
+    rng = random.Random(args.seed)
+    resources_db.add_many(
+        {
+            "id": f"r{i}",
+            "name": f"resource {i}",
+            "created_by": f"user{rng.randrange(args.users)}",
+            "domain": settings.DEFAULT_DOMAIN,
+        }
+        for i in range(args.resources if args.resources is not None else args.users)
+    )
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+async def measure(operation, count):
+    """Run operation(i) count times; get p50/p99 latency in microseconds and ops/s"""
+    await operation(-1)
+    latencies = []
+    start = time.perf_counter()
+    for i in range(count):
+        began = time.perf_counter()
+        await operation(i)
+        latencies.append(time.perf_counter() - began)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "ops": count,
+        "p50_us": percentile(latencies, 0.50) * 1e6,
+        "p99_us": percentile(latencies, 0.99) * 1e6,
+        "ops_per_second": count / elapsed,
+    }
+
+async def run_scenarios(args):
+    import httpx
+    from starlette.requests import Request
+
+    from app.api.deps import check_permission, get_current_user
+    from app.core.casbin_rbac import CasbinEnforcer
+    from app.core.security import create_access_token
+    from app.main import app
+    from app.models.user import users_db
+
+    await app.router.startup()
+    rng = random.Random(args.seed)
+    user_ids = [f"id-{rng.randrange(args.users)}" for _ in range(256)]
+    tokens = [create_access_token(user_id, users_db[user_id].role) for user_id in user_ids]
+    headers = [{"Authorization": f"Bearer {token}"} for token in tokens]
+    enforce_requests = generate_requests(args.requests, args.users, seed=args.seed)
+    permission = check_permission("/users", "GET")
+
+    async def login(i):
+        await client.post("/api/auth/login", data={"username": users_db[user_ids[i % 256]].username, "password": PASSWORD})
+
+    async def token_resolution(i):
+        get_current_user(tokens[i % 256])
+
+    async def dependency(i):
+        user = users_db[user_ids[i % 256]]
+        try:
+            await permission(Request({"type": "http", "headers": []}), user)
+        except Exception:
+            pass
+
+    async def middleware(i):
+        await client.get(f"/api/users/{user_ids[(i + 1) % 256]}", headers=headers[i % 256])
+
+    async def list_users(i):
+        await client.get("/api/users/?limit=100", headers=headers[i % 256])
+
+    async def list_resources(i):
+        await client.get("/api/resources/?limit=100", headers=headers[i % 256])
+
+    async def enforce(i):
+        CasbinEnforcer.enforce(*enforce_requests[i % len(enforce_requests)])
+
+    async def policy_mutation(i):
+        username = users_db[user_ids[i % 256]].username
+        CasbinEnforcer.add_role_for_user(username, "benchmark-role")
+        CasbinEnforcer.delete_role_for_user(username, "benchmark-role")
+        CasbinEnforcer.save_policy()
+
+    scenarios = [
+        ("login", login, args.login_requests),
+        ("token_resolution", token_resolution, args.requests),
+        ("check_permission", dependency, args.requests),
+        ("middleware_request", middleware, args.requests),
+        ("list_users", list_users, args.requests // 10 or 1),
+        ("list_resources", list_resources, args.requests // 10 or 1),
+        ("enforce", enforce, args.requests),
+        ("policy_mutation", policy_mutation, args.requests // 10 or 1),
+    ]
+    selected = set(args.scenario or [name for name, _, _ in scenarios])
+
+    results = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+        for name, operation, count in scenarios:
+            if name in selected:
+                results[name] = await measure(operation, count)
+                print_row(name, results[name])
+    await app.router.shutdown()
+    return results
+
+def print_row(name, result):
+    print(f"{name:>20} {result['ops']:>8} {result['p50_us']:>12.1f} {result['p99_us']:>12.1f} {result['ops_per_second']:>12.0f}")
+
+def regressions(results, baseline, max_regression):
+    """Get a message per scenario that is slower than the baseline allows"""
+    failures = []
+    for name, result in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if reference is None:
+            continue
+        if result["p99_us"] > reference["p99_us"] * (1 + max_regression):
+            failures.append(f"{name}: p99 {result['p99_us']:.1f}us vs baseline {reference['p99_us']:.1f}us")
+        if result["ops_per_second"] < reference["ops_per_second"] * (1 - max_regression):
+            failures.append(f"{name}: {result['ops_per_second']:.0f} ops/s vs baseline {reference['ops_per_second']:.0f} ops/s")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=10_000, help="synthetic users (10^3 to 10^6)")
+    parser.add_argument("--resources", type=int, default=None, help="synthetic resources (default: --users)")
+    parser.add_argument("--requests", type=int, default=2_000, help="operations per scenario")
+    parser.add_argument("--login-requests", type=int, default=20, help="logins to time (bcrypt bound)")
+    parser.add_argument("--scenario", action="append", help="only run this scenario (repeatable)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON, e.g. to record a baseline")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="allowed fractional slowdown of p99 and throughput")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="benchmark-")
+    try:
+        g_rules = configure(workdir, args)
+        populate(g_rules, args)
+        print(f"{'scenario':>20} {'ops':>8} {'p50 (us)':>12} {'p99 (us)':>12} {'ops/s':>12}")
+        results = asyncio.run(run_scenarios(args))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"users": args.users, "requests": args.requests, "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            failures = regressions(results, json.load(file), args.max_regression)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# Stores the app opens when imported, or with default settings, go to a
+# scratch directory rather than the checkout; set before app.config loads
+_workdir = tempfile.mkdtemp(prefix="rbac-tests-")
+shutil.copy(os.path.join(os.path.dirname(__file__), "policy.csv"), _workdir)
+for name, filename in (
+    ("CASBIN_POLICY_PATH", "policy.csv"),
+    ("CASBIN_POLICY_LOG_PATH", "policy.csv.log"),
+    ("CASBIN_SNAPSHOT_PATH", "policy.csv.snapshot"),
+    ("CASBIN_SQLITE_PATH", "policy.db"),
+    ("CASBIN_WATCHER_DIR", ".casbin-watcher"),
+    ("RESOURCE_SQLITE_PATH", "resources.db"),
+):
+    os.environ.setdefault(name, os.path.join(_workdir, filename))
+
+from app.config import settings
+from app.core.casbin_rbac import CasbinEnforcer
+
+@pytest.fixture
+def enforcer(tmp_path, monkeypatch):
+    """Point CasbinEnforcer at a scratch copy of the shipped model and policy"""
+    model_path = tmp_path / "rbac_model.conf"
+    policy_path = tmp_path / "policy.csv"
+    shutil.copy(settings.CASBIN_MODEL_PATH, model_path)
+    shutil.copy(settings.CASBIN_POLICY_PATH, policy_path)
+    monkeypatch.setattr(settings, "CASBIN_MODEL_PATH", str(model_path))
+    monkeypatch.setattr(settings, "CASBIN_POLICY_PATH", str(policy_path))
+    monkeypatch.setattr(settings, "CASBIN_POLICY_LOG_PATH", str(tmp_path / "policy.csv.log"))
+    monkeypatch.setattr(settings, "CASBIN_SNAPSHOT_PATH", str(tmp_path / "policy.csv.snapshot"))
+    CasbinEnforcer._instance = None
+    CasbinEnforcer._index = None
+    CasbinEnforcer._invalidate_decisions()
+    yield CasbinEnforcer
+    CasbinEnforcer.close()
+    CasbinEnforcer._instance = None
+    CasbinEnforcer._index = None
+    CasbinEnforcer._invalidate_decisions()
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_workdir, ignore_errors=True)
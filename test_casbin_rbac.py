@@ -0,0 +1,263 @@
+import itertools
+import random
+import threading
+import time
+
+import casbin
+import pytest
+
+from app.config import settings
+from app.core.casbin_rbac import CasbinEnforcer, RBACIndex
+
+PLAIN_MODEL = "rbac_model.conf"
+
+KEY_MATCH_MODEL = """
+[request_definition]
+r = sub, obj, act
+
+[policy_definition]
+p = sub, obj, act
+
+[role_definition]
+g = _, _
+
+[policy_effect]
+e = some(where (p.eft == allow))
+
+[matchers]
+m = g(r.sub, p.sub) && keyMatch(r.obj, p.obj) && r.act == p.act
+"""
+
+def random_policy(rng, path):
+    users = [f"user{i}" for i in range(12)]
+    roles = [f"role{i}" for i in range(6)]
+    objs = [f"/obj{i}" for i in range(5)]
+    acts = ["GET", "POST", "PUT", "DELETE"]
+    lines = set()
+    for _ in range(rng.randint(5, 30)):
+        lines.add(f"p, {rng.choice(roles + users)}, {rng.choice(objs)}, {rng.choice(acts)}")
+    for _ in range(rng.randint(5, 25)):
+        # Role-to-role links (including cycles) exercise the closure walk
+        lines.add(f"g, {rng.choice(users + roles)}, {rng.choice(roles)}")
+    path.write_text("\n".join(sorted(lines)) + "\n")
+    return users + roles + ["nobody"], objs + ["/missing"], acts
+
+def assert_same_decisions(index, reference, subjects, objs, acts):
+    for sub, obj, act in itertools.product(subjects, objs, acts):
+        assert index.enforce(sub, obj, act) == reference.enforce(sub, obj, act), (sub, obj, act)
+
+@pytest.mark.parametrize("seed", range(25))
+def test_index_matches_casbin(tmp_path, seed):
+    rng = random.Random(seed)
+    policy_path = tmp_path / "policy.csv"
+    subjects, objs, acts = random_policy(rng, policy_path)
+    reference = casbin.Enforcer(PLAIN_MODEL, str(policy_path))
+    index = RBACIndex.from_enforcer(reference)
+    assert index is not None
+    assert_same_decisions(index, reference, subjects, objs, acts)
+
+@pytest.mark.parametrize("seed", range(10))
+def test_index_matches_casbin_after_mutations(tmp_path, seed):
+    rng = random.Random(seed)
+    policy_path = tmp_path / "policy.csv"
+    subjects, objs, acts = random_policy(rng, policy_path)
+    reference = casbin.Enforcer(PLAIN_MODEL, str(policy_path))
+    index = RBACIndex.from_enforcer(reference)
+    roles = [s for s in subjects if s.startswith("role")]
+    for _ in range(20):
+        user, role = rng.choice(subjects), rng.choice(roles)
+        if rng.random() < 0.5:
+            if reference.add_grouping_policy(user, role):
+                index.add_link(user, role)
+        elif reference.remove_grouping_policy(user, role):
+            index.remove_link(user, role)
+        rule = (rng.choice(roles), rng.choice(objs), rng.choice(acts))
+        if rng.random() < 0.5:
+            if reference.add_policy(*rule):
+                index.add_permission(*rule)
+        elif reference.remove_policy(*rule):
+            index.remove_permission(*rule)
+    assert_same_decisions(index, reference, subjects, objs, acts)
+
+def test_index_copies_only_recent_changes():
+    users = [f"user{i}" for i in range(1000)]
+    index = RBACIndex([("role", "/a", "GET")], [(user, "role") for user in users])
+    granted, linked = {"/a"}, set(users)
+    snapshots = []
+    for i in range(300):
+        index = index.copy()
+        index.add_permission("role", f"/r{i}", "GET")
+        granted.add(f"/r{i}")
+        if i % 3 == 0:
+            index.remove_permission("role", f"/r{i // 2}", "GET")
+            granted.discard(f"/r{i // 2}")
+        index.remove_link(users[i], "role")
+        linked.discard(users[i])
+        snapshots.append((index, set(granted), set(linked)))
+        # Changes are folded into a new base rather than copied on and on
+        assert len(index._permissions._changes) <= 32 + len(index._permissions._base) ** 0.5 + 2
+    # Every snapshot kept its own policy across the folds
+    for index, granted, linked in snapshots[::7]:
+        assert {obj for obj in (f"/r{i}" for i in range(300)) if index.enforce("role", obj, "GET")} == granted - {"/a"}
+        assert {user for user in users if index.enforce(user, "/a", "GET")} == linked
+        assert set(index._closures) == linked
+
+def test_index_respects_hierarchy_limit(tmp_path):
+    policy_path = tmp_path / "policy.csv"
+    chain = [f"g, r{i}, r{i + 1}" for i in range(12)]
+    policy_path.write_text("p, r12, /deep, GET\np, r9, /mid, GET\n" + "\n".join(chain) + "\n")
+    reference = casbin.Enforcer(PLAIN_MODEL, str(policy_path))
+    index = RBACIndex.from_enforcer(reference)
+    assert_same_decisions(index, reference, [f"r{i}" for i in range(13)], ["/deep", "/mid"], ["GET"])
+
+def test_index_rejects_other_models(tmp_path):
+    model_path = tmp_path / "model.conf"
+    model_path.write_text(KEY_MATCH_MODEL)
+    reference = casbin.Enforcer(str(model_path), settings.CASBIN_POLICY_PATH)
+    assert RBACIndex.from_enforcer(reference) is None
+
+def test_enforcer_falls_back_to_casbin(enforcer, tmp_path, monkeypatch):
+    model_path = tmp_path / "model.conf"
+    model_path.write_text(KEY_MATCH_MODEL)
+    monkeypatch.setattr(settings, "CASBIN_MODEL_PATH", str(model_path))
+    assert enforcer.enforce("admin_user", "/users", "GET")
+    assert enforcer._index is None
+
+def test_decision_cache_invalidated_on_role_change(enforcer):
+    before = enforcer.get_cache_stats()
+    assert not enforcer.enforce("regular_user", "/users", "GET")
+    assert not enforcer.enforce("regular_user", "/users", "GET")
+    after = enforcer.get_cache_stats()
+    assert after["hits"] - before["hits"] == 1
+    assert after["misses"] - before["misses"] == 1
+
+    enforcer.add_role_for_user("regular_user", "manager")
+    assert enforcer.enforce("regular_user", "/users", "GET")
+    enforcer.delete_role_for_user("regular_user", "manager")
+    assert not enforcer.enforce("regular_user", "/users", "GET")
+
+def test_decision_cache_invalidated_on_policy_change(enforcer):
+    assert not enforcer.enforce("regular_user", "/resources", "DELETE")
+    enforcer.add_policy("user", "/resources", "DELETE")
+    assert enforcer.enforce("regular_user", "/resources", "DELETE")
+    enforcer.remove_policy("user", "/resources", "DELETE")
+    assert not enforcer.enforce("regular_user", "/resources", "DELETE")
+
+def test_batch_enforce_matches_enforce(enforcer):
+    requests = [
+        (sub, obj, act)
+        for sub in ("admin_user", "manager_user", "regular_user", "nobody")
+        for obj in ("/users", "/resources")
+        for act in ("GET", "POST", "PUT", "DELETE")
+    ]
+    assert enforcer.batch_enforce(requests + requests[:3]) == [
+        enforcer.enforce(*request) for request in requests + requests[:3]
+    ]
+
+def test_sibling_deltas_are_applied_in_place(enforcer):
+    assert not enforcer.enforce("alice", "/users", "GET")
+    enforcer._apply_policy_delta({"op": "add", "sec": "g", "ptype": "g", "rules": [["alice", "manager"]]})
+    assert enforcer.enforce("alice", "/users", "GET")
+    assert enforcer.get_roles_for_user("alice") == ["manager"]
+
+    enforcer._apply_policy_delta({"op": "remove", "sec": "p", "ptype": "p", "rules": [["manager", "/users", "GET"]]})
+    assert not enforcer.enforce("alice", "/users", "GET")
+
+    enforcer._apply_policy_delta({
+        "op": "remove_filtered", "sec": "g", "ptype": "g", "field_index": 0, "field_values": ["alice"],
+    })
+    assert not enforcer.enforce("alice", "/resources", "POST")
+    # Deltas are applied in memory only; the sibling already persisted them
+    assert enforcer.get_instance().get_adapter()._log_entries == 0
+
+def test_uncached_engines_agree_with_enforce(enforcer):
+    for sub in ("admin_user", "manager_user", "regular_user", "nobody"):
+        for obj in ("/users", "/resources"):
+            for act in ("GET", "POST", "PUT", "DELETE"):
+                expected = enforcer.enforce(sub, obj, act)
+                assert enforcer.enforce_uncached(sub, obj, act) == expected
+                assert enforcer.enforce_uncached(sub, obj, act, "index") == expected
+
+def test_published_index_is_never_changed(enforcer):
+    enforcer.get_instance()
+    snapshot = enforcer._index
+    assert snapshot.enforce("manager_user", "/users", "GET")
+    enforcer.delete_role_for_user("manager_user", "manager")
+    enforcer.remove_policy("manager", "/resources", "GET")
+    assert not enforcer.enforce("manager_user", "/users", "GET")
+    assert enforcer._index is not snapshot
+    # Readers still holding the old snapshot see the old policy, all of it
+    assert snapshot.enforce("manager_user", "/users", "GET")
+    assert snapshot.enforce("manager", "/resources", "GET")
+    assert "/resources" in snapshot.objects_for("manager", "GET")
+
+def test_readers_see_multi_rule_deltas_whole(enforcer):
+    enforcer.get_instance()
+    rules = [["auditor", f"/audit/{i}", "GET"] for i in range(50)]
+    stop = threading.Event()
+    torn = []
+
+    def read():
+        while not stop.is_set():
+            index = enforcer._index
+            granted = sum(index.enforce("auditor", obj, act) for _, obj, act in rules)
+            if granted not in (0, len(rules)):
+                torn.append(granted)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        for _ in range(200):
+            enforcer._apply_policy_delta({"op": "add", "sec": "p", "ptype": "p", "rules": rules})
+            enforcer._apply_policy_delta({"op": "remove", "sec": "p", "ptype": "p", "rules": rules})
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join()
+    assert torn == []
+
+def test_concurrent_first_use_builds_one_enforcer(enforcer):
+    barrier = threading.Barrier(8)
+    instances = []
+
+    def first_use():
+        barrier.wait()
+        instances.append(enforcer.get_instance())
+
+    threads = [threading.Thread(target=first_use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(instance) for instance in instances}) == 1
+
+def test_decision_cache_skips_stale_write_back(enforcer):
+    # A decision evaluated before a policy change must not be cached after it
+    version = enforcer.get_cache_stats()["policy_version"]
+    enforcer.add_policy("user", "/resources", "DELETE")
+    enforcer._cache_decision(("regular_user", "/resources", "DELETE"), False, version, time.monotonic())
+    assert enforcer.get_cache_stats()["size"] == 0
+    assert enforcer.enforce("regular_user", "/resources", "DELETE")
+
+def test_casbin_checks_share_the_policy_lock(enforcer, monkeypatch):
+    monkeypatch.setattr(settings, "CASBIN_FAST_ENGINE", False)
+    assert enforcer.enforce_uncached("admin_user", "/users", "GET")
+    assert enforcer._index is None
+    done = threading.Event()
+
+    def check():
+        assert enforcer.enforce_uncached("admin_user", "/users", "GET")
+        done.set()
+
+    # Checks run alongside other readers
+    with enforcer._policy_lock.read():
+        threading.Thread(target=check).start()
+        assert done.wait(5)
+    done.clear()
+    # but wait for a writer, which may check its own changes meanwhile
+    with enforcer._policy_lock.write():
+        threading.Thread(target=check).start()
+        assert not done.wait(0.05)
+        assert enforcer.enforce_uncached("admin_user", "/users", "GET")
+    assert done.wait(5)
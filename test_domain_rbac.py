@@ -0,0 +1,148 @@
+import itertools
+import random
+
+import casbin
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.core.casbin_rbac import CasbinEnforcer, DomainRBACIndex
+from app.core.security import create_access_token, decode_access_token
+from app.models.user import User, users_db
+
+DOMAIN_MODEL = "rbac_with_domains_model.conf"
+
+DOMAIN_POLICY = """\
+p, admin, acme, /users, GET
+p, admin, acme, /users, POST
+p, admin, acme, /users, DELETE
+p, admin, globex, /users, GET
+p, user, acme, /resources, GET
+p, user, globex, /resources, GET
+g, alice, admin, acme
+g, bob, admin, globex
+g, carol, user, globex
+"""
+
+@pytest.fixture
+def domain_enforcer(tmp_path, monkeypatch):
+    """Point CasbinEnforcer at the domain model with two tenants"""
+    policy_path = tmp_path / "policy.csv"
+    policy_path.write_text(DOMAIN_POLICY)
+    monkeypatch.setattr(settings, "CASBIN_MODEL_PATH", DOMAIN_MODEL)
+    monkeypatch.setattr(settings, "CASBIN_POLICY_PATH", str(policy_path))
+    monkeypatch.setattr(settings, "CASBIN_POLICY_LOG_PATH", str(tmp_path / "policy.csv.log"))
+    monkeypatch.setattr(settings, "CASBIN_SNAPSHOT_PATH", str(tmp_path / "policy.csv.snapshot"))
+    monkeypatch.setattr(settings, "CASBIN_SQLITE_PATH", str(tmp_path / "policy.db"))
+    CasbinEnforcer._instance = None
+    CasbinEnforcer._index = None
+    CasbinEnforcer._invalidate_decisions()
+    yield CasbinEnforcer
+    CasbinEnforcer.close()
+    CasbinEnforcer._instance = None
+    CasbinEnforcer._index = None
+    CasbinEnforcer._invalidate_decisions()
+
+@pytest.mark.parametrize("seed", range(10))
+def test_domain_index_matches_casbin(tmp_path, seed):
+    rng = random.Random(seed)
+    users = [f"user{i}" for i in range(8)]
+    roles = [f"role{i}" for i in range(4)]
+    domains = ["d0", "d1", "d2"]
+    objs = ["/obj0", "/obj1", "/obj2"]
+    acts = ["GET", "POST"]
+    lines = set()
+    for _ in range(rng.randint(5, 30)):
+        lines.add(f"p, {rng.choice(roles + users)}, {rng.choice(domains)}, {rng.choice(objs)}, {rng.choice(acts)}")
+    for _ in range(rng.randint(5, 25)):
+        lines.add(f"g, {rng.choice(users + roles)}, {rng.choice(roles)}, {rng.choice(domains)}")
+    policy_path = tmp_path / "policy.csv"
+    policy_path.write_text("\n".join(sorted(lines)) + "\n")
+
+    reference = casbin.Enforcer(DOMAIN_MODEL, str(policy_path))
+    index = DomainRBACIndex.from_enforcer(reference)
+    assert index is not None
+    for sub, dom, obj, act in itertools.product(users + roles, domains + ["none"], objs, acts):
+        assert index.enforce(sub, dom, obj, act) == reference.enforce(sub, dom, obj, act), (sub, dom, obj, act)
+
+def test_same_role_differs_per_domain(domain_enforcer):
+    assert domain_enforcer.enforce("alice", "/users", "DELETE", "acme")
+    assert not domain_enforcer.enforce("bob", "/users", "DELETE", "globex")
+    assert domain_enforcer.enforce("bob", "/users", "GET", "globex")
+    # Roles held in one tenant grant nothing in another
+    assert not domain_enforcer.enforce("alice", "/users", "GET", "globex")
+    assert domain_enforcer.get_roles_for_user("alice", "acme") == ["admin"]
+    assert domain_enforcer.get_roles_for_user("alice", "globex") == []
+
+    domain_enforcer.add_role_for_user("alice", "user", "globex")
+    assert domain_enforcer.enforce("alice", "/resources", "GET", "globex")
+    assert not domain_enforcer.enforce("alice", "/users", "GET", "globex")
+    domain_enforcer.add_policy("admin", "/users", "DELETE", "globex")
+    assert domain_enforcer.enforce("bob", "/users", "DELETE", "globex")
+    assert domain_enforcer.batch_enforce([("alice", "/users", "POST"), ("carol", "/users", "POST")], "acme") == [True, False]
+
+def test_lazy_sqlite_domains_are_loaded_and_evicted(domain_enforcer, monkeypatch):
+    monkeypatch.setattr(settings, "CASBIN_POLICY_BACKEND", "sqlite")
+    monkeypatch.setattr(settings, "CASBIN_MAX_LOADED_DOMAINS", 1)
+    assert domain_enforcer.enforce("alice", "/users", "POST", "acme")
+    assert domain_enforcer.get_instance().get_grouping_policy() == [["alice", "admin", "acme"]]
+
+    assert domain_enforcer.enforce("carol", "/resources", "GET", "globex")
+    assert list(domain_enforcer._loaded_domains) == ["globex"]
+    assert all(rule[2] == "globex" for rule in domain_enforcer.get_instance().get_grouping_policy())
+
+    # An evicted tenant is pulled back in with its rules intact
+    domain_enforcer.add_role_for_user("dave", "admin", "acme")
+    assert domain_enforcer.enforce("dave", "/users", "DELETE", "acme")
+    assert not domain_enforcer.enforce("dave", "/users", "GET", "globex")
+    assert domain_enforcer.enforce("bob", "/users", "GET", "globex")
+
+@pytest.fixture
+def tenant_users(domain_enforcer):
+    from app.main import app
+
+    users = [
+        User(id="acme-alice", email="alice@acme.test", username="alice", hashed_password="x", role="admin", domain="acme"),
+        User(id="globex-carol", email="carol@globex.test", username="carol", hashed_password="x", role="user", domain="globex"),
+    ]
+    for user in users:
+        users_db[user.id] = user
+    try:
+        with TestClient(app) as client:
+            yield client, users
+    finally:
+        for user in users:
+            users_db.pop(user.id, None)
+
+def test_requests_are_checked_in_the_token_domain(tenant_users):
+    client, (alice, carol) = tenant_users
+
+    def headers(user, domain=None):
+        token = create_access_token(user.id, user.role, domain=domain or user.domain)
+        return {"Authorization": f"Bearer {token}"}
+
+    response = client.get(f"{settings.API_PREFIX}/users/", headers=headers(alice))
+    assert response.status_code == 200
+    assert [user["username"] for user in response.json()] == ["alice"]
+    assert client.get(f"{settings.API_PREFIX}/users/{carol.id}", headers=headers(alice)).status_code == 404
+    assert client.get(f"{settings.API_PREFIX}/users/", headers=headers(carol)).status_code == 403
+    # A token minted for another tenant is refused
+    assert client.get(f"{settings.API_PREFIX}/users/", headers=headers(alice, "globex")).status_code == 403
+
+def test_signup_cannot_choose_a_tenant(tenant_users):
+    client, _ = tenant_users
+    response = client.post(f"{settings.API_PREFIX}/auth/register", json={
+        "email": "mallory@example.com", "username": "mallory", "password": "password123",
+        "role": "admin", "domain": "acme",
+    })
+    assert response.status_code == 200
+    user = next(user for user in users_db.values() if user.username == "mallory")
+    try:
+        assert user.domain == settings.DEFAULT_DOMAIN
+        assert decode_access_token(response.json()["access_token"])["dom"] == settings.DEFAULT_DOMAIN
+        assert not CasbinEnforcer.get_roles_for_user("mallory", "acme")
+        # An admin only of the default tenant, which has no rules here
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        assert client.get(f"{settings.API_PREFIX}/users/", headers=headers).status_code == 403
+    finally:
+        users_db.pop(user.id, None)
@@ -0,0 +1,92 @@
+import random
+
+import casbin
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.core.casbin_rbac import RBACIndex
+from app.core.security import create_access_token
+from app.models.user import users_db
+
+from test_casbin_rbac import PLAIN_MODEL, random_policy
+
+def implicit_permissions(reference, sub):
+    return tuple(sorted({(rule[1], rule[2]) for rule in reference.get_implicit_permissions_for_user(sub)}))
+
+@pytest.mark.parametrize("seed", range(10))
+def test_materialized_views_follow_changes(tmp_path, seed):
+    rng = random.Random(seed)
+    policy_path = tmp_path / "policy.csv"
+    subjects, objs, acts = random_policy(rng, policy_path)
+    reference = casbin.Enforcer(PLAIN_MODEL, str(policy_path))
+    index = RBACIndex.from_enforcer(reference)
+    watched = rng.sample(subjects, 6)
+    views = {sub: index.effective_permissions(sub) for sub in watched}
+
+    roles = [sub for sub in subjects if sub.startswith("role")]
+    for _ in range(20):
+        if rng.random() < 0.5:
+            rule = [rng.choice(subjects), rng.choice(objs), rng.choice(acts)]
+            if rng.random() < 0.5 and reference.add_policy(*rule):
+                index.add_permission(*rule)
+            elif reference.remove_policy(*rule):
+                index.remove_permission(*rule)
+        else:
+            rule = [rng.choice(subjects), rng.choice(roles)]
+            if rng.random() < 0.5 and reference.add_grouping_policy(*rule):
+                index.add_link(*rule)
+            elif reference.remove_grouping_policy(*rule):
+                index.remove_link(*rule)
+        index = index.copy()
+
+        for sub in watched:
+            tag, permissions = index.effective_permissions(sub)
+            assert permissions == implicit_permissions(reference, sub), sub
+            # Tags change exactly when the permissions do
+            assert (tag == views[sub][0]) == (permissions == views[sub][1])
+            views[sub] = tag, permissions
+
+def test_unrelated_changes_leave_views_alone():
+    index = RBACIndex(
+        [("admin", "/users", "GET"), ("user", "/resources", "GET")],
+        [("alice", "admin"), ("bob", "user")],
+    )
+    index.effective_permissions("alice")
+    bob = index.effective_permissions("bob")
+    alice_view = index._effective["alice"]
+    index.add_permission("user", "/resources", "POST")
+    # Only subjects reaching the changed role are recomputed
+    assert index._effective["alice"] is alice_view
+    assert index.effective_permissions("bob") != bob
+    index.add_link("admin", "user")
+    assert ("/resources", "POST") in index.effective_permissions("alice")[1]
+
+def test_me_permissions_supports_etags(enforcer):
+    from app.main import app
+
+    existing = set(users_db.keys())
+    try:
+        with TestClient(app) as client:
+            user = next(user for user in users_db.values() if user.username == "regular_user")
+            headers = {"Authorization": f"Bearer {create_access_token(user.id, user.role)}"}
+            url = f"{settings.API_PREFIX}/users/me/permissions"
+
+            response = client.get(url, headers=headers)
+            assert response.status_code == 200
+            expected = enforcer.get_instance().get_implicit_permissions_for_user("regular_user")
+            assert {(p["obj"], p["act"]) for p in response.json()["permissions"]} == {(rule[1], rule[2]) for rule in expected}
+            etag = response.headers["etag"]
+
+            cached = client.get(url, headers={**headers, "If-None-Match": etag})
+            assert cached.status_code == 304
+            assert cached.headers["etag"] == etag
+
+            enforcer.add_policy("user", "/reports", "GET")
+            changed = client.get(url, headers={**headers, "If-None-Match": etag})
+            assert changed.status_code == 200
+            assert changed.headers["etag"] != etag
+            assert {"obj": "/reports", "act": "GET"} in changed.json()["permissions"]
+    finally:
+        for user_id in set(users_db.keys()) - existing:
+            del users_db[user_id]
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import auth
+from app.config import settings
+from app.core.login_throttle import LoginThrottle, SlidingWindowTable
+from app.models.user import users_db
+
+def test_window_slides_and_reports_retry_after():
+    table = SlidingWindowTable(64, 60)
+    for second in range(3):
+        assert table.acquire([("user:alice", 3)], now=600 + second) == 0
+    # Full until the window ends, then the old attempts weigh less and less
+    assert table.acquire([("user:alice", 3)], now=630) == 30
+    assert table.acquire([("user:alice", 3)], now=670) == 0
+    assert 0 < table.acquire([("user:alice", 3)], now=671) <= 10
+    assert table.acquire([("user:alice", 3)], now=800) == 0
+
+def test_over_budget_keys_count_nothing():
+    table = SlidingWindowTable(64, 60)
+    assert table.acquire([("ip:10.0.0.1", 1)], now=0) == 0
+    assert table.acquire([("user:bob", 5), ("ip:10.0.0.1", 1)], now=1) > 0
+    for _ in range(5):
+        assert table.acquire([("user:bob", 5)], now=2) == 0
+    table.reset("user:bob", now=3)
+    assert table.acquire([("user:bob", 5)], now=3) == 0
+
+def test_table_stays_bounded_and_keeps_busy_keys():
+    table = SlidingWindowTable(8, 60)
+    for _ in range(5):
+        table.acquire([("user:victim", 5)], now=0)
+    for i in range(1000):
+        table.acquire([(f"user:spray{i}", 5)], now=1)
+    assert len(table._buffer) == 8 * 24
+    assert table.acquire([("user:victim", 5)], now=2) > 0
+
+def test_workers_share_a_file(tmp_path):
+    path = str(tmp_path / "login-throttle")
+    first = SlidingWindowTable(64, 60, path, b"key")
+    second = SlidingWindowTable(1024, 60, path, b"key")
+    assert first.acquire([("ip:10.0.0.2", 2)], now=0) == 0
+    assert second.acquire([("ip:10.0.0.2", 2)], now=0) == 0
+    assert first.acquire([("ip:10.0.0.2", 2)], now=0) > 0
+    first.close()
+    second.close()
+
+def test_held_shared_table_is_waited_for_off_the_event_loop(tmp_path):
+    path = str(tmp_path / "login-throttle")
+    other_worker = SlidingWindowTable(64, 60, path, b"key")
+    throttle = LoginThrottle(SlidingWindowTable(64, 60, path, b"key"), per_username=1, per_ip=0)
+
+    held, release = threading.Event(), threading.Event()
+
+    def hold():
+        with other_worker._locked():
+            held.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    held.wait()
+
+    async def run():
+        attempt = asyncio.ensure_future(throttle.acquire("alice", "10.0.0.3"))
+        cleared = asyncio.ensure_future(throttle.succeeded("bob"))
+        # The loop keeps running while the file lock is held elsewhere
+        await asyncio.sleep(0.05)
+        assert not attempt.done() and not cleared.done()
+        release.set()
+        assert await attempt == 0
+        await cleared
+        return await throttle.acquire("alice", "10.0.0.3")
+
+    try:
+        assert asyncio.run(run()) > 0
+    finally:
+        release.set()
+        holder.join()
+    other_worker.close()
+    throttle.close()
+
+def test_login_is_throttled_before_hashing(enforcer, monkeypatch):
+    from app.main import app
+
+    throttle = LoginThrottle(SlidingWindowTable(64, 60), per_username=3, per_ip=0)
+    monkeypatch.setattr(auth, "login_throttle", throttle)
+    verified = []
+
+    async def verify(password, hashed_password):
+        verified.append(password)
+        return password == "right-password"
+
+    monkeypatch.setattr(auth.password_service, "verify", verify)
+    existing = set(users_db.keys())
+    try:
+        with TestClient(app) as client:
+            url = f"{settings.API_PREFIX}/auth/login"
+            data = {"username": "admin_user", "password": "right-password"}
+            assert client.post(url, data=data).status_code == 200
+            for _ in range(3):
+                assert client.post(url, data={**data, "password": "wrong"}).status_code == 400
+            response = client.post(url, data=data)
+            assert response.status_code == 429
+            assert int(response.headers["retry-after"]) > 0
+            # The successful login cleared the count; the refused one never hashed
+            assert len(verified) == 4
+    finally:
+        for user_id in set(users_db.keys()) - existing:
+            del users_db[user_id]
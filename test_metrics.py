@@ -0,0 +1,85 @@
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import metrics as metrics_endpoint
+from app.core.metrics import MetricsRegistry
+from app.core.profiler import SamplingProfiler
+from app.core.security import create_access_token
+from app.models.user import User, users_db
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("op_seconds", "Op latency", ["op"], buckets=[0.001, 0.01])
+    latency.labels("read").observe(0.0005)
+    latency.labels("read").observe(0.005)
+    latency.labels("read").observe(1)
+    registry.counter("ops_total", "Ops").inc(3)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE op_seconds histogram" in lines
+    assert 'op_seconds_bucket{op="read",le="0.001"} 1' in lines
+    assert 'op_seconds_bucket{op="read",le="0.01"} 2' in lines
+    assert 'op_seconds_bucket{op="read",le="+Inf"} 3' in lines
+    assert 'op_seconds_count{op="read"} 3' in lines
+    assert "ops_total 3" in lines
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    registry.histogram("op_seconds", "Op latency").observe(1)
+    assert "op_seconds_count" not in registry.render()
+
+def test_collectors_render_at_scrape_time():
+    registry = MetricsRegistry()
+    depth = [0]
+    registry.add_collector(lambda: [("queue_depth", "gauge", "Depth", [({"pool": "a"}, depth[0])])])
+    depth[0] = 7
+    assert 'queue_depth{pool="a"} 7' in registry.render()
+
+def test_metrics_endpoint_exposes_hot_path_histograms(enforcer):
+    app = FastAPI()
+    app.include_router(metrics_endpoint.router, prefix="/metrics")
+    client = TestClient(app)
+    for username, role in (("admin_user", "admin"), ("regular_user", "user")):
+        users_db[f"metrics-{role}"] = User(
+            id=f"metrics-{role}", email=f"{username}@example.com", username=username, hashed_password="x", role=role
+        )
+    try:
+        assert client.get("/metrics").status_code == 401
+        regular = {"Authorization": f"Bearer {create_access_token('metrics-user', 'user')}"}
+        assert client.get("/metrics", headers=regular).status_code == 403
+        admin = {"Authorization": f"Bearer {create_access_token('metrics-admin', 'admin')}"}
+        response = client.get("/metrics", headers=admin)
+    finally:
+        users_db.pop("metrics-admin", None)
+        users_db.pop("metrics-user", None)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    for name in ("casbin_enforce_seconds", "jwt_decode_seconds", "password_hash_seconds", "user_store_lookup_seconds"):
+        assert f"# TYPE {name} histogram" in response.text
+
+def test_profiler_folds_sampled_stacks():
+    stop = threading.Event()
+
+    def busy_wait_for_profiler():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_wait_for_profiler, name="busy")
+    worker.start()
+    profiler = SamplingProfiler()
+    try:
+        assert profiler.start(interval=0.001)
+        assert not profiler.start()
+        time.sleep(0.05)
+        folded = profiler.stop()
+    finally:
+        stop.set()
+        worker.join()
+
+    assert not profiler.running
+    stacks = [line.rsplit(" ", 1) for line in folded.splitlines()]
+    assert any(stack.startswith("busy;") and "busy_wait_for_profiler" in stack for stack, _ in stacks)
+    assert all(int(count) > 0 for _, count in stacks)
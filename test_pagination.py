@@ -0,0 +1,49 @@
+import pytest
+from fastapi import HTTPException
+
+from app.api.pagination import decode_cursor, encode_cursor, parse_fields
+from app.models.keyset import KeysetIndex
+from app.models.resource import ResourceRepository
+
+def test_keyset_order_survives_updates_and_deletes():
+    index = KeysetIndex()
+    for key in range(1000):
+        index.add(key)
+    assert index.add(5) == 6
+    for key in range(0, 1000, 3):
+        index.remove(key)
+    expected = [key for key in range(1000) if key % 3]
+    assert [key for _, key in index.after()] == expected
+    # Resuming from any row continues right after it
+    seq = index.seq_of(500)
+    assert [key for _, key in index.after(seq)] == [key for key in expected if key > 500]
+
+def test_pages_cover_every_row_once():
+    repository = ResourceRepository()
+    for i in range(25):
+        repository[f"r{i}"] = {"id": f"r{i}"}
+    del repository["r3"]
+    repository["r4"] = {"id": "r4", "updated": True}
+
+    seen = []
+    cursor = 0
+    while True:
+        page = []
+        for seq, resource in repository.iter_after(cursor):
+            page.append(resource["id"])
+            cursor = seq
+            if len(page) == 10:
+                break
+        if not page:
+            break
+        seen.extend(page)
+    assert seen == [f"r{i}" for i in range(25) if i != 3]
+
+def test_cursor_and_fields_validation():
+    assert decode_cursor(encode_cursor(42)) == 42
+    assert decode_cursor(None) == 0
+    with pytest.raises(HTTPException):
+        decode_cursor("not a cursor")
+    assert parse_fields("id, username", ["id", "username", "email"]) == {"id", "username"}
+    with pytest.raises(HTTPException):
+        parse_fields("hashed_password", ["id"])
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.security import PasswordService, PasswordServiceBusy
+
+def test_hash_and_verify_run_off_the_event_loop():
+    service = PasswordService(max_workers=2, max_pending=4)
+
+    async def run():
+        hashed = await service.hash("password123")
+        return await service.verify("password123", hashed), await service.verify("wrong", hashed)
+
+    assert asyncio.run(run()) == (True, False)
+    stats = service.get_stats()
+    assert stats["hash"]["calls"] == 1
+    assert stats["verify"]["calls"] == 2
+    assert stats["pending"] == 0
+
+def test_rejects_beyond_max_pending():
+    service = PasswordService(max_workers=1, max_pending=2)
+
+    async def run():
+        return await asyncio.gather(*[service.hash("password123") for _ in range(4)], return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert sum(isinstance(result, PasswordServiceBusy) for result in results) == 2
+    assert service.get_stats()["hash"]["rejected"] == 2
+
+def test_cancelled_calls_hold_their_slot_until_bcrypt_finishes():
+    service = PasswordService(max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def run():
+        task = asyncio.ensure_future(service._submit("hash", release.wait))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The worker is still busy, so new work is shed, batches included
+        assert service.get_stats()["pending"] == 1
+        with pytest.raises(PasswordServiceBusy):
+            await service.hash("password123")
+        with pytest.raises(PasswordServiceBusy):
+            await service.hash_many(["password123"])
+        refused = await service.hash_many(["password123", "password456"], return_busy=True)
+        assert all(isinstance(result, PasswordServiceBusy) for result in refused)
+
+        release.set()
+        for _ in range(100):
+            if service.get_stats()["pending"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert len(await service.hash_many(["password123", "password456"])) == 2
+
+    asyncio.run(run())
+    assert service.get_stats()["pending"] == 0
@@ -0,0 +1,68 @@
+import asyncio
+
+import casbin
+import pytest
+
+from app.config import settings
+from app.core.casbin_rbac import CasbinEnforcer
+from app.core.policy_snapshot import PolicySnapshot, compile_snapshot
+
+@pytest.fixture
+def paths(enforcer):
+    return settings.CASBIN_MODEL_PATH, settings.CASBIN_POLICY_PATH, settings.CASBIN_SNAPSHOT_PATH
+
+def test_snapshot_round_trips_the_policy_file(paths):
+    model_path, policy_path, path = paths
+    compiled = compile_snapshot(model_path, policy_path, path)
+    loaded = PolicySnapshot.load(path, model_path, policy_path)
+    assert loaded.closures == compiled.closures
+    assert loaded.closures["manager_user"] == ("manager_user", "manager")
+
+    reference = casbin.Enforcer(model_path, policy_path)
+    model = casbin.Enforcer(model_path).get_model()
+    loaded.fill(model)
+    assert model.get_policy("p", "p") == reference.get_policy()
+    assert model.get_policy("g", "g") == reference.get_grouping_policy()
+
+def test_stale_or_damaged_snapshots_are_ignored(paths):
+    model_path, policy_path, path = paths
+    compile_snapshot(model_path, policy_path, path)
+    with open(policy_path, "a") as file:
+        file.write("\ng, late_user, admin\n")
+    assert PolicySnapshot.load(path, model_path, policy_path) is None
+
+    compile_snapshot(model_path, policy_path, path)
+    with open(path, "r+b") as file:
+        file.seek(-8, 2)
+        file.write(b"\0" * 8)
+    assert PolicySnapshot.load(path, model_path, policy_path) is None
+    assert PolicySnapshot.load(f"{path}.missing", model_path, policy_path) is None
+
+def test_enforcer_starts_from_the_snapshot(paths, enforcer):
+    model_path, policy_path, path = paths
+    compile_snapshot(model_path, policy_path, path)
+    adapter = enforcer.get_instance().get_adapter()
+    assert adapter.loaded_snapshot is not None
+    assert enforcer.enforce("manager_user", "/users", "GET")
+    assert not enforcer.enforce("regular_user", "/users", "GET")
+
+    # Changes logged since the snapshot are replayed on top of it
+    enforcer.add_role_for_user("regular_user", "admin")
+    enforcer.close()
+    CasbinEnforcer._instance = None
+    CasbinEnforcer._invalidate_decisions()
+    assert enforcer.get_instance().get_adapter().loaded_snapshot is None
+    assert enforcer.enforce("regular_user", "/users", "DELETE")
+
+def test_startup_warms_the_enforcer(enforcer):
+    from app.main import app
+    from app.models.user import users_db
+
+    existing = set(users_db.keys())
+    try:
+        asyncio.run(app.router.startup())
+        assert CasbinEnforcer._instance is not None
+        assert app.state.startup_seconds > 0
+    finally:
+        for user_id in set(users_db.keys()) - existing:
+            del users_db[user_id]
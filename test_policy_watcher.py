@@ -0,0 +1,65 @@
+import json
+import queue
+import socket
+
+from app.core.policy_watcher import UnixSocketWatcher
+
+def test_deltas_reach_sibling_workers(tmp_path):
+    received = queue.Queue()
+    worker_a = UnixSocketWatcher(str(tmp_path), received.put, name="a")
+    worker_b = UnixSocketWatcher(str(tmp_path), lambda delta: None, name="b")
+    try:
+        worker_b.update_for_add_policy("g", "g", ["alice", "admin"])
+        worker_b.update_for_remove_policies("p", "p", [["user", "/resources", "GET"]])
+        worker_b.update_for_remove_filtered_policy("g", "g", 0, "bob")
+
+        assert received.get(timeout=5) == {"op": "add", "sec": "g", "ptype": "g", "rules": [["alice", "admin"]]}
+        assert received.get(timeout=5) == {
+            "op": "remove", "sec": "p", "ptype": "p", "rules": [["user", "/resources", "GET"]],
+        }
+        assert received.get(timeout=5) == {
+            "op": "remove_filtered", "sec": "g", "ptype": "g", "field_index": 0, "field_values": ["bob"],
+        }
+    finally:
+        worker_a.close()
+        worker_b.close()
+
+def test_stale_sockets_are_removed(tmp_path):
+    # A socket file whose worker died without cleaning up
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    stale.bind(str(tmp_path / "gone.sock"))
+    stale.close()
+    worker = UnixSocketWatcher(str(tmp_path), lambda delta: None, name="live")
+    try:
+        worker.update_for_add_policy("g", "g", ["alice", "admin"])
+        assert worker.flush(timeout=5)
+        assert not (tmp_path / "gone.sock").exists()
+    finally:
+        worker.close()
+
+def test_backed_up_siblings_are_sent_a_reload(tmp_path, monkeypatch):
+    monkeypatch.setattr(UnixSocketWatcher, "SEND_TIMEOUT", 0.01)
+    monkeypatch.setattr(UnixSocketWatcher, "RETRY_SECONDS", 0.05)
+    # A sibling that stops reading until its receive queue is full
+    sibling = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sibling.bind(str(tmp_path / "slow.sock"))
+    worker = UnixSocketWatcher(str(tmp_path), lambda delta: None, name="live")
+    try:
+        for i in range(10000):
+            worker.update_for_add_policy("g", "g", [f"user{i}", "admin"])
+            assert worker.flush(timeout=5)
+            if worker._dirty:
+                break
+        assert worker._dirty == {str(tmp_path / "slow.sock")}
+
+        sibling.settimeout(5)
+        while True:
+            message = json.loads(sibling.recv(1 << 20))
+            if message == {"op": "reload"}:
+                break
+            assert message["op"] == "add"
+        assert worker.flush(timeout=5)
+        assert not worker._dirty
+    finally:
+        worker.close()
+        sibling.close()
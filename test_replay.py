@@ -0,0 +1,72 @@
+import argparse
+import asyncio
+import json
+import sys
+
+import pytest
+
+from app.models.user import users_db
+from benchmarks import replay
+
+RECORDS = [
+    # Recorded as a 201, replayed as a 200
+    {"ts": 0, "user": "admin_user", "method": "GET", "path": "/api/users/?limit=10", "status": 201},
+    {"ts": 0.5, "user": "ghost", "method": "GET", "path": "/api/users/me", "status": 200},
+    {"ts": 1, "sub": "regular_user", "obj": "/users", "act": "GET"},
+    {"ts": 1, "sub": "admin_user", "obj": "/users", "act": "GET"},
+]
+
+@pytest.fixture
+def log(tmp_path, enforcer):
+    path = tmp_path / "traffic.jsonl"
+    path.write_text("\n".join(json.dumps(record) for record in RECORDS) + "\n\n")
+    existing = set(users_db.keys())
+    yield str(path)
+    for user_id in set(users_db.keys()) - existing:
+        del users_db[user_id]
+
+def args_for(log, **overrides):
+    values = dict(log=log, mode="app", concurrency=2, speed=0, limit=None, compare=False, histogram=True)
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+def test_app_mode_counts_decisions_and_status_mismatches(log, capsys):
+    report = asyncio.run(replay.run(args_for(log)))
+    assert report.decisions["GET /api/users/"] == {200: 1}
+    assert report.decisions["GET /api/users/me"] == {200: 1}
+    assert report.decisions["enforce GET"] == {"allow": 1, "deny": 1}
+    assert report.mismatches == {"status": 1}
+    # The unknown user was replayed as a stand-in with no roles
+    assert users_db["replay-ghost"].role == "replay"
+
+    output = capsys.readouterr().out
+    assert "Replayed 4 requests" in output
+    assert "status: GET /api/users/?limit=10 as admin_user: recorded 201, replayed 200" in output
+    assert "<=" in output
+
+def test_authz_mode_checks_route_permissions(log):
+    report = asyncio.run(replay.run(args_for(log, mode="authz", compare=True, limit=3)))
+    assert report.decisions["GET /api/users/"] == {"allow": 1}
+    # /users/me declares no permission, so the stand-in passes
+    assert report.decisions["GET /api/users/me"] == {"allow": 1}
+    assert report.decisions["enforce GET"] == {"deny": 1}
+    assert not report.mismatches
+
+def test_report_percentiles_and_histogram():
+    report = replay.Report(max_examples=1)
+    for ms in range(1, 101):
+        report.record("GET /x", ms / 1000, "allow")
+    latencies = sorted(report.latencies["GET /x"])
+    assert replay._percentile(latencies, 0.5) == pytest.approx(0.051)
+    assert replay._percentile(latencies, 0.99) == pytest.approx(0.099)
+    assert replay._histogram([0.000001, 0.000003, 0.000004]) == "<=1us:1 <=4us:2"
+    report.mismatch("index", "first")
+    report.mismatch("index", "second")
+    assert report.mismatches == {"index": 2}
+    assert report.examples == ["index: first"]
+
+def test_main_exits_non_zero_on_mismatches(log, monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["replay", log])
+    with pytest.raises(SystemExit) as exit_info:
+        replay.main()
+    assert exit_info.value.code == 1
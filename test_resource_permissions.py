@@ -0,0 +1,78 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import resources
+from app.config import settings
+from app.core.security import create_access_token
+from app.models.resource import ResourceRepository, SQLiteResourceStore
+from app.models.user import User, users_db
+
+@pytest.fixture(params=["memory", "sqlite"])
+def client(request, enforcer, tmp_path, monkeypatch):
+    store = ResourceRepository() if request.param == "memory" else SQLiteResourceStore(str(tmp_path / "resources.db"))
+    store.add_many(
+        [
+            {"id": f"r{i}", "created_by": "carol" if i % 10 == 0 else "admin_user", "domain": settings.DEFAULT_DOMAIN}
+            for i in range(100)
+        ]
+        # Another tenant's, invisible whatever the policy
+        + [{"id": f"other{i}", "created_by": "carol", "domain": "other"} for i in range(5)]
+    )
+    monkeypatch.setattr(resources, "resources_db", store)
+    users_db["rp-carol"] = User(id="rp-carol", email="carol@example.com", username="carol", hashed_password="x", role="guest")
+    app = FastAPI()
+    app.include_router(resources.router, prefix="/resources")
+    yield TestClient(app), {"Authorization": f"Bearer {create_access_token('rp-carol', 'guest')}"}
+    users_db.pop("rp-carol", None)
+
+def listed(client, headers, **params):
+    response = client.get("/resources/", headers=headers, params=params)
+    assert response.status_code == 200
+    return [resource["id"] for resource in response.json()["items"]] if params else [resource["id"] for resource in response.json()]
+
+def test_listing_is_limited_to_permitted_objects(client, enforcer):
+    client, headers = client
+    assert listed(client, headers) == []
+
+    enforcer.add_policy("guest", "/resources/r5", "GET")
+    enforcer.add_policy("guest", "/resources/r7", "GET")
+    enforcer.add_role_for_user("carol", "guest")
+    assert listed(client, headers) == ["r5", "r7"]
+    assert client.get("/resources/r5", headers=headers).status_code == 200
+    assert client.get("/resources/r6", headers=headers).status_code == 404
+
+    enforcer.add_policy("guest", "/resources/owned", "GET")
+    owned = [f"r{i}" for i in range(0, 100, 10)]
+    assert listed(client, headers) == sorted(owned + ["r5", "r7"], key=lambda id: int(id[1:]))
+    assert listed(client, headers, limit=3) == ["r0", "r5", "r7"]
+    assert client.get("/resources/r20", headers=headers).status_code == 200
+
+    enforcer.add_policy("guest", "/resources", "GET")
+    assert len(listed(client, headers)) == 100
+
+def test_other_tenants_resources_are_hidden(client, enforcer):
+    client, headers = client
+    enforcer.add_policy("guest", "/resources", "GET")
+    enforcer.add_policy("guest", "/resources/other1", "GET")
+    enforcer.add_policy("guest", "/resources/owned", "GET")
+    enforcer.add_policy("guest", "/resources", "POST")
+    enforcer.add_role_for_user("carol", "guest")
+    assert not any(id.startswith("other") for id in listed(client, headers))
+    assert not any(id.startswith("other") for id in listed(client, headers, limit=1000, created_by="carol"))
+    assert client.get("/resources/other1", headers=headers).status_code == 404
+
+    # Created resources land in the creator's tenant, whatever the body says
+    response = client.post("/resources/", headers=headers, json={"name": "mine", "domain": "other"})
+    assert response.json()["domain"] == settings.DEFAULT_DOMAIN
+    assert client.get(f"/resources/{response.json()['id']}", headers=headers).status_code == 200
+
+def test_permitted_objects_match_enforce(enforcer):
+    enforcer.add_policy("user", "/resources/a", "GET")
+    enforcer.add_policy("regular_user", "/resources/b", "GET")
+    enforcer.add_policy("user", "/resources/c", "PUT")
+    objects = enforcer.get_permitted_objects("regular_user", "GET", "/resources/")
+    assert objects == {"/resources/a", "/resources/b"}
+    assert all(enforcer.enforce("regular_user", obj, "GET") for obj in objects)
+    enforcer.remove_policy("user", "/resources/a", "GET")
+    assert enforcer.get_permitted_objects("regular_user", "GET", "/resources/") == {"/resources/b"}
@@ -0,0 +1,73 @@
+import sqlite3
+
+import pytest
+
+from app.config import settings
+from app.models.resource import ResourceRepository, SQLiteResourceStore
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield ResourceRepository()
+        return
+    store = SQLiteResourceStore(str(tmp_path / "resources.db"), ["kind"])
+    yield store
+    store.close()
+
+def test_crud_and_order(store):
+    store.add_many([{"id": f"r{i}", "created_by": "alice" if i % 2 else "bob", "kind": "doc"} for i in range(10)])
+    store["r3"] = {"id": "r3", "created_by": "carol"}
+    del store["r4"]
+    assert len(store) == 9
+    assert "r4" not in store
+    assert store["r3"] == {"id": "r3", "created_by": "carol"}
+    assert [resource["id"] for _, resource in store.iter_after()] == [f"r{i}" for i in range(10) if i != 4]
+
+def test_filtered_listing_resumes_from_cursor(store):
+    store.add_many([{"id": f"r{i}", "created_by": "alice" if i % 2 else "bob", "kind": "doc" if i < 5 else "img"} for i in range(600)])
+    rows = list(store.iter_after(created_by="alice"))
+    assert len(rows) == 300
+    assert all(resource["created_by"] == "alice" for _, resource in rows)
+    assert [resource["id"] for _, resource in store.iter_after(rows[-2][0], created_by="alice")] == ["r599"]
+    assert [resource["id"] for _, resource in store.iter_after(created_by="alice", kind="doc")] == ["r1", "r3"]
+
+def test_listing_is_scoped_by_domain(store):
+    store.add_many([{"id": f"r{i}", "created_by": "alice", "domain": "acme" if i % 3 else "globex"} for i in range(9)])
+    assert [resource["id"] for _, resource in store.iter_after(domain="globex")] == ["r0", "r3", "r6"]
+    assert [resource["id"] for _, resource in store.iter_permitted(0, ["r1", "r3"], "alice", domain="acme")] == [
+        "r1", "r2", "r4", "r5", "r7", "r8"
+    ]
+
+def test_sqlite_store_from_before_domains_is_migrated(tmp_path):
+    path = str(tmp_path / "resources.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE resources (seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT NOT NULL UNIQUE, created_by TEXT, data TEXT NOT NULL)"
+    )
+    conn.execute("""INSERT INTO resources (id, created_by, data) VALUES ('r1', 'alice', '{"id": "r1", "created_by": "alice"}')""")
+    conn.commit()
+    conn.close()
+    store = SQLiteResourceStore(path)
+    assert store["r1"]["domain"] == settings.DEFAULT_DOMAIN
+    assert [resource["id"] for _, resource in store.iter_after(domain=settings.DEFAULT_DOMAIN)] == ["r1"]
+    store.close()
+
+def test_sqlite_filters_use_indexes(tmp_path):
+    store = SQLiteResourceStore(str(tmp_path / "resources.db"), ["kind"])
+    reopened = SQLiteResourceStore(str(tmp_path / "resources.db"), ["kind"])
+    store["r1"] = {"id": "r1", "created_by": "alice"}
+    assert reopened["r1"]["created_by"] == "alice"
+
+    for sql in (
+        "SELECT seq FROM resources WHERE seq > 0 AND created_by = 'alice' ORDER BY seq",
+        "SELECT seq FROM resources WHERE seq > 0 AND domain = 'acme' ORDER BY seq",
+        "SELECT seq FROM resources WHERE seq > 0 AND json_extract(data, '$.kind') = 'doc' ORDER BY seq",
+    ):
+        plan = " ".join(row[-1] for row in store._conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+        assert "USING INDEX" in plan or "USING COVERING INDEX" in plan
+    with pytest.raises(ValueError):
+        list(store.iter_after(color="red"))
+    with pytest.raises(ValueError):
+        SQLiteResourceStore(str(tmp_path / "other.db"), ["bad name"])
+    store.close()
+    reopened.close()
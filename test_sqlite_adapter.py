@@ -0,0 +1,68 @@
+import casbin
+import pytest
+
+from app.config import settings
+from app.core.casbin_rbac import CasbinEnforcer
+from app.core.sqlite_adapter import Filter, SQLiteAdapter
+
+MODEL = "rbac_model.conf"
+
+@pytest.fixture
+def adapter(tmp_path):
+    adapter = SQLiteAdapter(str(tmp_path / "policy.db"))
+    adapter.import_csv("policy.csv")
+    yield adapter
+    adapter.close()
+
+@pytest.fixture
+def sqlite_enforcer(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "CASBIN_POLICY_BACKEND", "sqlite")
+    monkeypatch.setattr(settings, "CASBIN_SQLITE_PATH", str(tmp_path / "policy.db"))
+    CasbinEnforcer._instance = None
+    CasbinEnforcer._invalidate_decisions()
+    yield CasbinEnforcer
+    CasbinEnforcer.close()
+    CasbinEnforcer._instance = None
+    CasbinEnforcer._invalidate_decisions()
+
+def test_full_load_matches_csv(adapter):
+    from_csv = casbin.Enforcer(MODEL, "policy.csv")
+    from_db = casbin.Enforcer(MODEL, adapter)
+    assert sorted(from_db.get_policy()) == sorted(from_csv.get_policy())
+    assert sorted(from_db.get_grouping_policy()) == sorted(from_csv.get_grouping_policy())
+
+def test_incremental_changes_are_stored(adapter, tmp_path):
+    enforcer = casbin.Enforcer(MODEL, adapter)
+    enforcer.add_grouping_policy("alice", "admin")
+    enforcer.remove_grouping_policy("regular_user", "user")
+    enforcer.remove_filtered_policy(0, "manager", "/resources")
+
+    reopened = SQLiteAdapter(str(tmp_path / "policy.db"))
+    reloaded = casbin.Enforcer(MODEL, reopened)
+    assert reloaded.has_grouping_policy("alice", "admin")
+    assert not reloaded.has_grouping_policy("regular_user", "user")
+    assert reloaded.get_filtered_policy(0, "manager") == [["manager", "/users", "GET"]]
+    reopened.close()
+
+def test_filtered_load_only_reads_matching_subjects(adapter):
+    enforcer = casbin.Enforcer(MODEL)
+    enforcer.set_adapter(adapter)
+    enforcer.load_filtered_policy(Filter(G=[["admin_user", "nobody"]]))
+    assert enforcer.is_filtered()
+    assert len(enforcer.get_policy()) == 15
+    assert enforcer.get_grouping_policy() == [["admin_user", "admin"]]
+
+def test_lazy_enforcer_loads_subjects_on_demand(sqlite_enforcer):
+    assert sqlite_enforcer.enforce("manager_user", "/users", "GET")
+    assert not sqlite_enforcer.enforce("regular_user", "/users", "GET")
+    model_rules = sqlite_enforcer.get_instance().get_grouping_policy()
+    assert sorted(model_rules) == [["manager_user", "manager"], ["regular_user", "user"]]
+
+    sqlite_enforcer.add_role_for_user("new_user", "admin")
+    assert sqlite_enforcer.save_policy()
+    assert sqlite_enforcer.enforce("new_user", "/users", "DELETE")
+    assert sqlite_enforcer.delete_role_for_user("admin_user", "admin")
+    assert not sqlite_enforcer.enforce("admin_user", "/users", "DELETE")
+
+    adapter = sqlite_enforcer.get_instance().get_adapter()
+    assert adapter.query(["g"], [["new_user", "admin_user"]]) == [("g", ["new_user", "admin"])]
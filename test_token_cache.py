@@ -0,0 +1,51 @@
+from datetime import timedelta
+import base64
+
+import pytest
+from jose import JWTError, jwt
+
+from app.config import settings
+from app.core.security import create_access_token, decode_access_token
+from app.core.token_cache import TokenCache
+
+@pytest.mark.parametrize("backend", ["jose", "native"])
+def test_backends_agree(monkeypatch, backend):
+    monkeypatch.setattr(settings, "JWT_BACKEND", backend)
+    token = create_access_token("user-1", "admin")
+    assert decode_access_token(token)["sub"] == "user-1"
+
+    expired = create_access_token("user-1", "admin", expires_delta=timedelta(minutes=-1))
+    forged = jwt.encode({"sub": "user-1", "role": "admin"}, "other-key", algorithm=settings.ALGORITHM)
+    unsigned = token[: token.rindex(".") + 1]
+    none_alg = base64.urlsafe_b64encode(b'{"alg":"none"}').decode().rstrip("=") + unsigned[unsigned.index("."):]
+    for bad in (expired, forged, unsigned, none_alg, "not-a-token", token + "x"):
+        with pytest.raises(JWTError):
+            decode_access_token(bad)
+
+def test_repeat_verification_skips_decoding():
+    cache = TokenCache(max_size=2)
+    token = create_access_token("user-1", "admin")
+    assert cache.verify(token).sub == "user-1"
+    assert cache.verify(token).role == "admin"
+    assert cache.get_stats()["decodes_avoided"] == 1
+    assert cache.get_stats()["decodes"] == 1
+
+def test_expired_and_revoked_tokens_are_not_served():
+    cache = TokenCache(max_size=10)
+    token = create_access_token("user-1", "admin")
+    other = create_access_token("user-2", "user")
+    cache.verify(token)
+    cache.verify(other)
+    assert cache.revoke_subject("user-1") == 1
+    assert cache.get_stats()["size"] == 1
+
+    expired = create_access_token("user-3", "user", expires_delta=timedelta(minutes=-1))
+    with pytest.raises(JWTError):
+        cache.verify(expired)
+
+def test_cache_is_bounded():
+    cache = TokenCache(max_size=2)
+    for sub in ("a", "b", "c"):
+        cache.verify(create_access_token(sub, "user"))
+    assert cache.get_stats()["size"] == 2
+    assert cache.revoke_subject("a") == 0
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import users
+from app.config import settings
+from app.core.security import PasswordServiceBusy, create_access_token, verify_password
+from app.models.user import User, users_db
+
+@pytest.fixture
+def client(enforcer):
+    app = FastAPI()
+    app.include_router(users.router, prefix="/users")
+    users_db["import-admin"] = User(
+        id="import-admin",
+        email="import-admin@example.com",
+        username="admin_user",
+        hashed_password="x",
+        role="admin",
+    )
+    client = TestClient(app)
+    client.headers["Authorization"] = f"Bearer {create_access_token('import-admin', 'admin')}"
+    yield client
+    for user_id, user in list(users_db.items()):
+        if user_id == "import-admin" or user.username.startswith("import"):
+            del users_db[user_id]
+
+def row(i, **overrides):
+    return {"email": f"import{i}@example.com", "username": f"import{i}", "password": "password123", "role": "user", **overrides}
+
+def test_json_import_reports_bad_rows_and_creates_the_rest(client, enforcer):
+    rows = [row(0), row(1, password="short"), row(2, username="import0"), row(3), "junk"]
+    response = client.post("/users/batch", json=rows)
+    assert response.status_code == 200
+    body = response.json()
+
+    assert [user["username"] for user in body["created"]] == ["import0", "import3"]
+    assert [error["row"] for error in body["errors"]] == [2, 3, 5]
+    assert "password" in body["errors"][0]["detail"]
+    assert "already exists" in body["errors"][1]["detail"]
+
+    created = users_db.get_by_username("import3")
+    assert verify_password("password123", created.hashed_password)
+    assert enforcer.get_roles_for_user("import3") == ["user"]
+    assert enforcer.enforce("import3", "/resources", "GET")
+
+def test_ndjson_and_csv_imports(client, enforcer):
+    ndjson = "\n".join(json.dumps(row(i)) for i in range(3)) + "\n{not json\n"
+    response = client.post("/users/batch", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+    assert len(response.json()["created"]) == 3
+    assert response.json()["errors"] == [{"row": 4, "detail": "Invalid JSON"}]
+
+    csv_body = "\ufeffemail,username,password,role,full_name\r\n"
+    csv_body += "import10@example.com,import10,password123,manager,\r\n"
+    csv_body += "import11@example.com,import11,password123,user,\"Import, Eleven\"\r\n"
+    csv_body += "import0@example.com,import12,password123,user,\r\n"
+    response = client.post("/users/batch", content=csv_body, headers={"Content-Type": "text/csv"})
+    body = response.json()
+    assert [user["username"] for user in body["created"]] == ["import10", "import11"]
+    assert body["created"][1]["full_name"] == "Import, Eleven"
+    assert body["errors"][0]["row"] == 3
+    assert enforcer.enforce("import10", "/users", "GET")
+
+def test_rows_the_busy_password_pool_refuses_are_reported(client, enforcer, monkeypatch):
+    submit = users.password_service._submit
+
+    async def refuse_some(op, fn, *args):
+        # Stands in for logins filling the pool partway through the batch
+        if args[0] == "refused-password":
+            raise PasswordServiceBusy("Too many pending password operations")
+        return await submit(op, fn, *args)
+
+    monkeypatch.setattr(users.password_service, "_submit", refuse_some)
+    rows = [row(0), row(1, password="refused-password"), row(2), row(3, password="refused-password")]
+    response = client.post("/users/batch", json=rows)
+    assert response.status_code == 200
+    body = response.json()
+    assert [user["username"] for user in body["created"]] == ["import0", "import2"]
+    assert [error["row"] for error in body["errors"]] == [2, 4]
+    assert "busy" in body["errors"][0]["detail"]
+    assert users_db.get_by_username("import1") is None
+    assert enforcer.get_roles_for_user("import2") == ["user"]
+
+def test_import_limits(client, monkeypatch):
+    monkeypatch.setattr(settings, "USER_IMPORT_MAX_ROWS", 2)
+    assert client.post("/users/batch", json=[row(i) for i in range(3)]).status_code == 413
+    assert not users_db.get_by_username("import0")
+    assert client.post("/users/batch", content="x", headers={"Content-Type": "text/plain"}).status_code == 415
+
+def test_add_roles_for_users_skips_existing_rules(enforcer):
+    assert enforcer.add_roles_for_users([("admin_user", "admin"), ("bulk1", "user"), ("bulk1", "user")]) == [["bulk1", "user"]]
+    assert enforcer.enforce("bulk1", "/resources", "GET")
+    assert enforcer.add_roles_for_users([("bulk1", "user")]) == []
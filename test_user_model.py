@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from app.models.user import User
+from app.schemas.user import User as UserSchema
+
+def make_user(**overrides):
+    values = dict(
+        id="u1",
+        email="alice@example.com",
+        username="alice",
+        hashed_password="x",
+        role="".join(["ad", "min"]),
+        full_name=None,
+        created_at=datetime(2024, 1, 2, 3, 4, 5, 678),
+        updated_at=datetime(2024, 1, 2, 3, 4, 5),
+    )
+    values.update(overrides)
+    return User(**values)
+
+def test_public_dict_matches_schema_serialization():
+    user = make_user()
+    assert user.public_dict() == UserSchema.model_validate(user).model_dump(mode="json")
+    assert list(user.public_dict()) == list(UserSchema.model_fields)
+    assert user.public_dict(["username", "created_at"]) == {"username": "alice", "created_at": "2024-01-02T03:04:05.000678"}
+
+def test_compact_storage():
+    user = make_user()
+    assert not hasattr(user, "__dict__")
+    assert user.role is make_user(role="admin").role
+
+def test_replace_keeps_other_fields():
+    user = make_user()
+    updated = user.replace(email="new@example.com", is_active=False)
+    assert updated.email == "new@example.com" and not updated.is_active
+    assert updated.replace(email=user.email, is_active=True) == user
+    assert user.email == "alice@example.com"
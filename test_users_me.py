@@ -0,0 +1,63 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import users
+from app.core.security import create_access_token
+from app.models.user import User, users_db
+
+@pytest.fixture
+def client(enforcer):
+    app = FastAPI()
+    app.include_router(users.router, prefix="/users")
+    users_db["me-regular"] = User(
+        id="me-regular", email="me-regular@example.com", username="me_regular", hashed_password="x", role="user"
+    )
+    users_db["me-other"] = User(
+        id="me-other", email="me-other@example.com", username="me_other", hashed_password="x", role="user"
+    )
+    client = TestClient(app)
+    client.headers["Authorization"] = f"Bearer {create_access_token('me-regular', 'user')}"
+    yield client
+    users_db.pop("me-regular", None)
+    users_db.pop("me-other", None)
+
+def test_me_routes_are_not_taken_for_a_user_id(client):
+    # A regular user may not read users by id, but may read themselves
+    response = client.get("/users/me")
+    assert response.status_code == 200
+    assert response.json()["username"] == "me_regular"
+
+def test_update_current_user(client):
+    response = client.put("/users/me", json={"full_name": "Me Regular", "email": "me-new@example.com"})
+    assert response.status_code == 200
+    assert response.json()["full_name"] == "Me Regular"
+    assert users_db["me-regular"].email == "me-new@example.com"
+
+    response = client.put("/users/me", json={"email": "me-other@example.com"})
+    assert response.status_code == 400
+    assert users_db["me-regular"].email == "me-new@example.com"
+
+def test_users_cannot_rename_or_deactivate_themselves(client, enforcer):
+    # Renamed to a role, the user would inherit its permissions
+    assert client.get("/users/").status_code == 403
+    response = client.put("/users/me", json={"username": "admin", "is_active": False, "role": "admin"})
+    assert response.status_code == 200
+    me = users_db["me-regular"]
+    assert (me.username, me.is_active, me.role) == ("me_regular", True, "user")
+    assert client.get("/users/").status_code == 403
+    assert enforcer.get_roles_for_user("me_regular") == []
+
+def test_admin_rename_moves_the_role_link(client, enforcer):
+    users_db["me-admin"] = User(
+        id="me-admin", email="me-admin@example.com", username="admin_user", hashed_password="x", role="admin"
+    )
+    try:
+        enforcer.add_role_for_user("me_regular", "user")
+        admin = {"Authorization": f"Bearer {create_access_token('me-admin', 'admin')}"}
+        response = client.put("/users/me-regular", json={"username": "me_renamed"}, headers=admin)
+        assert response.status_code == 200
+        assert enforcer.get_roles_for_user("me_renamed") == ["user"]
+        assert enforcer.get_roles_for_user("me_regular") == []
+    finally:
+        users_db.pop("me-admin", None)